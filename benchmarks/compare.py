@@ -0,0 +1,83 @@
+import json
+
+# Метрики, для которых большее значение лучше
+HIGHER_IS_BETTER = ('docs_per_sec', 'queries_per_sec')
+
+# Изменения этапов меньше этой величины считаются шумом измерения
+NOISE_FLOOR_MS = 0.2
+
+
+def load_results(path):
+    """Загрузить результаты прошлого запуска"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def scenario_metrics(scenario):
+    """Плоский словарь сравниваемых метрик сценария"""
+    metrics = {
+        metric: scenario[metric]
+        for metric in ('docs_per_sec', 'queries_per_sec', 'peak_rss_kb', 'output_bytes')
+        if metric in scenario
+    }
+    for stage, summary in scenario.get('stages_ms', {}).items():
+        metrics[f'{stage}_ms'] = summary['median']
+    return metrics
+
+
+def compare(current, baseline, threshold):
+    """
+    Сравнить результаты с базовым запуском
+    
+    Args:
+        current: результаты текущего запуска
+        baseline: результаты базового запуска
+        threshold: допустимое ухудшение в долях (0.1 - 10%)
+    
+    Returns:
+        Список строк сравнения: сценарий, метрика, было, стало,
+        относительное изменение и признак регрессии
+    """
+    baseline_scenarios = {
+        scenario['name']: scenario
+        for section in ('stages', 'batch', 'db')
+        for scenario in baseline.get(section, [])
+    }
+    
+    rows = []
+    for scenario in current.get('stages', []) + current.get('batch', []) + current.get('db', []):
+        old_scenario = baseline_scenarios.get(scenario['name'])
+        if old_scenario is None:
+            continue
+        
+        old_metrics = scenario_metrics(old_scenario)
+        for metric, value in scenario_metrics(scenario).items():
+            old_value = old_metrics.get(metric)
+            if not old_value:
+                continue
+            
+            change = (value - old_value) / old_value
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append({
+                'scenario': scenario['name'],
+                'metric': metric,
+                'baseline': old_value,
+                'current': value,
+                'change': round(change, 4),
+                'regression': worse > threshold and not (
+                    metric.endswith('_ms') and abs(value - old_value) < NOISE_FLOOR_MS
+                ),
+            })
+    return rows
+
+
+def format_comparison(rows):
+    """Текстовая таблица сравнения"""
+    lines = [f"{'сценарий':<44} {'метрика':<16} {'было':>12} {'стало':>12} {'изменение':>10}"]
+    for row in rows:
+        mark = '  РЕГРЕССИЯ' if row['regression'] else ''
+        lines.append(
+            f"{row['scenario']:<44} {row['metric']:<16} {row['baseline']:>12} "
+            f"{row['current']:>12} {row['change']:>+10.1%}{mark}"
+        )
+    return '\n'.join(lines)
\ No newline at end of file
@@ -0,0 +1,141 @@
+from PIL import Image, ImageDraw
+import os
+import random
+
+# Генерация детерминирована: одинаковые параметры дают одинаковые файлы
+SEED = 1234
+
+# Размер страницы A4 в пунктах
+PAGE_SIZE = (595, 842)
+
+
+class TemplateSpec:
+    """Параметры синтетического PDF шаблона"""
+    
+    def __init__(self, pages, kind):
+        self.pages = pages
+        # 'text' - страницы с текстом, 'scanned' - страницы-изображения
+        self.kind = kind
+    
+    @property
+    def name(self):
+        return f'{self.kind}-{self.pages}p'
+    
+    def to_dict(self):
+        return {'pages': self.pages, 'kind': self.kind}
+
+
+class SignatureSpec:
+    """Параметры синтетической подписи"""
+    
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+    
+    @property
+    def name(self):
+        return f'sig-{self.width}x{self.height}'
+    
+    def to_dict(self):
+        return {'width': self.width, 'height': self.height}
+
+
+def make_text_template(path, pages):
+    """Создать шаблон с текстовыми страницами"""
+    from reportlab.pdfgen import canvas
+    
+    rng = random.Random(SEED)
+    words = ['договор', 'сторона', 'подпись', 'пункт', 'акт', 'согласно', 'дата', 'срок', 'оплата']
+    
+    c = canvas.Canvas(path, pagesize=PAGE_SIZE)
+    for page_num in range(pages):
+        c.setFont('Helvetica', 10)
+        y = PAGE_SIZE[1] - 60
+        while y > 60:
+            line = ' '.join(rng.choice(words) for _ in range(12))
+            # Базовые шрифты не содержат кириллицу, поэтому текст транслитерируется
+            c.drawString(50, y, line.encode('ascii', 'replace').decode('ascii'))
+            y -= 14
+        c.drawString(PAGE_SIZE[0] - 80, 30, str(page_num + 1))
+        c.showPage()
+    c.save()
+
+
+def make_scan_image(rng, page_num, dpi):
+    """Нарисовать изображение отсканированной страницы"""
+    width = int(PAGE_SIZE[0] * dpi / 72)
+    height = int(PAGE_SIZE[1] * dpi / 72)
+    img = Image.new('L', (width, height), 250)
+    draw = ImageDraw.Draw(img)
+    
+    # Строки текста в виде штрихов со случайной длиной и наклоном скана
+    margin = width // 12
+    line_height = max(4, dpi // 6)
+    skew = rng.uniform(-0.01, 0.01)
+    y = margin
+    while y < height - margin:
+        x = margin
+        right = width - margin - rng.randint(0, width // 4)
+        while x < right:
+            word = rng.randint(line_height, line_height * 5)
+            offset = int((x - margin) * skew)
+            draw.rectangle((x, y + offset, x + word, y + offset + line_height // 2), fill=rng.randint(20, 90))
+            x += word + line_height // 2
+        y += line_height * 2
+    draw.text((width - margin, height - margin // 2), str(page_num + 1), fill=0)
+    return img
+
+
+def make_scanned_template(path, pages, dpi=100):
+    """Создать шаблон из страниц-изображений, как после сканера"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader
+    from io import BytesIO
+    
+    rng = random.Random(SEED)
+    c = canvas.Canvas(path, pagesize=PAGE_SIZE)
+    for page_num in range(pages):
+        # У каждой страницы свое изображение, как у настоящего скана
+        buffer = BytesIO()
+        make_scan_image(rng, page_num, dpi).save(buffer, format='JPEG', quality=75)
+        buffer.seek(0)
+        c.drawImage(ImageReader(buffer), 0, 0, width=PAGE_SIZE[0], height=PAGE_SIZE[1])
+        c.showPage()
+    c.save()
+
+
+def make_signature(path, width, height):
+    """Создать подпись: прозрачный фон и несколько росчерков"""
+    rng = random.Random(SEED + width * 31 + height)
+    img = Image.new('RGBA', (width, height), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(img)
+    
+    stroke = max(2, height // 25)
+    for _ in range(4):
+        points = [(rng.randint(0, width), rng.randint(height // 5, height * 4 // 5)) for _ in range(8)]
+        points.sort()
+        draw.line(points, fill=(10, 20, 120, 255), width=stroke, joint='curve')
+    img.save(path, format='PNG')
+
+
+def ensure_template(work_dir, spec):
+    """Путь к шаблону; файл создается только при первом запуске"""
+    path = os.path.join(work_dir, f'template-{spec.name}.pdf')
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        if spec.kind == 'scanned':
+            make_scanned_template(tmp_path, spec.pages)
+        else:
+            make_text_template(tmp_path, spec.pages)
+        os.replace(tmp_path, path)
+    return path
+
+
+def ensure_signature(work_dir, spec):
+    """Путь к подписи; файл создается только при первом запуске"""
+    path = os.path.join(work_dir, f'{spec.name}.png')
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        make_signature(tmp_path, spec.width, spec.height)
+        os.replace(tmp_path, path)
+    return path
\ No newline at end of file
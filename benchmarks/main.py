@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from benchmarks import compare, fixtures, runner
+
+
+def parse_list(value, convert=str):
+    """Разобрать список через запятую"""
+    return [convert(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def parse_signature(value):
+    """Разобрать размер подписи вида 1200x400"""
+    width, height = value.lower().split('x')
+    return fixtures.SignatureSpec(int(width), int(height))
+
+
+def build_parser():
+    """Создать парсер аргументов командной строки"""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description=(
+            'Замер производительности подстановки подписей на синтетических шаблонах. '
+            'Результаты выводятся в формате JSON и могут сравниваться с базовым запуском.'
+        )
+    )
+    parser.add_argument('--pages', default='1,50,500', help='число страниц шаблонов через запятую')
+    parser.add_argument('--kinds', default='text,scanned', help='типы шаблонов: text, scanned')
+    parser.add_argument('--signatures', default='300x100,1200x400,3000x1000',
+                        help='размеры подписей в пикселях через запятую')
+    parser.add_argument('--modes', default=','.join(runner.MODES), help='режимы вывода через запятую')
+    parser.add_argument('--docs', type=int, default=10, help='документов на сценарий этапов')
+    parser.add_argument('--batch-docs', type=int, default=40,
+                        help='документов в пакетном сценарии (0 - не запускать)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='процессов в параллельном пакетном сценарии')
+    parser.add_argument('--db-rows', type=int, default=1000,
+                        help='строк в таблице людей для замера базы данных')
+    parser.add_argument('--db-queries', type=int, default=2000,
+                        help='запросов в замере базы данных (0 - не запускать)')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'signature-pdf-bench'),
+                        help='папка для сгенерированных файлов (переиспользуется между запусками)')
+    parser.add_argument('--output', help='файл для результатов JSON (по умолчанию stdout)')
+    parser.add_argument('--baseline', help='результаты прошлого запуска для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='допустимое ухудшение метрики относительно базового запуска')
+    return parser
+
+
+def collect_meta():
+    """Сведения об окружении запуска"""
+    import PIL
+    import PyPDF2
+    import reportlab
+    
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    
+    return {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': {
+            'PyPDF2': PyPDF2.__version__,
+            'Pillow': PIL.__version__,
+            'reportlab': reportlab.Version,
+        },
+    }
+
+
+def log(message):
+    """Ход выполнения выводится в stderr, stdout остается для JSON"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    """Запустить замеры; возвращает код завершения (1 - есть регрессии)"""
+    args = build_parser().parse_args(argv)
+    
+    templates = [
+        fixtures.TemplateSpec(pages, kind)
+        for kind in parse_list(args.kinds)
+        for pages in parse_list(args.pages, int)
+    ]
+    signatures = parse_list(args.signatures, parse_signature)
+    modes = parse_list(args.modes)
+    for mode in modes:
+        if mode not in runner.MODES:
+            log(f"Неизвестный режим: {mode}")
+            return 2
+    
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = {'meta': collect_meta(), 'config': vars(args), 'stages': [], 'batch': [], 'db': []}
+    
+    log("Подготовка шаблонов и подписей...")
+    template_paths = {spec.name: fixtures.ensure_template(args.work_dir, spec) for spec in templates}
+    signature_paths = {spec.name: fixtures.ensure_signature(args.work_dir, spec) for spec in signatures}
+    
+    for template in templates:
+        for signature in signatures:
+            for mode in modes:
+                name = f'{template.name}/{signature.name}/{mode}'
+                log(f"Этапы: {name}")
+                scenario = runner.run_isolated(
+                    runner.run_stage_scenario,
+                    template_paths[template.name],
+                    signature_paths[signature.name],
+                    mode,
+                    args.docs,
+                    args.work_dir
+                )
+                scenario.update({
+                    'name': name,
+                    'template': template.to_dict(),
+                    'signature': signature.to_dict(),
+                    'mode': mode,
+                })
+                results['stages'].append(scenario)
+    
+    if args.batch_docs > 0 and signatures:
+        # Пакетный сценарий с подписью среднего размера из списка
+        signature = signatures[len(signatures) // 2]
+        worker_counts = sorted({1, max(1, args.workers)})
+        for template in templates:
+            for workers in worker_counts:
+                name = f'{template.name}/batch/workers-{workers}'
+                log(f"Пакет: {name}")
+                scenario = runner.run_isolated(
+                    runner.run_batch_scenario,
+                    template_paths[template.name],
+                    signature_paths[signature.name],
+                    args.batch_docs,
+                    workers,
+                    'incremental',
+                    args.work_dir
+                )
+                scenario.update({
+                    'name': name,
+                    'template': template.to_dict(),
+                    'signature': signature.to_dict(),
+                    'workers': workers,
+                })
+                results['batch'].append(scenario)
+    
+    if args.db_queries > 0:
+        log("База данных: соединение на запрос и общее соединение")
+        results['db'] = runner.run_isolated(runner.run_db_scenario, args.work_dir, args.db_rows, args.db_queries)
+    
+    exit_code = 0
+    if args.baseline:
+        rows = compare.compare(results, compare.load_results(args.baseline), args.threshold)
+        results['comparison'] = rows
+        log(compare.format_comparison(rows))
+        if any(row['regression'] for row in rows):
+            exit_code = 1
+    
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    
+    return exit_code
\ No newline at end of file
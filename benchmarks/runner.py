@@ -0,0 +1,358 @@
+from queue import Empty
+from time import perf_counter
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import traceback
+
+# Этапы обработки одного документа в порядке выполнения
+STAGES = ('load', 'resize', 'overlay', 'merge', 'write')
+
+# Режимы вывода: (overlay_mode, output_mode)
+MODES = {
+    'incremental': ('xobject', 'incremental'),
+    'rewrite': ('xobject', 'rewrite'),
+    'compact': ('xobject', 'compact'),
+    'reportlab': ('reportlab', 'rewrite'),
+}
+
+# Как часто проверять, что процесс замера жив, пока нет результата, в секундах
+ISOLATED_POLL_SECONDS = 1.0
+
+
+def peak_rss_kb(include_children=False):
+    """Пиковый объем резидентной памяти процесса в килобайтах"""
+    import resource
+    
+    # ru_maxrss в Linux сохраняется при fork и exec, поэтому новый процесс
+    # унаследовал бы пик родителя; VmHWM считается для своего адресного пространства
+    usage = None
+    try:
+        with open('/proc/self/status', encoding='ascii') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    usage = int(line.split()[1])
+                    break
+    except OSError:
+        pass
+    
+    if usage is None:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # На macOS ru_maxrss измеряется в байтах
+        if sys.platform == 'darwin':
+            usage //= 1024
+    
+    if include_children:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        if sys.platform == 'darwin':
+            children //= 1024
+        usage = max(usage, children)
+    return usage
+
+
+def summarize(samples):
+    """Сводка по замерам в миллисекундах"""
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    return {
+        'median': round(statistics.median(samples) * 1000, 3),
+        'mean': round(statistics.fmean(samples) * 1000, 3),
+        'p95': round(p95 * 1000, 3),
+        'min': round(samples[0] * 1000, 3),
+    }
+
+
+def measure_document(template, signature_path, position, mode, output_path):
+    """
+    Обработать один документ, замеряя каждый этап без кэшей
+    
+    Для режима reportlab этап merge включает повторное построение overlay,
+    потому что stamp_with_reportlab строит его сам.
+    """
+    from core.image_handler import ImageHandler
+    from core.pdf_handler import PDFHandler
+    from core.signature_asset import SignatureAsset
+    from PyPDF2 import PdfReader
+    
+    timings = {}
+    
+    ImageHandler.cache.clear()
+    started = perf_counter()
+    img = ImageHandler.load_signature(signature_path)
+    timings['load'] = perf_counter() - started
+    
+    started = perf_counter()
+    resized = ImageHandler.resize_signature(img, position.width, position.height)
+    timings['resize'] = perf_counter() - started
+    
+    started = perf_counter()
+    if mode == 'reportlab':
+        page_width, page_height = template.get_page_size(position.page)
+        packet = PDFHandler.create_signature_overlay(
+            resized, position.x, position.y, position.width, position.height, page_width, page_height
+        )
+        PdfReader(packet).pages[0]
+        signature = resized
+    else:
+        signature = SignatureAsset.from_image(resized)
+    timings['overlay'] = perf_counter() - started
+    
+    stamps = [(signature, position)]
+    started = perf_counter()
+    if mode == 'incremental':
+        result = PDFHandler.build_incremental_update(template, stamps)
+    elif mode in ('rewrite', 'compact'):
+        result = PDFHandler.stamp_with_xobject(template, stamps)
+    else:
+        result = PDFHandler.stamp_with_reportlab(template, stamps)
+    timings['merge'] = perf_counter() - started
+    
+    started = perf_counter()
+    if mode == 'incremental':
+        result.write(output_path)
+    else:
+        PDFHandler.save_writer(result, output_path, compact=mode == 'compact')
+    timings['write'] = perf_counter() - started
+    
+    return timings
+
+
+def run_stage_scenario(template_path, signature_path, mode, docs, work_dir):
+    """
+    Замерить этапы и пропускную способность для одного сочетания
+    шаблона, подписи и режима вывода
+    """
+    from core.image_handler import ImageHandler
+    from core.pdf_handler import PDFHandler
+    from core.pdf_template import PDFTemplate
+    from database.models import SignaturePosition
+    
+    position = SignaturePosition(100, 700, 150, 50, 0)
+    output_path = os.path.join(work_dir, f'out-{os.getpid()}.pdf')
+    
+    # Разбор шаблона выполняется один раз на пакет, поэтому замеряется отдельно
+    parse_samples = []
+    for _ in range(3):
+        # Предыдущий разбор освобождается, чтобы не завышать пиковую память
+        template = None
+        started = perf_counter()
+        template = PDFTemplate(template_path)
+        parse_samples.append(perf_counter() - started)
+    
+    # Холодный проход по этапам
+    stage_samples = {stage: [] for stage in STAGES}
+    for _ in range(docs):
+        timings = measure_document(template, signature_path, position, mode, output_path)
+        for stage in STAGES:
+            stage_samples[stage].append(timings[stage])
+    
+    # Сквозной проход через PDFHandler с кэшами, как в пакетной обработке
+    overlay_mode, output_mode = MODES[mode]
+    ImageHandler.cache.clear()
+    output_bytes = []
+    started = perf_counter()
+    for _ in range(docs):
+        signature = ImageHandler.load_resized_signature(signature_path, position.width, position.height)
+        PDFHandler.add_signature_to_pdf(
+            template, output_path, signature, position, overlay_mode=overlay_mode, output_mode=output_mode
+        )
+        output_bytes.append(os.path.getsize(output_path))
+    elapsed = perf_counter() - started
+    os.remove(output_path)
+    
+    stages = {'parse': summarize(parse_samples)}
+    stages.update({stage: summarize(samples) for stage, samples in stage_samples.items()})
+    return {
+        'docs': docs,
+        'stages_ms': stages,
+        'docs_per_sec': round(docs / elapsed, 2),
+        'output_bytes': int(statistics.fmean(output_bytes)),
+        'template_bytes': os.path.getsize(template_path),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def run_batch_scenario(template_path, signature_path, docs, workers, output_mode, work_dir):
+    """Замерить пакетную обработку через SignatureProcessor"""
+    from core.signature_processor import SignatureProcessor
+    from database.models import Person, SignaturePosition
+    from utils.file_utils import FileUtils
+    
+    output_dir = os.path.join(work_dir, f'batch-{os.getpid()}')
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Предкомпилированная подпись создается при добавлении человека, как в приложении
+    asset_path, asset = FileUtils.compile_signature_asset(signature_path)
+    persons = [
+        Person(id=i, name=f'Person {i}', signature_path=signature_path,
+               asset_path=asset_path, asset_hash=asset.content_hash)
+        for i in range(docs)
+    ]
+    position = SignaturePosition(100, 700, 150, 50, 0)
+    processor = SignatureProcessor(workers=workers, output_mode=output_mode, output_dir=output_dir)
+    
+    started = perf_counter()
+    output_files = processor.process_batch(template_path, persons, position)
+    elapsed = perf_counter() - started
+    
+    output_bytes = sum(os.path.getsize(path) for path in output_files)
+    # Вместе с документами удаляется манифест сборки папки
+    shutil.rmtree(output_dir)
+    
+    return {
+        'docs': docs,
+        'ok': len(output_files),
+        'elapsed_s': round(elapsed, 3),
+        'docs_per_sec': round(docs / elapsed, 2),
+        'output_bytes': output_bytes,
+        'peak_rss_kb': peak_rss_kb(include_children=True),
+    }
+
+
+def run_db_scenario(work_dir, rows, queries):
+    """
+    Замерить запросы к базе людей в запросах в секунду
+    
+    Режим per_call открывает соединение на каждый запрос (как до
+    ConnectionManager), persistent использует общее соединение потока.
+    """
+    from contextlib import nullcontext
+    from database.db_manager import DatabaseManager
+    from database.models import Person
+    from config.settings import PERSONS_PAGE_SIZE
+    import random
+    import sqlite3
+    
+    class PerCallDatabase(DatabaseManager):
+        """Соединение с настройками по умолчанию на каждый запрос"""
+        
+        def get_connection(self):
+            # Соединение закрывается, как только освобождается курсор
+            return sqlite3.connect(self.db_path, isolation_level=None)
+        
+        def transaction(self):
+            return nullcontext(self.get_connection())
+    
+    def person(index):
+        return Person(name=f'Person {index}', position='Инженер',
+                      signature_path=f'/signatures/{index}.png', date_added='2024-01-01T00:00:00')
+    
+    results = []
+    for mode, manager in (('per_call', PerCallDatabase), ('persistent', DatabaseManager)):
+        db_path = os.path.join(work_dir, f'db-{mode}-{os.getpid()}.db')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        
+        db = manager()
+        db.db_path = db_path
+        db.initialize()
+        
+        timings = {}
+        
+        # Вставка по одной строке с фиксацией каждой
+        started = perf_counter()
+        for index in range(rows):
+            db.add_person(person(index))
+        timings['insert'] = (rows, perf_counter() - started)
+        
+        # Вставка пакетом в одной транзакции
+        started = perf_counter()
+        with db.transaction():
+            for index in range(rows, rows * 2):
+                db.add_person(person(index))
+        timings['insert_batch'] = (rows, perf_counter() - started)
+        
+        rng = random.Random(0)
+        ids = [rng.randint(1, rows * 2) for _ in range(queries)]
+        started = perf_counter()
+        for person_id in ids:
+            db.get_person_by_id(person_id)
+        timings['get_by_id'] = (queries, perf_counter() - started)
+        
+        list_queries = max(1, queries // 100)
+        started = perf_counter()
+        for _ in range(list_queries):
+            db.get_all_persons()
+        timings['get_all'] = (list_queries, perf_counter() - started)
+        
+        # Первая и одна из последних страниц списка: постраничная выборка
+        # по ключу не должна замедляться к концу списка
+        first_page = db.get_persons_page(limit=2)
+        last_page = db.get_persons_page(limit=rows * 2)[-PERSONS_PAGE_SIZE - 1:]
+        for operation, after in (('page_first', first_page[0]), ('page_last', last_page[0])):
+            started = perf_counter()
+            for _ in range(list_queries):
+                db.get_persons_page(after)
+            timings[operation] = (list_queries, perf_counter() - started)
+        
+        query, params = db._persons_page_query(last_page[0], PERSONS_PAGE_SIZE)
+        plan = ' '.join(row[3] for row in db.get_connection().execute(f'EXPLAIN QUERY PLAN {query}', params))
+        if 'SEARCH' not in plan:
+            raise RuntimeError(f"Страница людей выбирается без поиска по индексу: {plan}")
+        
+        for operation, (count, elapsed) in timings.items():
+            results.append({
+                'name': f'db/{mode}/{operation}',
+                'mode': mode,
+                'operation': operation,
+                'queries': count,
+                'queries_per_sec': round(count / elapsed, 1),
+            })
+        
+        if mode == 'persistent':
+            from database.connection import ConnectionManager
+            ConnectionManager.close(db_path)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    
+    return results
+
+
+def _isolated_entry(queue, func, args):
+    """Точка входа отдельного процесса замера"""
+    # Сообщения модулей обработки не должны попадать в JSON на stdout
+    sys.stdout.flush()
+    os.dup2(2, 1)
+    try:
+        queue.put(('ok', func(*args)))
+    except Exception:
+        queue.put(('error', traceback.format_exc()))
+
+
+def run_isolated(func, *args):
+    """
+    Выполнить замер в новом процессе
+    
+    Так пиковая память и кэши не переходят из одного сценария в другой.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_isolated_entry, args=(queue, func, args))
+    process.start()
+    try:
+        status, result = _wait_result(queue, process)
+    finally:
+        process.join()
+    if status == 'error':
+        raise RuntimeError(result)
+    return result
+
+
+def _wait_result(queue, process):
+    """Дождаться результата процесса замера; если процесс упал без результата - ошибка"""
+    while True:
+        try:
+            return queue.get(timeout=ISOLATED_POLL_SECONDS)
+        except Empty:
+            if process.exitcode is None:
+                continue
+        
+        # Результат, записанный перед выходом, мог еще не дойти до очереди
+        try:
+            return queue.get(timeout=ISOLATED_POLL_SECONDS)
+        except Empty:
+            raise RuntimeError(f"Процесс замера завершился без результата (код {process.exitcode})")
\ No newline at end of file
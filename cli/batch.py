@@ -0,0 +1,335 @@
+import time
+
+# Время начала импорта модулей обработки, для замера холодного старта
+_IMPORT_STARTED = time.perf_counter()
+
+import csv
+import json
+import os
+import sys
+from core.signature_processor import SignatureProcessor
+from core.output_sinks import ConcatenatedPDFSink, ZipSink
+from core.batch_jobs import BatchJobRunner
+from core.metrics import Metrics
+from database.db_manager import DatabaseManager
+from database.models import SignaturePosition
+from config.settings import OUTPUT_DIR, OUTPUT_MODE
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+# Поля позиции, которые можно задать прямо в строке манифеста
+POSITION_FIELDS = ('x', 'y', 'width', 'height', 'page')
+
+
+class ManifestError(Exception):
+    """Ошибка в манифесте или параметрах запуска"""
+
+
+def add_parser(subparsers):
+    """Зарегистрировать команду batch"""
+    parser = subparsers.add_parser(
+        'batch',
+        help='пакетная обработка по манифесту',
+        description=(
+            'Подставить подписи по манифесту CSV или JSONL. Каждая строка содержит '
+            'person_id и, при необходимости, template, position (имя сохраненного '
+            'шаблона позиции) или x, y, width, height, page. Результаты выводятся '
+            'в stdout построчно в формате JSON. При записи в папку каждая группа строк '
+            'сохраняется как задание, которое после сбоя можно продолжить с --resume.'
+        )
+    )
+    parser.add_argument('manifest', nargs='?', help='файл манифеста (.csv или .jsonl), "-" для stdin')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='формат манифеста (по расширению)')
+    parser.add_argument('--template', help='PDF шаблон по умолчанию')
+    parser.add_argument('--position', help='имя сохраненного шаблона позиции по умолчанию')
+    for field in POSITION_FIELDS:
+        parser.add_argument(f'--{field}', type=int if field == 'page' else float)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='папка для готовых документов')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--zip', help='записать все документы в один ZIP архив вместо папки')
+    target.add_argument('--combined', help='записать все документы в один PDF, раздел на человека')
+    parser.add_argument('--output-mode', choices=('incremental', 'rewrite', 'compact'), default=OUTPUT_MODE)
+    parser.add_argument('--workers', type=int,
+                        help='количество процессов (по умолчанию по числу ядер, не больше 4; '
+                             '1 - без пула процессов, 0 - по числу ядер)')
+    parser.add_argument('--force', action='store_true',
+                        help='создать заново и документы, входные данные которых не изменились')
+    parser.add_argument('--resume', type=int, metavar='JOB_ID',
+                        help='продолжить прерванное задание вместо обработки манифеста')
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help='записать время и объем данных по этапам обработки в JSON')
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help='записать те же метрики в текстовом формате Prometheus '
+                             '(для textfile collector node exporter)')
+    parser.add_argument('--db', help='путь к базе данных')
+    parser.set_defaults(handler=run)
+
+
+def read_manifest(path, manifest_format=None):
+    """Прочитать строки манифеста как список словарей"""
+    if manifest_format is None:
+        manifest_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    
+    source = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+    try:
+        if manifest_format == 'csv':
+            return [dict(row) for row in csv.DictReader(source)]
+        
+        rows = []
+        for line_number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                raise ManifestError(f"Строка {line_number}: неверный JSON ({str(e)})")
+        return rows
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def resolve_position(row, args, saved_positions):
+    """Определить позицию подписи для строки манифеста"""
+    name = row.get('position') or args.position
+    if name:
+        if name not in saved_positions:
+            raise ManifestError(f"Шаблон позиции не найден: {name}")
+        data = dict(saved_positions[name])
+    else:
+        data = {}
+    
+    # Явные значения в строке важнее параметров командной строки
+    for field in POSITION_FIELDS:
+        value = row.get(field)
+        if value in (None, ''):
+            value = getattr(args, field)
+        if value is not None:
+            data[field] = int(value) if field == 'page' else float(value)
+    
+    if not name and not all(field in data for field in ('x', 'y')):
+        raise ManifestError("Не задана позиция подписи (--position или x, y)")
+    
+    return SignaturePosition.from_dict(data)
+
+
+def create_sink(args, processor):
+    """Приемник документов по параметрам командной строки"""
+    if args.zip:
+        return ZipSink(args.zip)
+    if args.combined:
+        return ConcatenatedPDFSink(args.combined)
+    return processor.get_sink()
+
+
+def _result_record(line_number, person, template, output_path, error, skipped=False, notes=None):
+    """Запись результата для одной строки манифеста (notes - замечания к документу)"""
+    record = {'line': line_number, 'person_id': person.id, 'name': person.name, 'template': template}
+    if skipped:
+        # Входные данные не изменились с прошлого запуска, файл не создавался заново
+        record.update({'status': 'skipped', 'output': output_path})
+    elif error is None:
+        record.update({'status': 'ok', 'output': output_path})
+        if notes:
+            record['warnings'] = notes
+    else:
+        record.update({'status': 'error', 'error': error})
+    return record
+
+
+def _job_record(job, item, person, skipped, notes=None):
+    """Запись результата для строки продолжаемого задания (notes - замечания к документу)"""
+    record = {'job_id': job.id, 'item': item.seq, 'person_id': item.person_id,
+              'name': person.name if person else None, 'template': job.template_path}
+    if skipped:
+        record.update({'status': 'skipped', 'output': item.output_path})
+    elif item.status == 'done':
+        record.update({'status': 'ok', 'output': item.output_path})
+        if notes:
+            record['warnings'] = notes
+    else:
+        record.update({'status': 'error', 'error': item.error})
+    return record
+
+
+def resume_job(args, db, emit, started):
+    """Продолжить задание: готовые строки с неизменными файлами пропускаются"""
+    if args.manifest or args.zip or args.combined:
+        raise ManifestError("--resume не сочетается с манифестом, --zip и --combined")
+    
+    job = db.get_job(args.resume)
+    if job is None:
+        raise ManifestError(f"Задание {args.resume} не найдено")
+    
+    counts = {'ok': 0, 'failed': 0, 'skipped': 0}
+    runner = BatchJobRunner(db, workers=args.workers, force=args.force)
+    try:
+        for item, person, skipped in runner.iter_run(job.id):
+            record = _job_record(job, item, person, skipped, runner.notes.get(item.output_path))
+            emit(record)
+            counts['failed' if record['status'] == 'error' else record['status']] += 1
+    except ValueError as e:
+        raise ManifestError(str(e))
+    
+    emit({'summary': {
+        'job_id': job.id,
+        'status': db.get_job(job.id).status,
+        'total': job.total,
+        **counts,
+        'elapsed_s': round(time.perf_counter() - started, 3),
+    }})
+    return 1 if counts['failed'] else 0
+
+
+def run(args):
+    """Выполнить пакетную обработку с замером этапов; возвращает код завершения"""
+    with Metrics.collect() as metrics:
+        code = run_batch(args)
+    
+    # stdout к этому времени закрыт для результатов, ошибки идут в stderr
+    try:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+    except OSError as e:
+        print(f"Ошибка записи метрик: {str(e)}", file=sys.stderr)
+        return code or 2
+    return code
+
+
+def run_batch(args):
+    """Выполнить пакетную обработку; возвращает код завершения"""
+    started = time.perf_counter()
+    
+    # Диагностика модулей обработки (и процессов-обработчиков) идет в stderr,
+    # а stdout остается только для результатов в формате JSON
+    sys.stdout.flush()
+    saved_stdout = os.dup(1)
+    output = os.fdopen(os.dup(saved_stdout), 'w', encoding='utf-8', buffering=1)
+    os.dup2(2, 1)
+    
+    def emit(record):
+        output.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    sink = None
+    try:
+        db = DatabaseManager()
+        if args.db:
+            db.db_path = args.db
+        db.initialize()
+        
+        if args.resume is not None:
+            return resume_job(args, db, emit, started)
+        if not args.manifest:
+            raise ManifestError("Не указан манифест (или --resume)")
+        
+        rows = read_manifest(args.manifest, args.format)
+        saved_positions = {name: data for _, name, data in db.get_position_templates()}
+        
+        os.makedirs(args.output_dir, exist_ok=True)
+        processor = SignatureProcessor(
+            workers=args.workers,
+            output_mode=args.output_mode,
+            output_dir=args.output_dir
+        )
+        sink = create_sink(args, processor)
+        # Результат в папке можно продолжить после сбоя, поэтому группы
+        # сохраняются как задания; архив и общий PDF пишутся как раньше
+        runner = BatchJobRunner(db, workers=args.workers, force=args.force) if not (args.zip or args.combined) else None
+        job_ids = []
+        
+        # Строки с одинаковыми шаблоном и позицией подряд обрабатываются
+        # одним пакетом, чтобы шаблон разбирался один раз
+        groups = []
+        failed = 0
+        for line_number, row in enumerate(rows, 1):
+            try:
+                template = row.get('template') or args.template
+                if not template:
+                    raise ManifestError("Не задан PDF шаблон (--template или колонка template)")
+                position = resolve_position(row, args, saved_positions)
+                
+                person_id = int(row.get('person_id'))
+                person = db.get_person_by_id(person_id)
+                if person is None:
+                    raise ManifestError(f"Человек с id {person_id} не найден")
+            except (ManifestError, TypeError, ValueError) as e:
+                failed += 1
+                emit({'line': line_number, 'person_id': row.get('person_id'),
+                      'status': 'error', 'error': str(e)})
+                continue
+            
+            key = (template, tuple(sorted(position.to_dict().items())))
+            if groups and groups[-1][0] == key:
+                groups[-1][2].append((line_number, person))
+            else:
+                groups.append((key, position, [(line_number, person)]))
+        
+        succeeded = 0
+        skipped_total = 0
+        for (template, _), position, items in groups:
+            persons = [person for _, person in items]
+            done = 0
+            job_id = None
+            try:
+                if runner is not None:
+                    job_id = runner.create(template, persons, position, args.output_dir, args.output_mode).id
+                    job_ids.append(job_id)
+                    results = (
+                        (person, item.output_path, item.error, skipped)
+                        for item, person, skipped in runner.iter_run(job_id)
+                    )
+                else:
+                    results = (
+                        (person, output_path, error, False)
+                        for person, output_path, error in processor.iter_batch(template, persons, position, sink=sink)
+                    )
+                for (line_number, _), (person, output_path, error, skipped) in zip(items, results):
+                    notes = (runner if runner is not None else processor).notes.get(output_path)
+                    record = _result_record(line_number, person, template, output_path, error, skipped, notes)
+                    if job_id is not None:
+                        record['job_id'] = job_id
+                    emit(record)
+                    done += 1
+                    if skipped:
+                        skipped_total += 1
+                    elif error is None:
+                        succeeded += 1
+                    else:
+                        failed += 1
+            except Exception as e:
+                # Шаблон не удалось открыть или пул процессов упал:
+                # ошибка для оставшихся строк группы
+                for line_number, person in items[done:]:
+                    emit(_result_record(line_number, person, template, None, str(e)))
+                    failed += 1
+        
+        # Архив и общий PDF появляются под своим именем только после закрытия
+        sink.close()
+        
+        emit({'summary': {
+            'total': len(rows),
+            'ok': succeeded,
+            'failed': failed,
+            'skipped': skipped_total,
+            'elapsed_s': round(time.perf_counter() - started, 3),
+            'import_s': round(_IMPORT_SECONDS, 3),
+            'jobs': job_ids,
+            'qt_loaded': 'PyQt5' in sys.modules,
+        }})
+        return 1 if failed else 0
+    
+    except (ManifestError, OSError) as e:
+        emit({'status': 'error', 'error': str(e)})
+        return 2
+    finally:
+        # Прерванный пакет не оставляет недописанный архив или общий PDF
+        if sink is not None:
+            sink.abort()
+        output.close()
+        # Возвращаем stdout вызывающему коду (run_batch вызывается и как функция)
+        sys.stdout.flush()
+        os.dup2(saved_stdout, 1)
+        os.close(saved_stdout)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+from database.db_manager import DatabaseManager
+
+
+def add_parser(subparsers):
+    """Зарегистрировать команду jobs"""
+    parser = subparsers.add_parser(
+        'jobs',
+        help='список заданий пакетной обработки',
+        description=(
+            'Вывести сохраненные задания пакетной обработки (новые первыми) по одному '
+            'в строке в формате JSON. Незавершенное задание продолжается командой '
+            'batch --resume JOB_ID.'
+        )
+    )
+    parser.add_argument('--all', action='store_true', help='включая завершенные')
+    parser.add_argument('--delete', type=int, metavar='JOB_ID', help='удалить задание (файлы остаются)')
+    parser.add_argument('--prune', action='store_true',
+                        help='удалить все завершенные задания (файлы остаются)')
+    parser.add_argument('--db', help='путь к базе данных')
+    parser.set_defaults(handler=run)
+
+
+def run(args):
+    """Вывести или удалить задания; возвращает код завершения"""
+    db = DatabaseManager()
+    if args.db:
+        db.db_path = args.db
+    db.initialize()
+    
+    if args.delete is not None:
+        if db.get_job(args.delete) is None:
+            print(json.dumps({'status': 'error', 'error': f"Задание {args.delete} не найдено"}, ensure_ascii=False))
+            return 1
+        db.delete_job(args.delete)
+        print(json.dumps({'status': 'ok', 'deleted': args.delete}))
+        return 0
+    
+    if args.prune:
+        print(json.dumps({'status': 'ok', 'pruned': db.delete_finished_jobs()}))
+        return 0
+    
+    for job in db.get_jobs(unfinished_only=not args.all):
+        print(json.dumps(job.to_dict(), ensure_ascii=False))
+    return 0
\ No newline at end of file
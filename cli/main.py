@@ -0,0 +1,29 @@
+import argparse
+import sys
+from cli import batch, jobs, persons, roster, thumbnails
+
+def build_parser():
+    """Создать парсер аргументов командной строки"""
+    parser = argparse.ArgumentParser(
+        prog='python -m cli',
+        description='PDF Signature Tool без графического интерфейса'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    batch.add_parser(subparsers)
+    jobs.add_parser(subparsers)
+    roster.add_parser(subparsers)
+    persons.add_parser(subparsers)
+    thumbnails.add_parser(subparsers)
+    return parser
+
+
+def main(argv=None):
+    """Точка входа командной строки; возвращает код завершения"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.command is None:
+        parser.print_help(sys.stderr)
+        return 2
+    
+    return args.handler(args)
\ No newline at end of file
@@ -0,0 +1,42 @@
+import itertools
+import json
+from database.db_manager import DatabaseManager
+from config.settings import PERSONS_PAGE_SIZE
+
+
+def add_parser(subparsers):
+    """Зарегистрировать команду persons"""
+    parser = subparsers.add_parser(
+        'persons',
+        help='список людей с поиском и фильтрами',
+        description=(
+            'Вывести людей, упорядоченных по имени, по одному в строке в формате JSON. '
+            'Список читается из базы по страницам, поэтому подходит для больших баз.'
+        )
+    )
+    parser.add_argument('--search', help='слова, с которых начинаются слова имени')
+    parser.add_argument('--position', help='точное значение должности')
+    parser.add_argument('--department', help='точное значение подразделения')
+    parser.add_argument('--limit', type=int, help='вывести не больше N человек')
+    parser.add_argument('--count', action='store_true', help='вывести только количество')
+    parser.add_argument('--db', help='путь к базе данных')
+    parser.set_defaults(handler=run)
+
+
+def run(args):
+    """Вывести список людей; возвращает код завершения"""
+    db = DatabaseManager()
+    if args.db:
+        db.db_path = args.db
+    db.initialize()
+    
+    filters = {'search': args.search, 'position': args.position, 'department': args.department}
+    if args.count:
+        print(json.dumps({'count': db.count_persons(**filters)}))
+        return 0
+    
+    page_size = min(args.limit, PERSONS_PAGE_SIZE) if args.limit else PERSONS_PAGE_SIZE
+    persons = db.iter_persons(page_size, **filters)
+    for person in itertools.islice(persons, args.limit):
+        print(json.dumps(person.to_dict(), ensure_ascii=False))
+    return 0
\ No newline at end of file
@@ -0,0 +1,61 @@
+import json
+import time
+from core.roster_import import RosterImporter
+from database.db_manager import DatabaseManager
+from utils.file_utils import FileUtils
+from config.settings import SIGNATURES_DIR
+
+
+def add_parser(subparsers):
+    """Зарегистрировать команду import"""
+    parser = subparsers.add_parser(
+        'import',
+        help='массовое добавление людей',
+        description=(
+            'Добавить людей из CSV (колонки name, position, department, signature) или из папки '
+            'с файлами подписей (имя человека - имя файла). Подписи проверяются, '
+            'копируются и предкомпилируются параллельно, строки записываются в базу '
+            'одной транзакцией. Результат по каждой строке выводится в stdout в формате JSON.'
+        )
+    )
+    parser.add_argument('source', help='CSV файл или папка с подписями')
+    parser.add_argument('--workers', type=int, help='количество потоков подготовки подписей')
+    parser.add_argument('--db', help='путь к базе данных')
+    parser.set_defaults(handler=run)
+
+
+def run(args):
+    """Выполнить импорт; возвращает код завершения"""
+    started = time.perf_counter()
+    
+    def emit(record):
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+    
+    try:
+        db = DatabaseManager()
+        if args.db:
+            db.db_path = args.db
+        db.initialize()
+        FileUtils.ensure_dir_exists(SIGNATURES_DIR)
+        
+        importer = RosterImporter(db, workers=args.workers)
+        results = importer.import_path(args.source)
+    except (OSError, ValueError) as e:
+        emit({'status': 'error', 'error': str(e)})
+        return 2
+    
+    failed = 0
+    for result in results:
+        emit(result.to_dict())
+        if not result.ok:
+            failed += 1
+    
+    elapsed = time.perf_counter() - started
+    emit({'summary': {
+        'total': len(results),
+        'ok': len(results) - failed,
+        'failed': failed,
+        'elapsed_s': round(elapsed, 3),
+        'persons_per_min': round(len(results) / elapsed * 60) if elapsed > 0 else None,
+    }})
+    return 1 if failed else 0
\ No newline at end of file
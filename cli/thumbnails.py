@@ -0,0 +1,32 @@
+import json
+import time
+from core.thumbnails import SignatureThumbnail
+from database.db_manager import DatabaseManager
+
+
+def add_parser(subparsers):
+    """Зарегистрировать команду thumbnails"""
+    parser = subparsers.add_parser(
+        'thumbnails',
+        help='создать недостающие миниатюры подписей',
+        description=(
+            'Создать миниатюры подписей для людей, у которых их нет или у которых '
+            'сменился файл подписи. Окно управления подписями делает то же в фоне.'
+        )
+    )
+    parser.add_argument('--workers', type=int, help='количество потоков')
+    parser.add_argument('--db', help='путь к базе данных')
+    parser.set_defaults(handler=run)
+
+
+def run(args):
+    """Заполнить миниатюры; возвращает код завершения"""
+    started = time.perf_counter()
+    db = DatabaseManager()
+    if args.db:
+        db.db_path = args.db
+    db.initialize()
+    
+    count = SignatureThumbnail.backfill(db, workers=args.workers)
+    print(json.dumps({'created': count, 'elapsed_s': round(time.perf_counter() - started, 3)}))
+    return 0
\ No newline at end of file
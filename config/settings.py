@@ -8,6 +8,20 @@ TEMPLATES_DIR = os.path.join(DATA_DIR, 'templates')
 OUTPUT_DIR = os.path.join(DATA_DIR, 'output')
 DATABASE_PATH = os.path.join(DATA_DIR, 'database.db')
 
+# Настройки SQLite (соединение открывается один раз на поток)
+# WAL позволяет читать базу во время записи
+SQLITE_JOURNAL_MODE = 'WAL'
+# В режиме WAL NORMAL не теряет целостность при сбое, но быстрее FULL
+SQLITE_SYNCHRONOUS = 'NORMAL'
+# Размер кэша страниц на соединение в килобайтах
+SQLITE_CACHE_SIZE_KB = 16 * 1024
+# Сколько подготовленных запросов хранить в каждом соединении
+SQLITE_CACHED_STATEMENTS = 256
+# Сколько ждать, пока база занята другим процессом
+SQLITE_BUSY_TIMEOUT_MS = 5000
+# Сколько людей загружать за один запрос при постраничной выборке
+PERSONS_PAGE_SIZE = 200
+
 # Настройки приложения
 APP_NAME = "PDF Signature Tool"
 APP_VERSION = "1.0.0"
@@ -16,6 +30,19 @@ APP_VERSION = "1.0.0"
 DEFAULT_DPI = 72
 PDF_QUALITY = 95
 
+# Способ наложения подписи: 'xobject' (напрямую) или 'reportlab' (через canvas)
+OVERLAY_MODE = 'xobject'
+# Способ записи результата: 'incremental' (дописать обновление к шаблону),
+# 'rewrite' (полная перезапись документа) или 'compact' (перезапись
+# с потоками объектов, сжатием и объединением одинаковых объектов)
+OUTPUT_MODE = 'incremental'
+# Уровень сжатия данных подписи (zlib, 0-9)
+SIGNATURE_COMPRESSION_LEVEL = 6
+# Уровень сжатия потоков в режиме 'compact' (zlib, 0-9)
+COMPACT_COMPRESSION_LEVEL = 6
+# Сколько объектов упаковывается в один поток объектов в режиме 'compact'
+COMPACT_OBJECTS_PER_STREAM = 100
+
 # Поддерживаемые форматы
 SUPPORTED_IMAGE_FORMATS = ['.png', '.jpg', '.jpeg']
 SUPPORTED_PDF_FORMATS = ['.pdf']
@@ -25,7 +52,83 @@ WINDOW_MIN_WIDTH = 1000
 WINDOW_MIN_HEIGHT = 700
 PREVIEW_MAX_WIDTH = 800
 PREVIEW_MAX_HEIGHT = 1000
+# Разрешение отрисовки страниц для предварительного просмотра
+PREVIEW_DPI = 100
+# Максимальный объем кэша отрисованных страниц в байтах
+PREVIEW_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# Частые изменения позиции подписи перерисовываются не чаще одного раза за этот интервал (~60 кадров/с)
+PREVIEW_FRAME_INTERVAL_MS = 16
+# Разрешение быстрой предварительной отрисовки, которая показывается до полной
+PREVIEW_PLACEHOLDER_DPI = 24
+# Сколько соседних страниц с каждой стороны отрисовывать заранее
+PREVIEW_PREFETCH_PAGES = 1
+# Количество потоков отрисовки страниц
+PREVIEW_RENDER_THREADS = 2
+# Задержка поиска в списках людей после последнего нажатия клавиши
+PERSON_SEARCH_DELAY_MS = 300
+
+# Настройки пакетной обработки
+# Количество процессов (1 - без пула процессов, 0 - по числу ядер);
+# пул запускается, только если задано больше одного процесса.
+# По умолчанию - по числу ядер, но не больше 4: каждый процесс держит свою копию шаблона
+BATCH_WORKERS = min(os.cpu_count() or 1, 4)
+# Сколько людей отправляется процессу за один раз
+BATCH_CHUNK_SIZE = 8
+# Пакеты меньше этого размера обрабатываются последовательно
+BATCH_PARALLEL_THRESHOLD = 20
+# Состояние задания сохраняется в базу после стольких готовых документов
+JOB_CHECKPOINT_ITEMS = 50
+# ... или не реже, чем раз в столько секунд
+JOB_CHECKPOINT_SECONDS = 2
+# Сколько последних завершенных заданий хранить в базе (старые удаляются при создании нового)
+JOB_HISTORY_SIZE = 50
+# Манифест сборки в папке результата: входные данные каждого созданного файла,
+# чтобы при повторном запуске не создавать заново неизмененные документы
+BUILD_MANIFEST_FILENAME = '.build_manifest.json'
+# Как часто манифест записывается во время обработки, в секундах
+BUILD_MANIFEST_SAVE_SECONDS = 10
+# Количество потоков подготовки подписей при массовом импорте (None - по числу ядер)
+IMPORT_WORKERS = None
+
+# Метрики пакетной обработки
+# Верхние границы корзин гистограмм времени этапов, в миллисекундах
+METRICS_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Префикс имен метрик в текстовом формате Prometheus
+METRICS_PROMETHEUS_PREFIX = 'signature_pdf'
+
+# Кэш PDF шаблонов
+# Сколько файлов хранить в кэше метаданных (число страниц, размеры, отпечаток)
+PDF_PROBE_CACHE_SIZE = 128
+# Сколько разобранных шаблонов хранить в памяти
+PDF_TEMPLATE_CACHE_SIZE = 16
+# Максимальная суммарная оценка памяти разобранных шаблонов, в байтах
+PDF_TEMPLATE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Оценка памяти одного объекта PDF после разбора (словари PyPDF2), в байтах
+PDF_OBJECT_MEMORY_ESTIMATE = 2048
 
 # Настройки подписи
 DEFAULT_SIGNATURE_WIDTH = 150
-DEFAULT_SIGNATURE_HEIGHT = 50
\ No newline at end of file
+DEFAULT_SIGNATURE_HEIGHT = 50
+# Максимальный объем кэша декодированных подписей в байтах
+IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Файлы подписей хранятся под хэшем содержимого во вложенных папках:
+# сколько уровней папок (по 2 символа хэша) использовать
+SIGNATURE_SHARD_LEVELS = 2
+
+# Предкомпилированные подписи (создаются при добавлении человека)
+SIGNATURE_ASSET_EXTENSION = '.sigasset'
+SIGNATURE_ASSET_MAX_SIDE = 1200
+SIGNATURE_ASSET_COMPRESSION_LEVEL = 9
+
+# Миниатюры подписей для списка людей (хранятся в базе данных)
+THUMBNAIL_WIDTH = 200
+THUMBNAIL_HEIGHT = 80
+# Число цветов палитры PNG миниатюры (подпись обычно одного цвета)
+THUMBNAIL_COLORS = 16
+# Сколько миниатюр создавать и записывать за один раз при заполнении
+THUMBNAIL_BACKFILL_BATCH = 100
+# Как часто список показывает миниатюры, созданные фоновым заполнением
+THUMBNAIL_REFRESH_INTERVAL_MS = 1000
+# Максимальный объем кэша декодированных миниатюр в байтах
+THUMBNAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024
\ No newline at end of file
@@ -0,0 +1,170 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+from core.metrics import Metrics
+from core.render_notes import RenderNotes
+from config.settings import BATCH_CHUNK_SIZE
+
+# Состояние процесса-обработчика: процессор и загруженный шаблон
+_worker_state = {}
+
+
+def _init_worker(pdf_path, position, options, render=False, collect_metrics=False):
+    """
+    Прогрев процесса: шаблон разбирается один раз на весь срок жизни процесса
+    
+    Ошибка загрузки шаблона не прерывает инициализацию (иначе пул ломается
+    целиком), а возвращается как ошибка каждого человека.
+    """
+    from core.signature_processor import SignatureProcessor
+    
+    processor = SignatureProcessor(workers=1, **options)
+    _worker_state['processor'] = processor
+    _worker_state['pdf_path'] = pdf_path
+    _worker_state['position'] = position
+    _worker_state['render'] = render
+    _worker_state['collect_metrics'] = collect_metrics
+    _worker_state['error'] = None
+    if not collect_metrics:
+        _load_template(processor, pdf_path)
+        return
+    # Разбор шаблона попадает в замеры первой части пакета
+    with Metrics.collect() as metrics:
+        _load_template(processor, pdf_path)
+    _worker_state['metrics'] = metrics
+
+
+def _load_template(processor, pdf_path):
+    """Загрузить шаблон процесса-обработчика, запомнив ошибку загрузки"""
+    try:
+        _worker_state['template'] = processor.pdf_handler.load_template(pdf_path)
+    except Exception as e:
+        _worker_state['template'] = None
+        _worker_state['error'] = f"Ошибка загрузки шаблона: {str(e)}"
+
+
+def _process_person(person):
+    """
+    Обработать одного человека в процессе-обработчике
+    
+    Returns:
+        (результат или None, сообщение об ошибке или None, замечания к документу)
+    """
+    processor = _worker_state['processor']
+    if _worker_state['error'] is not None:
+        return None, _worker_state['error'], []
+    with RenderNotes.capture() as notes:
+        try:
+            if _worker_state['render']:
+                # Документ возвращается байтами, записывает его основной процесс
+                result = processor.render_single(
+                    _worker_state['pdf_path'],
+                    person,
+                    _worker_state['position'],
+                    template=_worker_state['template']
+                )
+            else:
+                result = processor.process_single(
+                    _worker_state['pdf_path'],
+                    person,
+                    _worker_state['position'],
+                    template=_worker_state['template']
+                )
+            return result, None, notes
+        except Exception as e:
+            return None, str(e), notes
+
+
+def _process_chunk(persons):
+    """
+    Обработать часть пакета в процессе-обработчике
+    
+    Returns:
+        (результаты, StageMetrics с замерами этапов или None)
+    """
+    if not _worker_state['collect_metrics']:
+        return [_process_person(person) for person in persons], None
+    
+    with Metrics.collect(_worker_state.pop('metrics', None)) as metrics:
+        results = [_process_person(person) for person in persons]
+    return results, metrics
+
+
+class BatchEngine:
+    """Параллельная обработка пакета в пуле процессов"""
+    
+    def __init__(self, workers=None, chunk_size=BATCH_CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+    
+    def run(self, pdf_path, persons, position, options=None, render=False):
+        """
+        Обработать людей в пуле процессов
+        
+        Результаты выдаются в порядке списка persons по мере готовности,
+        поэтому прогресс можно показывать сразу. options передаются
+        в конструктор SignatureProcessor в каждом процессе. Если в потоке
+        собираются метрики (Metrics.collect), замеры этапов процессов
+        возвращаются вместе с результатами и добавляются к ним. В обработке
+        одновременно не больше двух частей пакета на процесс, поэтому
+        результаты (в режиме render - байты документов) не накапливаются,
+        даже если основной процесс записывает их медленнее. Если процесс
+        пула аварийно завершился, люди его частей и всех следующих частей
+        получают ошибку, а пакет не прерывается.
+        
+        Yields:
+            (путь к файлу или (имя файла, байты PDF) в режиме render, или None,
+             сообщение об ошибке или None, список замечаний к документу)
+        """
+        workers = min(self.workers, len(persons)) or 1
+        chunks = (
+            persons[start:start + self.chunk_size]
+            for start in range(0, len(persons), self.chunk_size)
+        )
+        
+        # spawn безопаснее fork, когда пул запускается из потока Qt
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(pdf_path, position, options or {}, render, Metrics.current() is not None)
+        ) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, self._submit(executor, chunk)))
+                if len(pending) >= workers * 2:
+                    yield from self._chunk_results(*pending.popleft())
+            while pending:
+                yield from self._chunk_results(*pending.popleft())
+    
+    @staticmethod
+    def _submit(executor, chunk):
+        """
+        Отправить часть пакета в пул
+        
+        Returns:
+            Future или исключение, если пул уже сломан
+        """
+        try:
+            return executor.submit(_process_chunk, chunk)
+        except Exception as e:
+            return e
+    
+    @staticmethod
+    def _chunk_results(chunk, future):
+        """
+        Результаты части пакета; ее замеры добавляются к метрикам потока
+        
+        При сбое пула (BrokenProcessPool) каждый человек части получает ошибку.
+        """
+        try:
+            if isinstance(future, Exception):
+                raise future
+            results, metrics = future.result()
+        except Exception as e:
+            message = f"Сбой процесса-обработчика: {str(e) or type(e).__name__}"
+            return [(None, message, [])] * len(chunk)
+        Metrics.merge(metrics)
+        return results
\ No newline at end of file
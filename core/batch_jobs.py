@@ -0,0 +1,201 @@
+from core.signature_processor import SignatureProcessor
+from core.output_sinks import DirectorySink
+from core.pdf_handler import PDFHandler
+from database.db_manager import DatabaseManager
+from database.models import BatchJob
+from config.settings import (OUTPUT_DIR, OUTPUT_MODE, JOB_CHECKPOINT_ITEMS, JOB_CHECKPOINT_SECONDS,
+                             JOB_HISTORY_SIZE)
+import os
+import time
+
+class BatchJobRunner:
+    """
+    Пакетная обработка с сохранением состояния в базе данных
+    
+    Задание (шаблон, позиция, папка результата и люди) записывается в базу
+    до начала обработки, а состояние строк сохраняется контрольными точками
+    по мере готовности документов. Прерванное задание можно продолжить:
+    готовые строки пропускаются, если их файлы на месте и не изменились,
+    остальные обрабатываются заново. Документы, входные данные которых
+    не изменились с прошлого запуска, не создаются заново (BuildManifest),
+    если не задан force.
+    
+    Продолжение возможно только для результата в папке: ZIP архив и общий
+    PDF появляются целиком при закрытии и не могут быть дописаны.
+    """
+    
+    def __init__(self, db_manager=None, workers=None, force=False):
+        self.db_manager = db_manager or DatabaseManager()
+        self.workers = workers
+        # Создавать заново и документы с неизмененными входными данными
+        self.force = force
+        # Сколько строк последнего run не обрабатывалось заново
+        self.skipped = 0
+        # Замечания к документам последнего запуска: путь к файлу -> список сообщений
+        self.notes = {}
+    
+    def create(self, pdf_path, persons, position, output_dir=OUTPUT_DIR, output_mode=OUTPUT_MODE):
+        """
+        Сохранить новое задание
+        
+        Завершенные задания сверх JOB_HISTORY_SIZE последних при этом удаляются,
+        чтобы база не росла с каждым пакетом.
+        
+        Returns:
+            BatchJob
+        """
+        probe = PDFHandler.probe(pdf_path)
+        if probe.error is not None:
+            raise ValueError(probe.error)
+        
+        job = BatchJob(
+            template_path=pdf_path,
+            template_fingerprint=probe.fingerprint,
+            position=position,
+            output_dir=output_dir,
+            output_mode=output_mode
+        )
+        self.db_manager.delete_finished_jobs(keep=JOB_HISTORY_SIZE)
+        job.id = self.db_manager.create_job(job, [person.id for person in persons])
+        return self.db_manager.get_job(job.id)
+    
+    @staticmethod
+    def verify_output(item):
+        """Файл готовой строки на месте и совпадает с записанным при обработке"""
+        if item.status != 'done' or not item.output_path:
+            return False
+        try:
+            stat = os.stat(item.output_path)
+        except OSError:
+            return False
+        return stat.st_size == item.output_size and stat.st_mtime_ns == item.output_mtime_ns
+    
+    def iter_run(self, job_id, is_cancelled=None):
+        """
+        Выполнить или продолжить задание, выдавая строки по мере готовности
+        
+        Args:
+            job_id: ID задания
+            is_cancelled: функция, возвращающая True, чтобы прервать задание
+                (его можно будет продолжить)
+        
+        Yields:
+            (BatchJobItem, Person или None, True если документ не создавался заново:
+            строка готова с прошлого запуска или не изменились входные данные)
+        """
+        job = self.db_manager.get_job(job_id)
+        if job is None:
+            raise ValueError(f"Задание {job_id} не найдено")
+        
+        probe = PDFHandler.probe(job.template_path)
+        if probe.error is not None:
+            raise ValueError(probe.error)
+        if probe.fingerprint != job.template_fingerprint:
+            raise ValueError(
+                f"Шаблон изменился после создания задания (изменением считается и новое "
+                f"время изменения файла, например после touch): {job.template_path}"
+            )
+        
+        self.notes = {}
+        items = self.db_manager.get_job_items(job_id)
+        persons_by_id = {
+            person.id: person
+            for person in self.db_manager.get_persons_by_ids({item.person_id for item in items})
+        }
+        
+        # Готовые строки с испорченными или удаленными файлами обрабатываются заново
+        pending = []
+        for item in items:
+            if self.verify_output(item):
+                yield item, persons_by_id.get(item.person_id), True
+            else:
+                pending.append(item)
+        
+        self.db_manager.set_job_status(job_id, 'running')
+        checkpoint = []
+        last_checkpoint = time.monotonic()
+        cancelled = False
+        
+        try:
+            missing = [item for item in pending if item.person_id not in persons_by_id]
+            for item in missing:
+                item.status, item.output_path, item.error = 'failed', None, "Человек удален из базы"
+                checkpoint.append(item)
+                yield item, None, False
+            
+            pending = [item for item in pending if item.person_id in persons_by_id]
+            if pending:
+                os.makedirs(job.output_dir, exist_ok=True)
+                processor = SignatureProcessor(workers=self.workers, output_mode=job.output_mode,
+                                               output_dir=job.output_dir)
+                results = processor.iter_batch(
+                    job.template_path,
+                    [persons_by_id[item.person_id] for item in pending],
+                    job.position,
+                    sink=DirectorySink(job.output_dir),
+                    force=self.force
+                )
+                
+                for item, (person, output_path, error) in zip(pending, results):
+                    self._finish_item(item, output_path, error)
+                    if output_path in processor.notes:
+                        self.notes[output_path] = processor.notes[output_path]
+                    checkpoint.append(item)
+                    
+                    if (len(checkpoint) >= JOB_CHECKPOINT_ITEMS
+                            or time.monotonic() - last_checkpoint >= JOB_CHECKPOINT_SECONDS):
+                        self.db_manager.save_job_items(checkpoint)
+                        checkpoint = []
+                        last_checkpoint = time.monotonic()
+                    
+                    yield item, person, output_path in processor.skipped
+                    
+                    if is_cancelled is not None and is_cancelled():
+                        cancelled = True
+                        results.close()
+                        break
+        finally:
+            # Контрольная точка и при ошибке, и при прерывании
+            self.db_manager.save_job_items(checkpoint)
+            job = self.db_manager.get_job(job_id)
+            if cancelled or job.done + job.failed < job.total:
+                status = 'interrupted'
+            else:
+                status = 'completed' if job.finished else 'failed'
+            self.db_manager.set_job_status(job_id, status)
+    
+    @staticmethod
+    def _finish_item(item, output_path, error):
+        """Записать в строку результат обработки"""
+        if error is not None:
+            item.status, item.output_path, item.output_size, item.output_mtime_ns = 'failed', None, None, None
+            item.error = error
+            return
+        
+        # Файл не перечитывается: при продолжении сравниваются размер и время изменения
+        stat = os.stat(output_path)
+        item.status, item.output_path, item.error = 'done', output_path, None
+        item.output_size, item.output_mtime_ns = stat.st_size, stat.st_mtime_ns
+    
+    def run(self, job_id, progress_callback=None, is_cancelled=None):
+        """
+        Выполнить или продолжить задание
+        
+        Args:
+            job_id: ID задания
+            progress_callback: функция (обработано, всего, имя)
+            is_cancelled: функция, возвращающая True, чтобы прервать задание
+        
+        Returns:
+            BatchJob с итоговым состоянием
+        """
+        job = self.db_manager.get_job(job_id)
+        self.skipped = 0
+        for i, (item, person, skipped) in enumerate(self.iter_run(job_id, is_cancelled), 1):
+            self.skipped += skipped
+            if progress_callback:
+                name = person.name if person else f"ID {item.person_id}"
+                if item.status == 'failed':
+                    name = f"Ошибка: {name}"
+                progress_callback(i, job.total, name)
+        return self.db_manager.get_job(job_id)
\ No newline at end of file
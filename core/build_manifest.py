@@ -0,0 +1,126 @@
+from utils.file_utils import FileUtils
+from config.settings import BUILD_MANIFEST_FILENAME
+import hashlib
+import json
+import os
+import re
+
+# Имя файла в хранилище подписей - SHA-256 его содержимого
+STORE_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BuildManifest:
+    """
+    Манифест сборки папки результата
+    
+    Для каждого созданного файла записывается хэш входных данных (отпечаток
+    шаблона, содержимое подписи, позиция и параметры вывода), а также размер
+    и время изменения файла. Документ создается заново, только если входные
+    данные изменились или файл изменен либо удален, как при сборке make.
+    
+    Манифест лежит в самой папке результата, поэтому переносится вместе с ней.
+    """
+    
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, BUILD_MANIFEST_FILENAME)
+        # Имя файла -> {'inputs': хэш входных данных, 'size', 'mtime_ns'}
+        self.entries = {}
+        self.changed = False
+        # Хэши файлов подписей, посчитанные за время сборки
+        self._signature_hashes = {}
+    
+    @staticmethod
+    def load(output_dir):
+        """Прочитать манифест папки (пустой, если его нет или он поврежден)"""
+        manifest = BuildManifest(output_dir)
+        if not os.path.exists(manifest.path):
+            return manifest
+        try:
+            with open(manifest.path, encoding='utf-8') as f:
+                data = json.load(f)
+            manifest.entries = data.get('outputs', {})
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Ошибка чтения манифеста сборки {manifest.path}: {str(e)}")
+        return manifest
+    
+    def save(self):
+        """Записать манифест, если он изменился"""
+        if not self.changed:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Временный файл и переименование: манифест не бывает недописанным
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'outputs': self.entries}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.changed = False
+        except OSError as e:
+            print(f"Ошибка записи манифеста сборки {self.path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def signature_hash(self, path):
+        """
+        SHA-256 содержимого файла подписи или None, если файла нет
+        
+        Для файлов хранилища хэш берется из имени, остальные читаются
+        один раз за сборку.
+        """
+        name = os.path.splitext(os.path.basename(path))[0]
+        if STORE_NAME_PATTERN.match(name):
+            return name
+        
+        if path not in self._signature_hashes:
+            try:
+                self._signature_hashes[path] = FileUtils.hash_file(path)
+            except OSError:
+                self._signature_hashes[path] = None
+        return self._signature_hashes[path]
+    
+    def input_key(self, template_fingerprint, person, position, options):
+        """
+        Хэш входных данных документа
+        
+        Args:
+            template_fingerprint: отпечаток шаблона (PDFProbe.fingerprint)
+            person: Person
+            position: SignaturePosition
+            options: параметры вывода (SignatureProcessor.get_render_options)
+        """
+        inputs = {
+            'template': template_fingerprint,
+            'signature': self.signature_hash(person.signature_path),
+            # Предкомпилированная подпись, которая встраивается вместо исходного файла
+            'asset': person.asset_hash,
+            'position': position.to_dict(),
+            'options': options,
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def is_current(self, filename, key):
+        """Файл создан из тех же входных данных и с тех пор не изменялся"""
+        entry = self.entries.get(filename)
+        if not entry or entry.get('inputs') != key:
+            return False
+        try:
+            stat = os.stat(os.path.join(self.output_dir, filename))
+        except OSError:
+            return False
+        return stat.st_size == entry.get('size') and stat.st_mtime_ns == entry.get('mtime_ns')
+    
+    def record(self, filename, key):
+        """Запомнить только что созданный файл (файл не перечитывается)"""
+        stat = os.stat(os.path.join(self.output_dir, filename))
+        self.entries[filename] = {
+            'inputs': key,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        }
+        self.changed = True
+    
+    def forget(self, filename):
+        """Забыть файл, который не удалось создать"""
+        if self.entries.pop(filename, None) is not None:
+            self.changed = True
\ No newline at end of file
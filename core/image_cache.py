@@ -0,0 +1,83 @@
+from collections import OrderedDict
+import os
+import threading
+
+class SignatureImageCache:
+    """Ограниченный по памяти LRU кэш декодированных и предкомпилированных подписей"""
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(path, width=None, height=None):
+        """
+        Ключ кэша для файла подписи
+        
+        Путь, время изменения и размер файла делают ключ недействительным
+        после замены файла; width и height равны None для исходного изображения.
+        """
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, width, height)
+    
+    @staticmethod
+    def entry_size(entry):
+        """Объем памяти, занимаемый записью (изображением PIL или SignatureAsset), в байтах"""
+        if hasattr(entry, 'nbytes'):
+            return entry.nbytes
+        return entry.width * entry.height * len(entry.getbands())
+    
+    def get(self, key):
+        """Получить изображение из кэша или None"""
+        with self._lock:
+            img = self._items.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            
+            self._items.move_to_end(key)
+            self.hits += 1
+            return img
+    
+    def put(self, key, img):
+        """Положить изображение в кэш, вытесняя самые старые записи"""
+        size = self.entry_size(img)
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= self.entry_size(old)
+            
+            self._items[key] = img
+            self._bytes += size
+            
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= self.entry_size(evicted)
+                self.evictions += 1
+    
+    def clear(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        """Статистика кэша"""
+        with self._lock:
+            return {
+                'items': len(self._items),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
\ No newline at end of file
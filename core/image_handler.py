@@ -1,28 +1,82 @@
 from PIL import Image
+from core.image_cache import SignatureImageCache
+from core.signature_asset import SignatureAsset
+from core.metrics import Metrics
+from config.settings import IMAGE_CACHE_MAX_BYTES
 import os
 
 class ImageHandler:
     """Обработчик изображений подписей"""
     
+    # Общий кэш декодированных подписей; изображения из кэша нельзя изменять
+    cache = SignatureImageCache(IMAGE_CACHE_MAX_BYTES)
+    
     @staticmethod
     def load_signature(path):
         """Загрузить изображение подписи"""
         if not os.path.exists(path):
             raise FileNotFoundError(f"Файл подписи не найден: {path}")
         
-        try:
-            img = Image.open(path)
-            # Конвертируем в RGBA если нужно
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
+        key = SignatureImageCache.make_key(path)
+        img = ImageHandler.cache.get(key)
+        if img is not None:
             return img
+        
+        try:
+            with Metrics.stage('load') as sample:
+                sample.bytes = key[2]
+                img = Image.open(path)
+                # Конвертируем в RGBA если нужно
+                if img.mode != 'RGBA':
+                    img = img.convert('RGBA')
+                else:
+                    img.load()
         except Exception as e:
             raise Exception(f"Ошибка загрузки изображения: {str(e)}")
+        
+        ImageHandler.cache.put(key, img)
+        return img
     
     @staticmethod
     def resize_signature(img, width, height):
         """Изменить размер подписи"""
-        return img.resize((int(width), int(height)), Image.Resampling.LANCZOS)
+        with Metrics.stage('resize') as sample:
+            sample.bytes = int(width) * int(height) * len(img.getbands())
+            return img.resize((int(width), int(height)), Image.Resampling.LANCZOS)
+    
+    @staticmethod
+    def load_resized_signature(path, width, height):
+        """Загрузить подпись сразу нужного размера, используя кэш"""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Файл подписи не найден: {path}")
+        
+        key = SignatureImageCache.make_key(path, int(width), int(height))
+        img = ImageHandler.cache.get(key)
+        if img is not None:
+            return img
+        
+        img = ImageHandler.resize_signature(ImageHandler.load_signature(path), width, height)
+        ImageHandler.cache.put(key, img)
+        return img
+    
+    @staticmethod
+    def load_signature_asset(asset_path):
+        """Загрузить предкомпилированную подпись (без Pillow), используя кэш"""
+        key = SignatureImageCache.make_key(asset_path)
+        asset = ImageHandler.cache.get(key)
+        if asset is not None:
+            return asset
+        
+        with Metrics.stage('load') as sample:
+            sample.bytes = key[2]
+            asset = SignatureAsset.load(asset_path)
+        ImageHandler.cache.put(key, asset)
+        return asset
+    
+    @staticmethod
+    def cache_stats():
+        """Статистика кэша подписей (попадания, промахи, объем)"""
+        return ImageHandler.cache.stats()
     
     @staticmethod
     def validate_image(path):
@@ -0,0 +1,307 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from config.settings import METRICS_BUCKETS_MS, METRICS_PROMETHEUS_PREFIX
+import json
+import os
+import threading
+
+# Этапы обработки документа в порядке выполнения и их названия для сводки
+STAGES = {
+    'parse': "Разбор шаблона",
+    'load': "Загрузка подписи",
+    'resize': "Масштабирование",
+    'overlay': "Сборка подписи",
+    'merge': "Наложение",
+    'write': "Запись",
+}
+
+# Состояния документов пакета и их названия для сводки
+DOCUMENT_STATUSES = {
+    'ok': "создано",
+    'skipped': "без изменений",
+    'failed': "ошибок",
+}
+
+
+class Histogram:
+    """Гистограмма длительностей этапа с суммарным объемом данных"""
+    
+    def __init__(self, bounds):
+        # Верхние границы корзин в секундах; последняя корзина - +Inf
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.bytes = 0
+    
+    def observe(self, seconds, size=0):
+        """Добавить замер"""
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.bytes += size
+    
+    def merge(self, other):
+        """Добавить замеры другой гистограммы с теми же границами"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        self.bytes += other.bytes
+    
+    def quantile(self, q):
+        """Оценка квантиля в секундах (линейно внутри корзины, как histogram_quantile)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.bounds):
+                    return self.max
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = min(self.bounds[i], self.max)
+                return lower + (max(upper, lower) - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+    
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_s': round(self.sum, 6),
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.5) * 1000, 3),
+            'p95_ms': round(self.quantile(0.95) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'bytes': self.bytes,
+            'buckets': {
+                str(bound): count for bound, count in zip(list(self.bounds) + ['+Inf'], self.counts)
+            },
+        }
+
+
+class StageSample:
+    """Одно выполнение этапа: обработанный объем задается внутри блока замера"""
+    
+    __slots__ = ('bytes',)
+    
+    def __init__(self):
+        self.bytes = 0
+
+
+class StageMetrics:
+    """
+    Время и объем данных по этапам обработки пакета
+    
+    Для каждого этапа хранится гистограмма, поэтому замеры процессов-обработчиков
+    складываются с замерами основного процесса без передачи отдельных значений.
+    Время вложенного этапа (например, сборки подписи внутри наложения)
+    не входит во время внешнего, так что сумма этапов равна общему времени работы.
+    """
+    
+    def __init__(self, bounds_ms=METRICS_BUCKETS_MS):
+        self.bounds = tuple(bound / 1000 for bound in bounds_ms)
+        self.stages = {}
+        # Счетчики документов: 'ok', 'failed', 'skipped'
+        self.documents = {}
+        # Время сбора метрик в основном процессе, в секундах
+        self.elapsed = 0.0
+        # Время вложенных этапов, выполняющихся сейчас
+        self._nested = []
+    
+    def observe(self, stage, seconds, size=0):
+        """Добавить замер этапа"""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(self.bounds)
+        histogram.observe(seconds, size)
+    
+    def count_document(self, status):
+        """Учесть документ пакета ('ok', 'failed' или 'skipped')"""
+        self.documents[status] = self.documents.get(status, 0) + 1
+    
+    def merge(self, other):
+        """Добавить замеры этапов другого сборщика (процесса-обработчика)"""
+        for stage, histogram in other.stages.items():
+            if stage not in self.stages:
+                self.stages[stage] = Histogram(self.bounds)
+            self.stages[stage].merge(histogram)
+        for status, count in other.documents.items():
+            self.documents[status] = self.documents.get(status, 0) + count
+    
+    def ordered_stages(self):
+        """(этап, Histogram) в порядке выполнения этапов"""
+        order = list(STAGES) + sorted(set(self.stages) - set(STAGES))
+        return [(stage, self.stages[stage]) for stage in order if stage in self.stages]
+    
+    def to_dict(self):
+        """Отчет в формате JSON"""
+        return {
+            'elapsed_s': round(self.elapsed, 3),
+            'documents': dict(self.documents),
+            'stages': {stage: histogram.to_dict() for stage, histogram in self.ordered_stages()},
+        }
+    
+    def to_prometheus(self, prefix=METRICS_PROMETHEUS_PREFIX):
+        """Метрики в текстовом формате Prometheus (для textfile collector node exporter)"""
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Время этапа обработки документа",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in self.ordered_stages():
+            cumulative = 0
+            for bound, count in zip(self.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+        
+        lines.append(f"# HELP {prefix}_stage_bytes_total Объем данных, обработанных на этапе")
+        lines.append(f"# TYPE {prefix}_stage_bytes_total counter")
+        for stage, histogram in self.ordered_stages():
+            lines.append(f'{prefix}_stage_bytes_total{{stage="{stage}"}} {histogram.bytes}')
+        
+        lines.append(f"# HELP {prefix}_documents_total Документы последнего пакета")
+        lines.append(f"# TYPE {prefix}_documents_total counter")
+        for status, count in sorted(self.documents.items()):
+            lines.append(f'{prefix}_documents_total{{status="{status}"}} {count}')
+        
+        lines.append(f"# HELP {prefix}_batch_duration_seconds Время обработки последнего пакета")
+        lines.append(f"# TYPE {prefix}_batch_duration_seconds gauge")
+        lines.append(f"{prefix}_batch_duration_seconds {self.elapsed:.3f}")
+        return '\n'.join(lines) + '\n'
+    
+    def format_summary(self):
+        """Сводка по этапам для показа пользователю"""
+        documents = ', '.join(
+            f"{title}: {self.documents[status]}"
+            for status, title in DOCUMENT_STATUSES.items() if status in self.documents
+        )
+        lines = [
+            f"Время: {self.elapsed:.2f} с; документы - {documents or 'нет'}",
+            f"{'Этап':<18}{'Раз':>8}{'Всего, с':>10}{'Сред., мс':>11}{'p95, мс':>10}{'Объем':>11}",
+        ]
+        total = sum(histogram.sum for histogram in self.stages.values())
+        for stage, histogram in self.ordered_stages():
+            lines.append(
+                f"{STAGES.get(stage, stage):<18}{histogram.count:>8}{histogram.sum:>10.2f}"
+                f"{histogram.sum / histogram.count * 1000:>11.2f}{histogram.quantile(0.95) * 1000:>10.2f}"
+                f"{format_bytes(histogram.bytes):>11}"
+                + (f"  {histogram.sum / total:.0%}" if total else "")
+            )
+        return '\n'.join(lines)
+    
+    def write_json(self, path):
+        """Записать отчет JSON"""
+        _write_atomic(path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2))
+    
+    def write_prometheus(self, path):
+        """Записать метрики Prometheus (файл заменяется целиком, как требует textfile collector)"""
+        _write_atomic(path, self.to_prometheus())
+
+
+def format_bytes(size):
+    """Объем в байтах в читаемом виде"""
+    for unit in ('Б', 'КБ', 'МБ'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'Б' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+
+def _write_atomic(path, text):
+    """Записать файл через временный, чтобы читатели не видели его недописанным"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Metrics:
+    """
+    Сбор метрик этапов в текущем потоке
+    
+    Замеры пишутся в StageMetrics, активный в потоке (Metrics.collect);
+    без активного сборщика Metrics.stage ничего не замеряет, поэтому
+    предварительный просмотр и замеры benchmarks не смешиваются с пакетом.
+    """
+    
+    _local = threading.local()
+    
+    @staticmethod
+    def current():
+        """Активный в потоке StageMetrics или None"""
+        return getattr(Metrics._local, 'collector', None)
+    
+    @staticmethod
+    @contextmanager
+    def collect(metrics=None):
+        """
+        Собирать метрики в этом потоке внутри блока
+        
+        Args:
+            metrics: StageMetrics, в который добавлять замеры (по умолчанию новый)
+        
+        Yields:
+            StageMetrics
+        """
+        metrics = metrics if metrics is not None else StageMetrics()
+        previous = Metrics.current()
+        Metrics._local.collector = metrics
+        started = perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.elapsed += perf_counter() - started
+            Metrics._local.collector = previous
+    
+    @staticmethod
+    @contextmanager
+    def stage(name):
+        """
+        Замерить этап; объем данных задается через sample.bytes
+        
+        Yields:
+            StageSample
+        """
+        sample = StageSample()
+        metrics = Metrics.current()
+        if metrics is None:
+            yield sample
+            return
+        
+        metrics._nested.append(0.0)
+        started = perf_counter()
+        try:
+            yield sample
+        finally:
+            elapsed = perf_counter() - started
+            nested = metrics._nested.pop()
+            if metrics._nested:
+                metrics._nested[-1] += elapsed
+            metrics.observe(name, elapsed - nested, sample.bytes)
+    
+    @staticmethod
+    def count_document(status):
+        """Учесть документ в активном сборщике"""
+        metrics = Metrics.current()
+        if metrics is not None:
+            metrics.count_document(status)
+    
+    @staticmethod
+    def merge(other):
+        """Добавить в активный сборщик замеры процесса-обработчика"""
+        metrics = Metrics.current()
+        if metrics is not None and other is not None:
+            metrics.merge(other)
\ No newline at end of file
@@ -0,0 +1,344 @@
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, EncodedStreamObject,
+                            IndirectObject, NameObject, NumberObject, StreamObject, TextStringObject)
+from core.pdf_handler import PDFHandler
+from core.metrics import Metrics
+import os
+import zipfile
+
+class OutputSink:
+    """
+    Приемник готовых документов пакета
+    
+    Документы передаются по одному и записываются сразу, поэтому
+    результаты пакета никогда не держатся в памяти целиком.
+    """
+    
+    # Может ли приемник принимать документы, собранные в процессах-обработчиках
+    accepts_rendered = False
+    
+    def add_document(self, filename, title, template, stamps, options):
+        """
+        Записать документ с подписями
+        
+        Args:
+            filename: имя файла документа
+            title: название документа (имя человека)
+            template: PDFTemplate шаблона
+            stamps: список (подпись, SignaturePosition)
+            options: параметры PDFHandler.add_signatures_to_pdf (overlay_mode, output_mode)
+        
+        Returns:
+            Расположение документа для отчета
+        """
+        raise NotImplementedError
+    
+    def add_rendered(self, filename, title, data):
+        """Записать уже собранный документ (байты PDF)"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Завершить запись"""
+    
+    def abort(self):
+        """Прервать запись: недописанный результат удаляется (после close ничего не делает)"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        # При исключении незавершенный архив или общий PDF не публикуется
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class DirectorySink(OutputSink):
+    """Отдельный PDF файл на каждого человека в папке (по умолчанию)"""
+    
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+    
+    def add_document(self, filename, title, template, stamps, options):
+        output_path = os.path.join(self.output_dir, filename)
+        PDFHandler.add_signatures_to_pdf(template, output_path, stamps, **options)
+        return output_path
+    
+    def add_rendered(self, filename, title, data):
+        output_path = os.path.join(self.output_dir, filename)
+        with Metrics.stage('write') as sample:
+            sample.bytes = len(data)
+            with open(output_path, 'wb') as output_file:
+                output_file.write(data)
+        return output_path
+
+
+class PositionStream:
+    """Поток только для записи, считающий позицию (для потоков без tell)"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+    
+    def write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def flush(self):
+        pass
+
+
+class ZipSink(OutputSink):
+    """
+    Все документы пакета в одном ZIP архиве
+    
+    Каждый документ пишется прямо в запись архива, без промежуточных файлов.
+    Архив создается под временным именем и появляется только после close().
+    """
+    
+    accepts_rendered = True
+    
+    def __init__(self, path, compression=zipfile.ZIP_STORED):
+        self.path = path
+        self.tmp_path = path + '.part'
+        # PDF уже сжат, поэтому по умолчанию записи не сжимаются повторно
+        self.archive = zipfile.ZipFile(self.tmp_path, 'w', compression=compression, allowZip64=True)
+        self.names = set()
+    
+    def _unique_name(self, filename):
+        """Имя записи без повторов (у людей могут совпадать имена)"""
+        base, ext = os.path.splitext(filename)
+        name = filename
+        index = 2
+        while name in self.names:
+            name = f"{base}_{index}{ext}"
+            index += 1
+        self.names.add(name)
+        return name
+    
+    def add_document(self, filename, title, template, stamps, options):
+        name = self._unique_name(filename)
+        with self.archive.open(name, 'w', force_zip64=True) as entry:
+            PDFHandler.add_signatures_to_pdf(template, PositionStream(entry), stamps, **options)
+        return f"{self.path}/{name}"
+    
+    def add_rendered(self, filename, title, data):
+        name = self._unique_name(filename)
+        with Metrics.stage('write') as sample:
+            sample.bytes = len(data)
+            with self.archive.open(name, 'w', force_zip64=True) as entry:
+                entry.write(data)
+        return f"{self.path}/{name}"
+    
+    def close(self):
+        if self.archive is None:
+            return
+        self.archive.close()
+        self.archive = None
+        os.replace(self.tmp_path, self.path)
+    
+    def abort(self):
+        if self.archive is None:
+            return
+        try:
+            self.archive.close()
+        finally:
+            self.archive = None
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+class ConcatenatedPDFSink(OutputSink):
+    """
+    Один PDF с разделом на каждого человека и закладкой с его именем
+    
+    Объекты пишутся в файл сразу. Объекты шаблона (шрифты, изображения,
+    потоки страниц) записываются один раз и общие для всех разделов;
+    для раздела пишутся только словари страниц и новые объекты подписей.
+    В памяти остаются только смещения объектов и список страниц.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + '.part'
+        self.stream = open(self.tmp_path, 'wb')
+        self.stream.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        
+        # idnum -> смещение объекта в файле
+        self.offsets = {}
+        self.next_id = 1
+        self.catalog_ref = self._reserve()
+        self.pages_ref = self._reserve()
+        self.outlines_ref = self._reserve()
+        
+        self.page_refs = []
+        # (заголовок, ссылка на первую страницу раздела)
+        self.sections = []
+        # (id(reader), idnum шаблона) -> ссылка в итоговом файле
+        self.imported = {}
+        self.templates = []
+        # Хэш подписи -> XObject, общий для всех разделов
+        self.xobjects = {}
+    
+    def _reserve(self):
+        """Выделить номер объекта"""
+        idnum = self.next_id
+        self.next_id += 1
+        return IndirectObject(idnum, 0, self)
+    
+    def _write(self, reference, obj):
+        """Записать объект в файл"""
+        self.offsets[reference.idnum] = self.stream.tell()
+        self.stream.write(f'{reference.idnum} 0 obj\n'.encode('ascii'))
+        obj.write_to_stream(self.stream, None)
+        self.stream.write(b'\nendobj\n')
+    
+    def _add_object(self, obj):
+        """Добавить новый объект (совместимо с PdfWriter._add_object)"""
+        reference = self._reserve()
+        self._write(reference, self._import(obj))
+        return reference
+    
+    def _import(self, obj):
+        """
+        Скопировать объект, заменяя ссылки на объекты шаблона ссылками
+        на их копии в итоговом файле; каждый объект шаблона копируется один раз
+        """
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is self:
+                return obj
+            key = (id(obj.pdf), obj.idnum)
+            reference = self.imported.get(key)
+            if reference is None:
+                reference = self._reserve()
+                self.imported[key] = reference
+                self._write(reference, self._import(obj.get_object()))
+            return reference
+        
+        if isinstance(obj, DictionaryObject):
+            if isinstance(obj, EncodedStreamObject):
+                copy = EncodedStreamObject()
+                copy._data = obj._data
+            elif isinstance(obj, StreamObject):
+                copy = DecodedStreamObject()
+                copy.set_data(obj.get_data())
+            else:
+                copy = DictionaryObject()
+            # Страницы шаблона, на которые ссылаются аннотации, не входят в дерево страниц
+            skip_parent = obj.get('/Type') == '/Page'
+            for key, value in obj.items():
+                if skip_parent and key == '/Parent':
+                    continue
+                copy[NameObject(key)] = self._import(value)
+            return copy
+        
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._import(item) for item in obj)
+        
+        return obj
+    
+    def add_document(self, filename, title, template, stamps, options):
+        # Держим шаблон, чтобы id(reader) в ключах imported оставались уникальными
+        if template not in self.templates:
+            self.templates.append(template)
+        
+        PDFHandler.check_stamp_pages(template, stamps)
+        # Объекты раздела пишутся в файл по мере сборки, поэтому
+        # наложение и запись замеряются вместе как запись
+        with Metrics.stage('write') as sample:
+            start = self.stream.tell()
+            pages = {}
+            for _, position in stamps:
+                if position.page not in pages:
+                    pages[position.page] = DictionaryObject(template.get_page(position.page))
+            PDFHandler.draw_stamps(self, template, pages, stamps, self.xobjects)
+            
+            first_page = None
+            for page_num in range(template.page_count):
+                # Страницы шаблона уже содержат унаследованные атрибуты (/Resources, /MediaBox)
+                page = pages.get(page_num)
+                if page is None:
+                    page = DictionaryObject(template.get_page(page_num))
+                page = self._import(page)
+                page[NameObject('/Parent')] = self.pages_ref
+                
+                reference = self._reserve()
+                self._write(reference, page)
+                self.page_refs.append(reference)
+                if first_page is None:
+                    first_page = reference
+            sample.bytes = self.stream.tell() - start
+        
+        self.sections.append((title, first_page))
+        return f"{self.path}#{len(self.sections)}"
+    
+    def close(self):
+        if self.stream is None:
+            return
+        
+        pages = DictionaryObject()
+        pages[NameObject('/Type')] = NameObject('/Pages')
+        pages[NameObject('/Kids')] = ArrayObject(self.page_refs)
+        pages[NameObject('/Count')] = NumberObject(len(self.page_refs))
+        self._write(self.pages_ref, pages)
+        
+        self._write_outlines()
+        
+        catalog = DictionaryObject()
+        catalog[NameObject('/Type')] = NameObject('/Catalog')
+        catalog[NameObject('/Pages')] = self.pages_ref
+        catalog[NameObject('/Outlines')] = self.outlines_ref
+        catalog[NameObject('/PageMode')] = NameObject('/UseOutlines')
+        self._write(self.catalog_ref, catalog)
+        
+        xref_offset = self.stream.tell()
+        self.stream.write(f'xref\n0 {self.next_id}\n0000000000 65535 f\r\n'.encode('ascii'))
+        for idnum in range(1, self.next_id):
+            self.stream.write(f'{self.offsets[idnum]:010d} 00000 n\r\n'.encode('ascii'))
+        
+        trailer = DictionaryObject()
+        trailer[NameObject('/Size')] = NumberObject(self.next_id)
+        trailer[NameObject('/Root')] = self.catalog_ref
+        self.stream.write(b'trailer\n')
+        trailer.write_to_stream(self.stream, None)
+        self.stream.write(f'\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+        
+        self.stream.close()
+        self.stream = None
+        self.templates = []
+        os.replace(self.tmp_path, self.path)
+    
+    def abort(self):
+        if self.stream is None:
+            return
+        self.stream.close()
+        self.stream = None
+        self.templates = []
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+    
+    def _write_outlines(self):
+        """Записать закладки: по одной на раздел"""
+        items = [self._reserve() for _ in self.sections]
+        for index, (title, first_page) in enumerate(self.sections):
+            item = DictionaryObject()
+            item[NameObject('/Title')] = TextStringObject(title)
+            item[NameObject('/Parent')] = self.outlines_ref
+            item[NameObject('/Dest')] = ArrayObject([first_page, NameObject('/Fit')])
+            if index > 0:
+                item[NameObject('/Prev')] = items[index - 1]
+            if index < len(items) - 1:
+                item[NameObject('/Next')] = items[index + 1]
+            self._write(items[index], item)
+        
+        outlines = DictionaryObject()
+        outlines[NameObject('/Type')] = NameObject('/Outlines')
+        if items:
+            outlines[NameObject('/First')] = items[0]
+            outlines[NameObject('/Last')] = items[-1]
+            outlines[NameObject('/Count')] = NumberObject(len(items))
+        self._write(self.outlines_ref, outlines)
\ No newline at end of file
@@ -0,0 +1,252 @@
+from PyPDF2.generic import (ArrayObject, DictionaryObject, EncodedStreamObject, IndirectObject,
+                            NameObject, StreamObject)
+from config.settings import COMPACT_COMPRESSION_LEVEL, COMPACT_OBJECTS_PER_STREAM
+from io import BytesIO
+import hashlib
+import zlib
+
+# Объекты с такими типами описывают структуру документа и не объединяются,
+# даже если совпадают побайтно (например, две одинаковые пустые страницы)
+STRUCTURAL_TYPES = ('/Catalog', '/Pages', '/Page', '/Annot', '/Outlines', '/Sig')
+
+
+class CompactWriter:
+    """
+    Компактная запись документа, собранного в PdfWriter
+    
+    - потоки без фильтра сжимаются FlateDecode;
+    - побайтно одинаковые объекты (шрифты, изображения, ресурсы) записываются один раз;
+    - обычные объекты упаковываются в сжатые потоки объектов (/ObjStm);
+    - таблица xref записывается сжатым потоком (/XRef).
+    
+    Требуется PDF 1.5 и новее.
+    """
+    
+    def __init__(self, writer, compression_level=COMPACT_COMPRESSION_LEVEL,
+                 objects_per_stream=COMPACT_OBJECTS_PER_STREAM):
+        self.writer = writer
+        self.compression_level = compression_level
+        self.objects_per_stream = max(1, objects_per_stream)
+        
+        # idnum в PdfWriter -> idnum объекта, который его заменяет
+        self.duplicates = {}
+        # idnum в PdfWriter -> номер в итоговом файле
+        self.numbers = {}
+    
+    def _prepare(self):
+        """Перенести в writer все объекты, на которые есть ссылки (как в PdfWriter.write)"""
+        writer = self.writer
+        if not writer._root:
+            writer._root = writer._add_object(writer._root_object)
+        writer._sweep_indirect_references(writer._root)
+        
+        return {
+            index + 1: obj
+            for index, obj in enumerate(writer._objects)
+            if obj is not None
+        }
+    
+    def _encode_stream(self, obj):
+        """Словарь и данные потока; потоки без фильтра сжимаются"""
+        if isinstance(obj, EncodedStreamObject):
+            return obj, obj._data
+        
+        data = obj.get_data()
+        if '/Filter' in obj:
+            return obj, data
+        
+        compressed = zlib.compress(data, self.compression_level)
+        if len(compressed) >= len(data):
+            return obj, data
+        
+        header = DictionaryObject(obj)
+        header[NameObject('/Filter')] = NameObject('/FlateDecode')
+        return header, compressed
+    
+    def _canonical(self, idnum):
+        """Номер объекта, который остается вместо дубликатов"""
+        while idnum in self.duplicates:
+            idnum = self.duplicates[idnum]
+        return idnum
+    
+    def _serialize(self, obj, out, number):
+        """
+        Записать объект, подставляя номера ссылок через функцию number
+        
+        Ссылки на отсутствующие объекты записываются как null.
+        """
+        if isinstance(obj, IndirectObject):
+            target = number(obj.idnum)
+            out.write(b'null' if target is None else f'{target} 0 R'.encode('ascii'))
+        elif isinstance(obj, DictionaryObject):
+            out.write(b'<<')
+            for key, value in obj.items():
+                NameObject(key).write_to_stream(out, None)
+                out.write(b' ')
+                self._serialize(value, out, number)
+            out.write(b'>>')
+        elif isinstance(obj, ArrayObject):
+            out.write(b'[')
+            for index, item in enumerate(obj):
+                if index:
+                    out.write(b' ')
+                self._serialize(item, out, number)
+            out.write(b']')
+        else:
+            obj.write_to_stream(out, None)
+    
+    def _stream_header(self, header, length, number):
+        """Словарь потока с правильной длиной и ключевое слово stream"""
+        out = BytesIO()
+        out.write(b'<<')
+        for key, value in header.items():
+            if key == '/Length':
+                continue
+            NameObject(key).write_to_stream(out, None)
+            out.write(b' ')
+            self._serialize(value, out, number)
+        out.write(f'/Length {length}>>\nstream\n'.encode('ascii'))
+        return out.getvalue()
+    
+    def _find_duplicates(self, objects, streams):
+        """Найти побайтно одинаковые объекты, пока находятся новые совпадения"""
+        def number(idnum):
+            return self._canonical(idnum) if idnum in objects else None
+        
+        while True:
+            seen = {}
+            found = False
+            for idnum, obj in objects.items():
+                if idnum in self.duplicates:
+                    continue
+                if isinstance(obj, DictionaryObject) and (
+                        obj.get('/Type') in STRUCTURAL_TYPES or '/Parent' in obj):
+                    continue
+                
+                digest = hashlib.sha256()
+                if idnum in streams:
+                    header, data = streams[idnum]
+                    digest.update(self._stream_header(header, len(data), number))
+                    digest.update(data)
+                else:
+                    out = BytesIO()
+                    self._serialize(obj, out, number)
+                    digest.update(out.getvalue())
+                digest = digest.digest()
+                
+                if digest in seen:
+                    self.duplicates[idnum] = seen[digest]
+                    found = True
+                else:
+                    seen[digest] = idnum
+            
+            # Объединение объектов меняет ссылки в других объектах,
+            # поэтому повторяем, пока появляются новые совпадения
+            if not found:
+                return
+    
+    def write(self, output_path):
+        """Записать документ в файл (путь или поток для записи)"""
+        if isinstance(output_path, str):
+            with open(output_path, 'wb') as output_file:
+                self.write(output_file)
+            return
+        
+        objects = self._prepare()
+        streams = {
+            idnum: self._encode_stream(obj)
+            for idnum, obj in objects.items()
+            if isinstance(obj, StreamObject)
+        }
+        self._find_duplicates(objects, streams)
+        
+        # Номера итогового файла идут подряд, без удаленных дубликатов
+        for idnum in objects:
+            if idnum not in self.duplicates:
+                self.numbers[idnum] = len(self.numbers) + 1
+        
+        def number(idnum):
+            if idnum not in objects:
+                return None
+            return self.numbers[self._canonical(idnum)]
+        
+        # Объекты собираются по одному и сразу пишутся в выходной поток
+        position = 0
+        
+        def emit(data):
+            nonlocal position
+            output_path.write(data)
+            position += len(data)
+        
+        version = max(self.writer.pdf_header, b'%PDF-1.5')
+        emit(version + b'\n%\xe2\xe3\xcf\xd3\n')
+        
+        # Номер -> (1, смещение) для обычной записи или (2, номер потока, индекс)
+        entries = {}
+        packed = []
+        for idnum, new_number in self.numbers.items():
+            if idnum in streams:
+                header, data = streams[idnum]
+                entries[new_number] = (1, position)
+                emit(f'{new_number} 0 obj\n'.encode('ascii') + self._stream_header(header, len(data), number))
+                emit(data)
+                emit(b'\nendstream\nendobj\n')
+            else:
+                packed.append((new_number, objects[idnum]))
+        
+        next_number = len(self.numbers) + 1
+        for start in range(0, len(packed), self.objects_per_stream):
+            chunk = packed[start:start + self.objects_per_stream]
+            stream_number = next_number
+            next_number += 1
+            
+            offsets = []
+            body = BytesIO()
+            for index, (new_number, obj) in enumerate(chunk):
+                offsets.append(f'{new_number} {body.tell()}')
+                self._serialize(obj, body, number)
+                body.write(b'\n')
+                entries[new_number] = (2, stream_number, index)
+            
+            head = (' '.join(offsets) + '\n').encode('ascii')
+            data = zlib.compress(head + body.getvalue(), self.compression_level)
+            entries[stream_number] = (1, position)
+            emit(
+                f'{stream_number} 0 obj\n<</Type /ObjStm /N {len(chunk)} /First {len(head)} '
+                f'/Filter /FlateDecode /Length {len(data)}>>\nstream\n'.encode('ascii')
+            )
+            emit(data)
+            emit(b'\nendstream\nendobj\n')
+        
+        entries[next_number] = (1, position)
+        emit(self._xref_stream(entries, next_number, position, number))
+    
+    def _xref_stream(self, entries, xref_number, xref_offset, number):
+        """Сжатая таблица xref с трейлером в словаре потока"""
+        size = xref_number + 1
+        
+        offset_width = max(4, (xref_offset.bit_length() + 7) // 8)
+        rows = bytearray(b'\x00' + bytes(offset_width) + b'\xff\xff')
+        for entry_number in range(1, size):
+            entry = entries[entry_number]
+            if entry[0] == 1:
+                rows += b'\x01' + entry[1].to_bytes(offset_width, 'big') + b'\x00\x00'
+            else:
+                rows += b'\x02' + entry[1].to_bytes(offset_width, 'big') + entry[2].to_bytes(2, 'big')
+        data = zlib.compress(bytes(rows), self.compression_level)
+        
+        out = BytesIO()
+        out.write(
+            f'{xref_number} 0 obj\n<</Type /XRef /Size {size} /W [1 {offset_width} 2] '
+            f'/Filter /FlateDecode /Length {len(data)} /Root {number(self.writer._root.idnum)} 0 R'.encode('ascii')
+        )
+        info = getattr(self.writer, '_info', None)
+        if info is not None and number(info.idnum) is not None:
+            out.write(f' /Info {number(info.idnum)} 0 R'.encode('ascii'))
+        if hasattr(self.writer, '_ID'):
+            out.write(b' /ID ')
+            self._serialize(self.writer._ID, out, number)
+        out.write(b'>>\nstream\n')
+        out.write(data)
+        out.write(f'\nendstream\nendobj\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+        return out.getvalue()
\ No newline at end of file
@@ -1,56 +1,96 @@
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject,
+                            EncodedStreamObject, IndirectObject, NameObject, NumberObject)
 from io import BytesIO
-from PIL import Image
+from core.pdf_template import PDFTemplate
+from core.pdf_probe import PDFProbeCache
+from core.signature_asset import SignatureAsset
+from core.pdf_incremental import IncrementalUpdate
+from core.pdf_compact import CompactWriter
+from core.metrics import Metrics
+from core.render_notes import RenderNotes
+from config.settings import (OVERLAY_MODE, OUTPUT_MODE, COMPACT_COMPRESSION_LEVEL, PDF_PROBE_CACHE_SIZE,
+                             PDF_TEMPLATE_CACHE_MAX_BYTES, PDF_TEMPLATE_CACHE_SIZE)
 import os
 
 class PDFHandler:
     """Обработчик PDF файлов"""
     
+    # Общий кэш метаданных и разобранных шаблонов
+    cache = PDFProbeCache(PDF_PROBE_CACHE_SIZE, PDF_TEMPLATE_CACHE_MAX_BYTES, PDF_TEMPLATE_CACHE_SIZE)
+    
+    @staticmethod
+    def load_template(pdf_path):
+        """Загрузить PDF шаблон для повторного использования"""
+        if isinstance(pdf_path, PDFTemplate):
+            return pdf_path
+        return PDFHandler.cache.get_template(pdf_path)
+    
+    @staticmethod
+    def probe(pdf_path):
+        """Получить метаданные PDF (PDFProbe) без повторного разбора файла"""
+        return PDFHandler.cache.get_probe(pdf_path)
+    
     @staticmethod
     def get_page_count(pdf_path):
         """Получить количество страниц в PDF"""
-        reader = PdfReader(pdf_path)
-        return len(reader.pages)
+        probe = PDFHandler.probe(pdf_path)
+        if probe.error is not None:
+            raise ValueError(probe.error)
+        return probe.page_count
     
     @staticmethod
     def get_page_size(pdf_path, page_num=0):
         """Получить размер страницы PDF"""
-        reader = PdfReader(pdf_path)
-        page = reader.pages[page_num]
-        box = page.mediabox
-        return float(box.width), float(box.height)
+        probe = PDFHandler.probe(pdf_path)
+        if probe.error is not None:
+            raise ValueError(probe.error)
+        return probe.get_page_size(page_num)
     
     @staticmethod
     def validate_pdf(path):
         """Проверить валидность PDF файла"""
         try:
-            reader = PdfReader(path)
-            return len(reader.pages) > 0
-        except:
+            return PDFHandler.probe(path).is_valid
+        except OSError:
             return False
     
     @staticmethod
-    def create_signature_overlay(signature_img, x, y, width, height, page_width, page_height):
-        """Создать overlay с подписью"""
-        # Создаем буфер для PDF
-        packet = BytesIO()
-        
-        # Создаем canvas
-        c = canvas.Canvas(packet, pagesize=(page_width, page_height))
+    def signature_bbox(x, y, width, height, page_height):
+        """
+        Прямоугольник подписи в координатах PDF (x, y, ширина, высота)
         
-        # Сохраняем изображение во временный буфер
-        img_buffer = BytesIO()
-        signature_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        # Рисуем изображение на canvas
-        # В PDF координаты идут снизу вверх, поэтому инвертируем Y
-        y_inverted = page_height - y - height
-        c.drawImage(img_buffer, x, y_inverted, width=width, height=height, mask='auto')
+        Позиция задается от левого верхнего угла страницы, а в PDF
+        координаты идут снизу вверх, поэтому Y инвертируется.
+        Изображение растягивается на весь прямоугольник.
+        """
+        return x, page_height - y - height, width, height
+    
+    @staticmethod
+    def create_signature_overlay(signature_img, x, y, width, height, page_width, page_height):
+        """Создать overlay с подписью через ReportLab (запасной вариант)"""
+        # ReportLab нужен только для запасного пути, поэтому импортируем по требованию
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.utils import ImageReader
         
-        c.save()
+        with Metrics.stage('overlay') as sample:
+            # Создаем буфер для PDF
+            packet = BytesIO()
+            
+            # Создаем canvas
+            c = canvas.Canvas(packet, pagesize=(page_width, page_height))
+            
+            # Сохраняем изображение во временный буфер
+            img_buffer = BytesIO()
+            signature_img.save(img_buffer, format='PNG')
+            img_buffer.seek(0)
+            
+            # Рисуем изображение на canvas
+            x, y_inverted, width, height = PDFHandler.signature_bbox(x, y, width, height, page_height)
+            c.drawImage(ImageReader(img_buffer), x, y_inverted, width=width, height=height, mask='auto')
+            
+            c.save()
+            sample.bytes = packet.tell()
         
         # Возвращаем в начало буфера
         packet.seek(0)
@@ -58,42 +98,369 @@ class PDFHandler:
         return packet
     
     @staticmethod
-    def add_signature_to_pdf(input_path, output_path, signature_img, position):
-        """Добавить подпись в PDF"""
-        # Читаем исходный PDF
-        reader = PdfReader(input_path)
-        writer = PdfWriter()
-        
-        # Получаем размер страницы
-        page = reader.pages[position.page]
-        page_width = float(page.mediabox.width)
-        page_height = float(page.mediabox.height)
-        
-        # Создаем overlay с подписью
-        overlay_packet = PDFHandler.create_signature_overlay(
-            signature_img,
-            position.x,
-            position.y,
-            position.width,
-            position.height,
-            page_width,
-            page_height
+    def add_image_xobject(writer, asset):
+        """
+        Добавить изображение подписи в PDF как image XObject
+        
+        Args:
+            writer: PdfWriter, в который добавляется изображение
+            asset: объект SignatureAsset
+        
+        Returns:
+            Косвенная ссылка на XObject
+        """
+        image = EncodedStreamObject()
+        image._data = asset.color_data
+        image.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Image'),
+            NameObject('/Width'): NumberObject(asset.width),
+            NameObject('/Height'): NumberObject(asset.height),
+            NameObject('/ColorSpace'): NameObject('/DeviceRGB'),
+            NameObject('/BitsPerComponent'): NumberObject(8),
+            NameObject('/Filter'): NameObject('/FlateDecode'),
+        })
+        
+        # Прозрачность передается отдельной маской SMask
+        if asset.alpha_data is not None:
+            smask = EncodedStreamObject()
+            smask._data = asset.alpha_data
+            smask.update({
+                NameObject('/Type'): NameObject('/XObject'),
+                NameObject('/Subtype'): NameObject('/Image'),
+                NameObject('/Width'): NumberObject(asset.width),
+                NameObject('/Height'): NumberObject(asset.height),
+                NameObject('/ColorSpace'): NameObject('/DeviceGray'),
+                NameObject('/BitsPerComponent'): NumberObject(8),
+                NameObject('/Filter'): NameObject('/FlateDecode'),
+            })
+            image[NameObject('/SMask')] = writer._add_object(smask)
+        
+        return writer._add_object(image)
+    
+    @staticmethod
+    def draw_xobject(writer, page, xobject_ref, x, y, width, height, page_height):
+        """
+        Нарисовать XObject на странице без разбора ее содержимого
+        
+        Исходные потоки страницы оборачиваются в q/Q, а в конец
+        добавляется маленький поток с матрицей и оператором Do.
+        """
+        # Копируем словари ресурсов, чтобы не менять общие для нескольких страниц
+        resources = DictionaryObject(page.get('/Resources', DictionaryObject()).get_object())
+        xobjects = DictionaryObject(resources.get('/XObject', DictionaryObject()).get_object())
+        
+        index = 0
+        while f'/Sig{index}' in xobjects:
+            index += 1
+        name = f'/Sig{index}'
+        
+        xobjects[NameObject(name)] = xobject_ref
+        resources[NameObject('/XObject')] = xobjects
+        page[NameObject('/Resources')] = resources
+        
+        x, y_inverted, width, height = PDFHandler.signature_bbox(x, y, width, height, page_height)
+        
+        save_state = DecodedStreamObject()
+        save_state.set_data(b'q\n')
+        stamp = DecodedStreamObject()
+        stamp.set_data(
+            f'\nQ\nq {width:.4f} 0 0 {height:.4f} {x:.4f} {y_inverted:.4f} cm {name} Do Q\n'.encode('ascii')
         )
         
-        # Читаем overlay
-        overlay_reader = PdfReader(overlay_packet)
-        overlay_page = overlay_reader.pages[0]
+        contents = page.get('/Contents')
+        if contents is None:
+            original = []
+        elif isinstance(contents.get_object(), ArrayObject):
+            original = list(contents.get_object())
+        else:
+            original = [contents]
+        original = [
+            item if isinstance(item, IndirectObject) else writer._add_object(item)
+            for item in original
+        ]
+        
+        page[NameObject('/Contents')] = ArrayObject(
+            [writer._add_object(save_state)] + original + [writer._add_object(stamp)]
+        )
+    
+    @staticmethod
+    def signature_key(signature):
+        """
+        Ключ для встраивания одинаковых подписей в файл только один раз
         
-        # Проходим по всем страницам
-        for i, page in enumerate(reader.pages):
-            if i == position.page:
-                # На нужной странице накладываем подпись
-                page.merge_page(overlay_page)
-            writer.add_page(page)
+        Предкомпилированные подписи сравниваются по хэшу исходного файла,
+        изображения PIL - по объекту (кэш ImageHandler возвращает один и тот же
+        объект для одного файла и размера).
+        """
+        if isinstance(signature, SignatureAsset) and signature.content_hash:
+            return signature.content_hash
+        return id(signature)
+    
+    @staticmethod
+    def draw_stamps(writer, template, pages, stamps, shared_xobjects=None):
+        """
+        Нарисовать все подписи плана на страницах
+        
+        Args:
+            writer: PdfWriter или IncrementalUpdate, куда добавляются объекты
+            template: PDFTemplate с размерами страниц
+            pages: словарь {номер страницы: изменяемый словарь страницы}
+            stamps: список (подпись, SignaturePosition)
+            shared_xobjects: словарь XObject по хэшу подписи, общий для нескольких
+                документов в одном файле (опционально)
+        """
+        local_xobjects = {}
+        for signature, position in stamps:
+            key = PDFHandler.signature_key(signature)
+            # Между документами делятся только подписи с хэшем: id объекта
+            # может повториться после сборки мусора
+            xobjects = local_xobjects
+            if shared_xobjects is not None and isinstance(key, str):
+                xobjects = shared_xobjects
+            if key not in xobjects:
+                with Metrics.stage('overlay') as sample:
+                    asset = signature
+                    if not isinstance(asset, SignatureAsset):
+                        asset = SignatureAsset.from_image(signature)
+                    xobjects[key] = PDFHandler.add_image_xobject(writer, asset)
+                    sample.bytes = len(asset.color_data) + len(asset.alpha_data or b'')
+            
+            _, page_height = template.get_page_size(position.page)
+            PDFHandler.draw_xobject(
+                writer,
+                pages[position.page],
+                xobjects[key],
+                position.x,
+                position.y,
+                position.width,
+                position.height,
+                page_height
+            )
+    
+    @staticmethod
+    def check_stamp_pages(template, stamps):
+        """Проверить, что все страницы плана есть в шаблоне"""
+        for _, position in stamps:
+            if not 0 <= position.page < template.page_count:
+                raise IndexError(f"Страница {position.page} не существует в документе")
+    
+    @staticmethod
+    def stamp_with_xobject(template, stamps):
+        """Собрать документ с подписями, встроенными напрямую как image XObject"""
+        PDFHandler.check_stamp_pages(template, stamps)
+        with Metrics.stage('merge'):
+            writer = PdfWriter()
+            
+            # add_page создает копию страницы во writer, поэтому
+            # страницы шаблона остаются нетронутыми для следующих документов
+            pages = {}
+            stamped = {position.page for _, position in stamps}
+            for i, page in enumerate(template.pages):
+                writer_page = writer.add_page(page)
+                if i in stamped:
+                    pages[i] = writer_page
+            
+            PDFHandler.draw_stamps(writer, template, pages, stamps)
+        return writer
+    
+    @staticmethod
+    def stamp_with_reportlab(template, stamps):
+        """Собрать документ с подписями через overlay ReportLab"""
+        PDFHandler.check_stamp_pages(template, stamps)
+        
+        with Metrics.stage('merge'):
+            # Накладываем подписи на поверхностные копии страниц,
+            # чтобы не менять страницы шаблона
+            page_copies = {}
+            for signature_img, position in stamps:
+                page_copy = page_copies.get(position.page)
+                if page_copy is None:
+                    page = template.get_page(position.page)
+                    page_copy = PageObject(template.reader, page.indirect_reference)
+                    page_copy.update(page)
+                    page_copies[position.page] = page_copy
+                
+                page_width, page_height = template.get_page_size(position.page)
+                
+                # Создаем overlay с подписью
+                overlay_packet = PDFHandler.create_signature_overlay(
+                    signature_img,
+                    position.x,
+                    position.y,
+                    position.width,
+                    position.height,
+                    page_width,
+                    page_height
+                )
+                
+                # Читаем overlay
+                overlay_reader = PdfReader(overlay_packet)
+                page_copy.merge_page(overlay_reader.pages[0])
+            
+            writer = PdfWriter()
+            for i, page in enumerate(template.pages):
+                writer.add_page(page_copies.get(i, page))
+        
+        return writer
+    
+    @staticmethod
+    def stamp_incremental(template, stamps, output_path):
+        """
+        Записать документ с подписями как инкрементальное обновление шаблона
+        
+        Байты шаблона копируются без изменений; дописываются только новые
+        версии страниц, изображения подписей и секция xref.
+        """
+        update = PDFHandler.build_incremental_update(template, stamps)
+        PDFHandler.write_incremental(update, output_path)
+    
+    @staticmethod
+    def write_incremental(update, output_path):
+        """Записать собранное инкрементальное обновление (путь или поток для записи)"""
+        with Metrics.stage('write') as sample:
+            start = PDFHandler.stream_position(output_path)
+            update.write(output_path)
+            sample.bytes = PDFHandler.written_size(output_path, start)
+    
+    @staticmethod
+    def build_incremental_update(template, stamps):
+        """
+        Подготовить инкрементальное обновление шаблона с подписями (без записи)
+        
+        Дописываемая часть собирается в памяти целиком (IncrementalUpdate.render),
+        так что после успешной сборки остается только запись байтов.
+        """
+        PDFHandler.check_stamp_pages(template, stamps)
+        with Metrics.stage('merge'):
+            update = IncrementalUpdate(template)
+            
+            # Новые версии страниц: копии словарей с теми же номерами объектов
+            pages = {}
+            for _, position in stamps:
+                if position.page not in pages:
+                    pages[position.page] = DictionaryObject(template.get_page(position.page))
+            
+            PDFHandler.draw_stamps(update, template, pages, stamps)
+            for page_num, page_copy in pages.items():
+                update.replace_object(template.get_page(page_num).indirect_reference, page_copy)
+            update.render()
+        
+        return update
+    
+    @staticmethod
+    def add_signature_to_pdf(input_path, output_path, signature_img, position, overlay_mode=OVERLAY_MODE,
+                             output_mode=OUTPUT_MODE, compression_level=COMPACT_COMPRESSION_LEVEL):
+        """
+        Добавить подпись в PDF
+        
+        Args:
+            input_path: путь к PDF шаблону или загруженный PDFTemplate
+            output_path: путь к выходному файлу или поток для записи
+            signature_img: изображение подписи (PIL Image или SignatureAsset)
+            position: объект SignaturePosition с позицией подписи
+            overlay_mode: 'xobject' или 'reportlab'
+            output_mode: 'incremental', 'rewrite' или 'compact'
+            compression_level: уровень сжатия zlib для режима 'compact'
+        """
+        PDFHandler.add_signatures_to_pdf(
+            input_path,
+            output_path,
+            [(signature_img, position)],
+            overlay_mode,
+            output_mode,
+            compression_level
+        )
+    
+    @staticmethod
+    def add_signatures_to_pdf(input_path, output_path, stamps, overlay_mode=OVERLAY_MODE,
+                              output_mode=OUTPUT_MODE, compression_level=COMPACT_COMPRESSION_LEVEL):
+        """
+        Добавить в PDF несколько подписей за один проход
+        
+        Args:
+            input_path: путь к PDF шаблону или загруженный PDFTemplate
+            output_path: путь к выходному файлу или поток для записи (с методом tell)
+            stamps: список (подпись, SignaturePosition); подпись - PIL Image или SignatureAsset
+            overlay_mode: 'xobject' или 'reportlab'
+            output_mode: 'incremental', 'rewrite' или 'compact'
+            compression_level: уровень сжатия zlib для режима 'compact'
+        """
+        # Шаблон разбирается только если передан путь
+        template = PDFHandler.load_template(input_path)
+        
+        # Предкомпилированную подпись можно встроить только напрямую
+        has_assets = any(isinstance(signature, SignatureAsset) for signature, _ in stamps)
+        direct = overlay_mode == 'xobject' or has_assets
+        
+        if direct and output_mode == 'incremental':
+            # Запасной способ возможен, только пока в output_path ничего не записано:
+            # поток может быть записью ZIP архива, которую нельзя начать заново.
+            # Поэтому ошибки самой записи не перехватываются.
+            try:
+                update = PDFHandler.build_incremental_update(template, stamps)
+            except IndexError:
+                raise
+            except Exception as e:
+                RenderNotes.add(f"Не удалось собрать инкрементальное обновление, документ перезаписан: {str(e)}")
+            else:
+                PDFHandler.write_incremental(update, output_path)
+                return
+        
+        writer = None
+        if direct:
+            try:
+                writer = PDFHandler.stamp_with_xobject(template, stamps)
+            except Exception as e:
+                if has_assets or isinstance(e, IndexError):
+                    raise
+                RenderNotes.add(f"Ошибка прямого наложения подписи, используется ReportLab: {str(e)}")
+        
+        if writer is None:
+            writer = PDFHandler.stamp_with_reportlab(template, stamps)
         
         # Сохраняем результат
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
+        PDFHandler.save_writer(writer, output_path, output_mode == 'compact', compression_level)
+    
+    @staticmethod
+    def save_writer(writer, output_path, compact=False, compression_level=COMPACT_COMPRESSION_LEVEL):
+        """
+        Записать собранный документ
+        
+        Args:
+            writer: PdfWriter с документом
+            output_path: путь к выходному файлу или поток для записи
+            compact: записать с потоками объектов, сжатием и объединением
+                одинаковых объектов (меньше файл, дольше запись)
+            compression_level: уровень сжатия zlib для компактной записи
+        """
+        with Metrics.stage('write') as sample:
+            start = PDFHandler.stream_position(output_path)
+            if compact:
+                CompactWriter(writer, compression_level).write(output_path)
+            elif not isinstance(output_path, str):
+                writer.write(output_path)
+            else:
+                with open(output_path, 'wb') as output_file:
+                    writer.write(output_file)
+            sample.bytes = PDFHandler.written_size(output_path, start)
+    
+    @staticmethod
+    def stream_position(output_path):
+        """Позиция в потоке для записи (0 для пути к файлу или потока без tell)"""
+        if isinstance(output_path, str):
+            return 0
+        try:
+            return output_path.tell()
+        except (AttributeError, OSError):
+            return 0
+    
+    @staticmethod
+    def written_size(output_path, start=0):
+        """Сколько байт записано: размер файла или сдвиг позиции потока от start"""
+        if isinstance(output_path, str):
+            return os.path.getsize(output_path)
+        return max(PDFHandler.stream_position(output_path) - start, 0)
     
     @staticmethod
     def pdf_to_image(pdf_path, page_num=0, dpi=150):
@@ -0,0 +1,182 @@
+from PyPDF2.generic import (ArrayObject, DictionaryObject, EncodedStreamObject, IndirectObject,
+                            NameObject, NumberObject)
+from io import BytesIO
+import re
+import zlib
+
+class IncrementalUpdateError(Exception):
+    """Шаблон нельзя дополнить инкрементальным обновлением"""
+
+
+class IncrementalUpdate:
+    """
+    Инкрементальное обновление PDF шаблона
+    
+    Исходные байты шаблона копируются без изменений, а в конец файла
+    дописываются только новые и измененные объекты, новая секция xref
+    и трейлер со ссылкой /Prev на предыдущую секцию.
+    """
+    
+    def __init__(self, template):
+        self.template = template
+        self.startxref, self.xref_is_stream = self._find_startxref(template)
+        
+        reader = template.reader
+        self.trailer = reader.trailer
+        
+        # PyPDF2 не переносит /Size из потока xref в trailer, поэтому
+        # номер следующего объекта считаем и по известным записям xref
+        known_ids = [idnum for entries in reader.xref.values() for idnum in entries]
+        known_ids.extend(reader.xref_objStm)
+        self.next_id = max([int(self.trailer.get('/Size', 0))] + [idnum + 1 for idnum in known_ids])
+        
+        # idnum -> (generation, объект)
+        self.objects = {}
+        # Дописываемая часть файла, собранная render()
+        self.tail = None
+    
+    @staticmethod
+    def _find_startxref(template):
+        """Найти смещение последней секции xref и определить ее тип"""
+        if template.reader.is_encrypted:
+            raise IncrementalUpdateError("Зашифрованные шаблоны не поддерживаются")
+        
+        data = template.data
+        tail = bytes(data[-1024:])
+        match = None
+        for match in re.finditer(rb'startxref\s+(\d+)', tail):
+            pass
+        if match is None:
+            raise IncrementalUpdateError("В шаблоне не найден startxref")
+        
+        offset = int(match.group(1))
+        head = bytes(data[offset:offset + 32])
+        if head.startswith(b'xref'):
+            return offset, False
+        if re.match(rb'\d+\s+\d+\s+obj', head):
+            return offset, True
+        
+        # Смещение указывает мимо xref: PyPDF2 восстановил файл, дописывать нельзя
+        raise IncrementalUpdateError("Секция xref шаблона повреждена")
+    
+    def _add_object(self, obj):
+        """Добавить новый объект (совместимо с PdfWriter._add_object)"""
+        idnum = self.next_id
+        self.next_id += 1
+        self.objects[idnum] = (0, obj)
+        return IndirectObject(idnum, 0, None)
+    
+    def replace_object(self, reference, obj):
+        """Заменить существующий объект шаблона новой версией"""
+        self.objects[reference.idnum] = (reference.generation, obj)
+    
+    def render(self):
+        """
+        Собрать дописываемую часть файла в памяти: новые объекты, xref и трейлер
+        
+        Returns:
+            Байты обновления (также сохраняются в self.tail для write)
+        """
+        base = len(self.template.data)
+        
+        # Предыдущая секция может не заканчиваться переводом строки
+        update = BytesIO()
+        update.write(b'\n')
+        
+        offsets = {}
+        for idnum in sorted(self.objects):
+            generation, obj = self.objects[idnum]
+            offsets[idnum] = (base + update.tell(), generation)
+            update.write(f'{idnum} {generation} obj\n'.encode('ascii'))
+            obj.write_to_stream(update, None)
+            update.write(b'\nendobj\n')
+        
+        if self.xref_is_stream:
+            self._write_xref_stream(update, base, offsets)
+        else:
+            self._write_xref_table(update, base, offsets)
+        
+        self.tail = update.getvalue()
+        return self.tail
+    
+    def write(self, output_path):
+        """
+        Записать шаблон с обновлением в файл (путь или поток для записи)
+        
+        Обновление собирается до записи (render), поэтому ошибка сборки
+        не оставляет в output_path недописанный документ.
+        """
+        tail = self.tail if self.tail is not None else self.render()
+        
+        if not isinstance(output_path, str):
+            output_path.write(self.template.data)
+            output_path.write(tail)
+            return
+        
+        self.template.copy_to(output_path)
+        with open(output_path, 'ab') as output_file:
+            output_file.write(tail)
+    
+    def _trailer_entries(self, size):
+        """Общие записи трейлера нового обновления"""
+        entries = DictionaryObject()
+        entries[NameObject('/Size')] = NumberObject(size)
+        entries[NameObject('/Prev')] = NumberObject(self.startxref)
+        for key in ('/Root', '/Info', '/ID'):
+            if key in self.trailer:
+                entries[NameObject(key)] = self.trailer.raw_get(key)
+        return entries
+    
+    @staticmethod
+    def _subsections(idnums):
+        """Разбить номера объектов на непрерывные подсекции"""
+        sections = []
+        for idnum in sorted(idnums):
+            if sections and sections[-1][0] + len(sections[-1][1]) == idnum:
+                sections[-1][1].append(idnum)
+            else:
+                sections.append((idnum, [idnum]))
+        return sections
+    
+    def _write_xref_table(self, update, base, offsets):
+        """Записать классическую таблицу xref и трейлер"""
+        xref_offset = base + update.tell()
+        
+        update.write(b'xref\n')
+        for first, idnums in self._subsections(offsets):
+            update.write(f'{first} {len(idnums)}\n'.encode('ascii'))
+            for idnum in idnums:
+                offset, generation = offsets[idnum]
+                update.write(f'{offset:010d} {generation:05d} n\r\n'.encode('ascii'))
+        
+        update.write(b'trailer\n')
+        self._trailer_entries(self.next_id).write_to_stream(update, None)
+        update.write(f'\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+    
+    def _write_xref_stream(self, update, base, offsets):
+        """Записать секцию xref в виде потока (для шаблонов PDF 1.5+)"""
+        xref_id = self.next_id
+        xref_offset = base + update.tell()
+        offsets = dict(offsets)
+        offsets[xref_id] = (xref_offset, 0)
+        
+        offset_width = max(4, (xref_offset.bit_length() + 7) // 8)
+        rows = bytearray()
+        index = ArrayObject()
+        for first, idnums in self._subsections(offsets):
+            index.extend([NumberObject(first), NumberObject(len(idnums))])
+            for idnum in idnums:
+                offset, generation = offsets[idnum]
+                rows += b'\x01' + offset.to_bytes(offset_width, 'big') + generation.to_bytes(2, 'big')
+        
+        xref = EncodedStreamObject()
+        xref.update(self._trailer_entries(xref_id + 1))
+        xref._data = zlib.compress(bytes(rows))
+        xref[NameObject('/Type')] = NameObject('/XRef')
+        xref[NameObject('/Index')] = index
+        xref[NameObject('/W')] = ArrayObject([NumberObject(1), NumberObject(offset_width), NumberObject(2)])
+        xref[NameObject('/Filter')] = NameObject('/FlateDecode')
+        
+        update.write(f'{xref_id} 0 obj\n'.encode('ascii'))
+        xref.write_to_stream(update, None)
+        update.write(f'\nendobj\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
\ No newline at end of file
@@ -0,0 +1,180 @@
+from PyPDF2.errors import FileNotDecryptedError
+from collections import OrderedDict
+from core.pdf_template import PDFTemplate
+from core.metrics import Metrics
+import hashlib
+import os
+import threading
+
+class PDFProbe:
+    """Метаданные PDF файла: число и размеры страниц, шифрование, отпечаток"""
+    
+    def __init__(self, path, file_size, mtime, page_sizes=None, is_encrypted=False,
+                 fingerprint=None, error=None):
+        self.path = path
+        self.file_size = file_size
+        self.mtime = mtime
+        # Размеры страниц (ширина, высота) в пунктах
+        self.page_sizes = page_sizes or []
+        self.is_encrypted = is_encrypted
+        # Отпечаток файла (см. make_fingerprint)
+        self.fingerprint = fingerprint
+        # Сообщение об ошибке, если файл не удалось разобрать
+        self.error = error
+    
+    @staticmethod
+    def from_template(template):
+        """Снять метаданные с уже разобранного шаблона"""
+        return PDFProbe(
+            template.path,
+            template.file_size,
+            template.mtime,
+            list(template.page_sizes),
+            template.reader.is_encrypted,
+            PDFProbe.make_fingerprint(template)
+        )
+    
+    @staticmethod
+    def make_fingerprint(template):
+        """
+        Отпечаток файла шаблона
+        
+        Файл не перечитывается: отпечаток строится по устройству, inode, размеру
+        и времени изменения. SHA-256 всего содержимого считается, только если
+        файловая система не сообщает inode.
+        """
+        if template.inode:
+            identity = f"{template.device}:{template.inode}:{template.file_size}:{template.mtime}"
+            return hashlib.sha256(identity.encode('ascii')).hexdigest()
+        return hashlib.sha256(template.data).hexdigest()
+    
+    @property
+    def page_count(self):
+        """Количество страниц"""
+        return len(self.page_sizes)
+    
+    @property
+    def is_valid(self):
+        """Файл разобран и содержит хотя бы одну страницу"""
+        return self.error is None and self.page_count > 0
+    
+    def get_page_size(self, page_num=0):
+        """Получить размер страницы (ширина, высота) в пунктах"""
+        return self.page_sizes[page_num]
+    
+    def matches(self, stat):
+        """Соответствуют ли метаданные текущему состоянию файла"""
+        return stat.st_size == self.file_size and stat.st_mtime_ns == self.mtime
+
+
+class PDFProbeCache:
+    """
+    Кэш метаданных и разобранных PDF шаблонов
+    
+    Запись действительна, пока не изменились размер и время изменения
+    файла, поэтому каждый шаблон разбирается один раз на каждое изменение.
+    Разобранные шаблоны занимают память, поэтому для них отдельно ограничены
+    число и суммарная оценка памяти (PDFTemplate.memory_estimate).
+    """
+    
+    def __init__(self, max_items, max_template_bytes, max_templates):
+        self.max_items = max_items
+        self.max_template_bytes = max_template_bytes
+        self.max_templates = max_templates
+        self._probes = OrderedDict()
+        self._templates = OrderedDict()
+        self._template_bytes = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def get_probe(self, path):
+        """
+        Получить метаданные PDF файла
+        
+        Raises:
+            OSError: если файл не найден
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        
+        with self._lock:
+            probe = self._probes.get(key)
+            if probe is not None and probe.matches(stat):
+                self._probes.move_to_end(key)
+                self.hits += 1
+                return probe
+            self.misses += 1
+        
+        try:
+            probe = PDFProbe.from_template(self.get_template(path))
+        except FileNotDecryptedError:
+            probe = PDFProbe(path, stat.st_size, stat.st_mtime_ns, is_encrypted=True,
+                             error="Документ защищен паролем")
+        except Exception as e:
+            probe = PDFProbe(path, stat.st_size, stat.st_mtime_ns, error=str(e))
+        
+        self._put_probe(key, probe)
+        return probe
+    
+    def get_template(self, path):
+        """Получить разобранный шаблон, разбирая файл только после его изменения"""
+        key = os.path.abspath(path)
+        
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None and not template.is_stale():
+                self._templates.move_to_end(key)
+                return template
+        
+        with Metrics.stage('parse') as sample:
+            template = PDFTemplate(path)
+            sample.bytes = template.file_size
+        self._put_probe(key, PDFProbe.from_template(template))
+        self._put_template(key, template)
+        return template
+    
+    def _put_probe(self, key, probe):
+        """Сохранить метаданные, вытесняя самые старые записи"""
+        with self._lock:
+            self._probes[key] = probe
+            self._probes.move_to_end(key)
+            while len(self._probes) > self.max_items:
+                self._probes.popitem(last=False)
+    
+    def _put_template(self, key, template):
+        """Сохранить разобранный шаблон, если он помещается в лимит памяти"""
+        size = template.memory_estimate
+        if size > self.max_template_bytes:
+            return
+        
+        with self._lock:
+            old = self._templates.pop(key, None)
+            if old is not None:
+                self._template_bytes -= old.memory_estimate
+            
+            self._templates[key] = template
+            self._template_bytes += size
+            
+            while self._template_bytes > self.max_template_bytes or len(self._templates) > self.max_templates:
+                _, evicted = self._templates.popitem(last=False)
+                self._template_bytes -= evicted.memory_estimate
+    
+    def clear(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._probes.clear()
+            self._templates.clear()
+            self._template_bytes = 0
+    
+    def stats(self):
+        """Статистика кэша"""
+        with self._lock:
+            return {
+                'probes': len(self._probes),
+                'templates': len(self._templates),
+                'template_bytes': self._template_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
\ No newline at end of file
@@ -0,0 +1,91 @@
+from PyPDF2 import PdfReader
+from config.settings import PDF_OBJECT_MEMORY_ESTIMATE
+import os
+
+class PDFTemplate:
+    """Разобранный PDF шаблон для многократного использования в пакете"""
+    
+    def __init__(self, path):
+        self.path = path
+        
+        stat = os.stat(path)
+        self.file_size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        # Устройство и inode (0, если файловая система их не сообщает)
+        self.device = stat.st_dev
+        self.inode = stat.st_ino
+        
+        # Разбираем файл один раз и сразу раскрываем дерево страниц
+        self.reader = PdfReader(path)
+        self.object_count = (sum(len(entries) for entries in self.reader.xref.values())
+                             + len(self.reader.xref_objStm))
+        self.pages = list(self.reader.pages)
+        self.page_sizes = [
+            (float(page.mediabox.width), float(page.mediabox.height))
+            for page in self.pages
+        ]
+    
+    @property
+    def page_count(self):
+        """Количество страниц в шаблоне"""
+        return len(self.pages)
+    
+    @property
+    def memory_estimate(self):
+        """Оценка памяти разобранного шаблона: исходные байты и объекты PDF, в байтах"""
+        return self.file_size + self.object_count * PDF_OBJECT_MEMORY_ESTIMATE
+    
+    @property
+    def name(self):
+        """Имя шаблона без расширения"""
+        return os.path.splitext(os.path.basename(self.path))[0]
+    
+    def get_page(self, page_num):
+        """Получить страницу шаблона"""
+        return self.pages[page_num]
+    
+    def get_page_size(self, page_num=0):
+        """Получить размер страницы (ширина, высота) в пунктах"""
+        return self.page_sizes[page_num]
+    
+    @property
+    def data(self):
+        """Исходные байты шаблона (без копирования)"""
+        return self.reader.stream.getbuffer()
+    
+    def copy_to(self, output_path):
+        """
+        Скопировать исходные байты шаблона в файл
+        
+        Пока файл шаблона не изменился, копирование выполняет ядро
+        (copy_file_range), на btrfs/XFS без фактического дублирования данных.
+        """
+        with open(output_path, 'wb') as output_file:
+            if not self.is_stale():
+                try:
+                    with open(self.path, 'rb') as source:
+                        copied = 0
+                        while copied < self.file_size:
+                            count = os.copy_file_range(
+                                source.fileno(), output_file.fileno(), self.file_size - copied
+                            )
+                            if count == 0:
+                                break
+                            copied += count
+                    if copied == self.file_size:
+                        return
+                except (AttributeError, OSError):
+                    pass
+                
+                output_file.seek(0)
+                output_file.truncate()
+            
+            output_file.write(self.data)
+    
+    def is_stale(self):
+        """Проверить, изменился ли файл шаблона после загрузки"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return stat.st_size != self.file_size or stat.st_mtime_ns != self.mtime
\ No newline at end of file
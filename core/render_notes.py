@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+import threading
+
+class RenderNotes:
+    """
+    Замечания к создаваемому документу
+    
+    Например, документ записан запасным способом, потому что инкрементальное
+    обновление шаблона не удалось собрать. Пакетная обработка собирает замечания
+    для каждого человека (RenderNotes.capture) и выдает их вместе с результатом;
+    вне пакета замечания печатаются, как раньше.
+    """
+    
+    _local = threading.local()
+    
+    @staticmethod
+    @contextmanager
+    def capture():
+        """
+        Собирать замечания в этом потоке внутри блока
+        
+        Yields:
+            Список сообщений
+        """
+        notes = []
+        previous = getattr(RenderNotes._local, 'notes', None)
+        RenderNotes._local.notes = notes
+        try:
+            yield notes
+        finally:
+            RenderNotes._local.notes = previous
+    
+    @staticmethod
+    def add(message):
+        """Добавить замечание к документу"""
+        notes = getattr(RenderNotes._local, 'notes', None)
+        if notes is None:
+            print(message)
+        else:
+            notes.append(message)
\ No newline at end of file
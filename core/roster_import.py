@@ -0,0 +1,259 @@
+from concurrent.futures import ThreadPoolExecutor
+from core.image_handler import ImageHandler
+from core.thumbnails import SignatureThumbnail
+from database.db_manager import DatabaseManager
+from database.models import Person
+from utils.file_utils import FileUtils
+from utils.validators import Validators
+from config.settings import SUPPORTED_IMAGE_FORMATS, IMPORT_WORKERS
+import csv
+import os
+
+# Колонки CSV: первое найденное имя из каждого набора
+NAME_COLUMNS = ('name', 'ФИО')
+POSITION_COLUMNS = ('position', 'Должность')
+DEPARTMENT_COLUMNS = ('department', 'Подразделение')
+SIGNATURE_COLUMNS = ('signature', 'signature_path', 'Подпись')
+# Кодировки CSV по порядку: Excel в русской Windows сохраняет CSV в cp1251
+CSV_ENCODINGS = ('utf-8-sig', 'cp1251')
+
+
+class RosterEntry:
+    """Строка списка для импорта: человек и исходный файл подписи"""
+    
+    def __init__(self, line, name, position, source_path, department=''):
+        # Номер строки CSV или порядковый номер файла в папке
+        self.line = line
+        self.name = name
+        self.position = position
+        self.source_path = source_path
+        self.department = department
+
+
+class ImportResult:
+    """Результат импорта одной строки списка"""
+    
+    def __init__(self, entry, person=None, error=None, stored_path=None):
+        self.entry = entry
+        self.person = person
+        self.error = error
+        # Файл в хранилище подписей, сохраненный для строки с ошибкой:
+        # удаляется после записи в базу, если на него никто не ссылается
+        self.stored_path = stored_path
+    
+    @property
+    def ok(self):
+        return self.error is None
+    
+    def to_dict(self):
+        record = {'line': self.entry.line, 'name': self.entry.name, 'source': self.entry.source_path}
+        if self.ok:
+            record.update({'status': 'ok', 'person_id': self.person.id,
+                           'signature_path': self.person.signature_path})
+        else:
+            record.update({'status': 'error', 'error': self.error})
+        return record
+
+
+class RosterImporter:
+    """
+    Массовое добавление людей из CSV или папки с файлами подписей
+    
+    Проверка, копирование, предкомпиляция подписей и создание миниатюр выполняются
+    параллельно в потоках (Pillow, zlib и копирование файлов отпускают GIL),
+    а все строки записываются в базу одной транзакцией.
+    """
+    
+    def __init__(self, db_manager=None, workers=IMPORT_WORKERS):
+        self.db_manager = db_manager or DatabaseManager()
+        self.workers = workers or os.cpu_count() or 1
+    
+    @staticmethod
+    def _column(row, names):
+        """Значение первой найденной колонки из names"""
+        for name in names:
+            if row.get(name) not in (None, ''):
+                return row[name].strip()
+        return ''
+    
+    @staticmethod
+    def read_csv(path):
+        """
+        Прочитать список из CSV
+        
+        Колонки: name (ФИО), position (Должность), department (Подразделение),
+        signature (путь к файлу подписи; относительный путь считается от папки CSV).
+        Файл читается в UTF-8, а если он в ней не читается - в cp1251.
+        
+        Raises:
+            ValueError: файл не читается ни в одной из кодировок CSV_ENCODINGS
+        """
+        for encoding in CSV_ENCODINGS:
+            try:
+                with open(path, encoding=encoding, newline='') as f:
+                    # Строка 1 - заголовок
+                    rows = list(csv.DictReader(f))
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ValueError(f"Не удалось прочитать CSV (кодировки: {', '.join(CSV_ENCODINGS)}): {path}")
+        
+        base_dir = os.path.dirname(os.path.abspath(path))
+        entries = []
+        for line, row in enumerate(rows, 2):
+            source_path = RosterImporter._column(row, SIGNATURE_COLUMNS)
+            if source_path:
+                source_path = os.path.join(base_dir, source_path)
+            entries.append(RosterEntry(
+                line,
+                RosterImporter._column(row, NAME_COLUMNS),
+                RosterImporter._column(row, POSITION_COLUMNS),
+                source_path,
+                RosterImporter._column(row, DEPARTMENT_COLUMNS)
+            ))
+        return entries
+    
+    @staticmethod
+    def read_directory(path):
+        """
+        Прочитать список из папки с подписями
+        
+        Имя человека берется из имени файла ("Иванов_Иван.png" - "Иванов Иван").
+        """
+        entries = []
+        files = sorted(
+            name for name in os.listdir(path)
+            if os.path.splitext(name)[1].lower() in SUPPORTED_IMAGE_FORMATS
+        )
+        for line, filename in enumerate(files, 1):
+            name = os.path.splitext(filename)[0].replace('_', ' ').strip()
+            entries.append(RosterEntry(line, name, '', os.path.join(path, filename)))
+        return entries
+    
+    @staticmethod
+    def read_source(path):
+        """Прочитать список из CSV файла или папки"""
+        if os.path.isdir(path):
+            return RosterImporter.read_directory(path)
+        return RosterImporter.read_csv(path)
+    
+    @staticmethod
+    def prepare_entry(entry):
+        """
+        Проверить строку, скопировать и предкомпилировать подпись
+        
+        Returns:
+            ImportResult с Person без ID или с ошибкой
+        """
+        valid, message = Validators.validate_person_name(entry.name)
+        if not valid:
+            return ImportResult(entry, error=message)
+        
+        if not entry.source_path:
+            return ImportResult(entry, error="Не указан файл подписи")
+        
+        valid, message = Validators.validate_signature_file(entry.source_path)
+        if not valid:
+            return ImportResult(entry, error=message)
+        
+        if not ImageHandler.validate_image(entry.source_path):
+            return ImportResult(entry, error="Файл подписи поврежден или не является изображением")
+        
+        signature_path = None
+        try:
+            signature_path, _ = FileUtils.store_signature_file(entry.source_path)
+            asset_path, asset = FileUtils.compile_signature_asset(signature_path)
+        except Exception as e:
+            # Файл не удаляется здесь: ту же подпись могла сохранить строка
+            # в другом потоке, см. import_entries
+            return ImportResult(entry, error=f"Ошибка подготовки подписи: {str(e)}",
+                                stored_path=signature_path)
+        
+        person = Person(
+            name=entry.name,
+            position=entry.position,
+            department=entry.department,
+            signature_path=signature_path,
+            asset_path=asset_path,
+            asset_hash=asset.content_hash
+        )
+        return ImportResult(entry, person)
+    
+    def _map(self, func, items):
+        """Применить func к items в потоках, сохраняя порядок результатов"""
+        if self.workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                yield from executor.map(func, items)
+        else:
+            for item in items:
+                yield func(item)
+    
+    def import_entries(self, entries, progress_callback=None):
+        """
+        Импортировать строки списка
+        
+        Args:
+            entries: список RosterEntry
+            progress_callback: функция (обработано, всего), вызывается
+                по мере подготовки подписей (опционально)
+        
+        Returns:
+            Список ImportResult в порядке entries
+        """
+        results = []
+        for result in self._map(self.prepare_entry, entries):
+            results.append(result)
+            if progress_callback:
+                progress_callback(len(results), len(entries))
+        
+        prepared = [result for result in results if result.ok]
+        stored = [result.stored_path for result in results if result.stored_path]
+        if not prepared:
+            self._release_unused(stored)
+            return results
+        
+        # Одинаковые подписи лежат в хранилище одним файлом,
+        # поэтому миниатюра создается один раз на файл
+        paths = list(dict.fromkeys(result.person.signature_path for result in prepared))
+        thumbnails = dict(zip(paths, self._map(SignatureThumbnail.create_or_none, paths)))
+        
+        try:
+            with self.db_manager.transaction():
+                person_ids = self.db_manager.add_persons([result.person for result in prepared])
+                self.db_manager.save_thumbnails([
+                    (person_id, result.person.signature_path, thumbnails[result.person.signature_path])
+                    for result, person_id in zip(prepared, person_ids)
+                ])
+        except Exception as e:
+            # Строки не записаны, поэтому скопированные файлы не нужны,
+            # если на них не ссылаются люди, добавленные раньше
+            for result in prepared:
+                stored.append(result.person.signature_path)
+                result.person = None
+                result.error = f"Ошибка записи в базу данных: {str(e)}"
+            self._release_unused(stored)
+            return results
+        
+        for result, person_id in zip(prepared, person_ids):
+            result.person.id = person_id
+        # Подписи строк с ошибкой, которые не понадобились записанным строкам
+        self._release_unused(stored)
+        return results
+    
+    def _release_unused(self, paths):
+        """
+        Удалить из хранилища файлы, на которые никто не ссылается
+        
+        Вызывается после транзакции, когда счетчики ссылок учитывают
+        все записанные строки импорта.
+        """
+        for path in dict.fromkeys(paths):
+            try:
+                FileUtils.delete_signature_file(path, self.db_manager)
+            except OSError as e:
+                print(f"Ошибка удаления файла подписи {path}: {str(e)}")
+    
+    def import_path(self, path, progress_callback=None):
+        """Импортировать людей из CSV файла или папки"""
+        return self.import_entries(self.read_source(path), progress_callback)
\ No newline at end of file
@@ -0,0 +1,113 @@
+from config.settings import (SIGNATURE_COMPRESSION_LEVEL, SIGNATURE_ASSET_COMPRESSION_LEVEL,
+                             SIGNATURE_ASSET_MAX_SIDE, SIGNATURE_ASSET_EXTENSION)
+import hashlib
+import json
+import os
+import zlib
+
+# Сигнатура формата файла с предкомпилированной подписью
+ASSET_MAGIC = b'SIGASSET1\n'
+
+class SignatureAsset:
+    """Подпись в виде, готовом для встраивания в PDF (сжатые цвет и альфа-маска)"""
+    
+    def __init__(self, width, height, color_data, alpha_data=None, content_hash=None):
+        self.width = width
+        self.height = height
+        # Данные DeviceRGB, 8 бит на компонент, сжатые FlateDecode
+        self.color_data = color_data
+        # Данные DeviceGray для SMask или None, если подпись непрозрачна
+        self.alpha_data = alpha_data
+        # SHA-256 исходного файла подписи
+        self.content_hash = content_hash
+    
+    @staticmethod
+    def from_image(img, compression_level=SIGNATURE_COMPRESSION_LEVEL):
+        """Подготовить изображение PIL для встраивания в PDF"""
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        
+        color_data = zlib.compress(img.convert('RGB').tobytes(), compression_level)
+        
+        # Полностью непрозрачной подписи маска не нужна
+        alpha = img.getchannel('A')
+        alpha_data = None
+        if alpha.getextrema() != (255, 255):
+            alpha_data = zlib.compress(alpha.tobytes(), compression_level)
+        
+        return SignatureAsset(img.width, img.height, color_data, alpha_data)
+    
+    @property
+    def nbytes(self):
+        """Размер сжатых данных в байтах"""
+        return len(self.color_data) + len(self.alpha_data or b'')
+    
+    @staticmethod
+    def get_asset_path(signature_path):
+        """Путь к предкомпилированной подписи рядом с исходным файлом"""
+        return os.path.splitext(signature_path)[0] + SIGNATURE_ASSET_EXTENSION
+    
+    @staticmethod
+    def compile_file(signature_path):
+        """
+        Предкомпилировать файл подписи
+        
+        Изображение уменьшается до SIGNATURE_ASSET_MAX_SIDE по большей стороне;
+        в PDF оно масштабируется матрицей, поэтому изменять размер под
+        каждую позицию не нужно.
+        """
+        from PIL import Image
+        
+        with open(signature_path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        
+        with Image.open(signature_path) as img:
+            img = img.convert('RGBA')
+        
+        if max(img.size) > SIGNATURE_ASSET_MAX_SIDE:
+            img.thumbnail((SIGNATURE_ASSET_MAX_SIDE, SIGNATURE_ASSET_MAX_SIDE), Image.Resampling.LANCZOS)
+        
+        asset = SignatureAsset.from_image(img, SIGNATURE_ASSET_COMPRESSION_LEVEL)
+        asset.content_hash = content_hash
+        return asset
+    
+    def save(self, path):
+        """Сохранить подпись в файл"""
+        header = {
+            'width': self.width,
+            'height': self.height,
+            'content_hash': self.content_hash,
+            'color_length': len(self.color_data),
+            'alpha_length': len(self.alpha_data) if self.alpha_data is not None else None,
+        }
+        
+        # Пишем во временный файл, чтобы не оставить недописанный файл
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(ASSET_MAGIC)
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(self.color_data)
+            if self.alpha_data is not None:
+                f.write(self.alpha_data)
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def load(path):
+        """Загрузить предкомпилированную подпись из файла"""
+        with open(path, 'rb') as f:
+            if f.read(len(ASSET_MAGIC)) != ASSET_MAGIC:
+                raise ValueError(f"Неверный формат файла подписи: {path}")
+            
+            header = json.loads(f.readline().decode('utf-8'))
+            color_data = f.read(header['color_length'])
+            alpha_data = None
+            if header['alpha_length'] is not None:
+                alpha_data = f.read(header['alpha_length'])
+        
+        return SignatureAsset(
+            header['width'],
+            header['height'],
+            color_data,
+            alpha_data,
+            header['content_hash']
+        )
\ No newline at end of file
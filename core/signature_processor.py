@@ -1,16 +1,46 @@
+from io import BytesIO
 import os
+import time
 from core.pdf_handler import PDFHandler
+from core.output_sinks import DirectorySink
 from core.image_handler import ImageHandler
-from config.settings import OUTPUT_DIR
+from core.batch_engine import BatchEngine
+from core.build_manifest import BuildManifest
+from core.metrics import Metrics
+from core.render_notes import RenderNotes
+from config.settings import (OUTPUT_DIR, OUTPUT_MODE, BATCH_WORKERS, BATCH_CHUNK_SIZE,
+                             BATCH_PARALLEL_THRESHOLD, COMPACT_COMPRESSION_LEVEL,
+                             BUILD_MANIFEST_SAVE_SECONDS)
 
 class SignatureProcessor:
     """Процессор для обработки подписей и создания документов"""
     
-    def __init__(self):
+    def __init__(self, workers=BATCH_WORKERS, chunk_size=BATCH_CHUNK_SIZE, output_mode=OUTPUT_MODE,
+                 output_dir=OUTPUT_DIR, compression_level=COMPACT_COMPRESSION_LEVEL):
         self.pdf_handler = PDFHandler()
         self.image_handler = ImageHandler()
+        # None - значение из настроек, 0 - по числу ядер
+        if workers is None:
+            workers = BATCH_WORKERS
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # 'incremental' - дописывать подпись к байтам шаблона, 'rewrite' - перезаписывать,
+        # 'compact' - перезаписывать с минимальным размером файла
+        self.output_mode = output_mode
+        # Уровень сжатия zlib для режима 'compact'
+        self.compression_level = compression_level
+        self.output_dir = output_dir
+        # Ошибки последнего пакета: список (person, сообщение)
+        self.errors = []
+        # Документы последнего пакета, не созданные заново, так как не изменились входные данные
+        self.skipped = set()
+        # Замечания к документам последнего пакета (например, запасной способ записи):
+        # путь к файлу -> список сообщений
+        self.notes = {}
+        # Манифест сборки последнего пакета в папку (BuildManifest или None)
+        self.build_manifest = None
     
-    def process_single(self, pdf_path, person, position, output_filename=None):
+    def process_single(self, pdf_path, person, position, output_filename=None, template=None, sink=None):
         """
         Обработать один документ для одного человека
         
@@ -19,38 +49,131 @@ class SignatureProcessor:
             person: объект Person с данными человека
             position: объект SignaturePosition с позицией подписи
             output_filename: имя выходного файла (опционально)
+            template: уже загруженный PDFTemplate (опционально)
+            sink: приемник документов (по умолчанию папка output_dir)
         
         Returns:
-            Путь к созданному файлу
+            Путь к созданному файлу (расположение документа в приемнике)
         """
-        # Загружаем изображение подписи
-        signature_img = self.image_handler.load_signature(person.signature_path)
-        
-        # Изменяем размер подписи
-        signature_img = self.image_handler.resize_signature(
-            signature_img,
-            position.width,
-            position.height
-        )
+        # Загружаем подпись: предкомпилированную, если она есть,
+        # иначе изображение нужного размера (повторно берется из кэша)
+        signature_img = self.load_signature_for(person, position)
         
         # Формируем имя выходного файла
         if output_filename is None:
-            base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-            output_filename = f"{base_name}_{person.name.replace(' ', '_')}.pdf"
-        
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
+            output_filename = self.get_output_filename(pdf_path, [person])
         
         # Добавляем подпись в PDF
-        self.pdf_handler.add_signature_to_pdf(
-            pdf_path,
-            output_path,
-            signature_img,
-            position
+        sink = sink or self.get_sink()
+        return sink.add_document(
+            output_filename,
+            person.name,
+            self.pdf_handler.load_template(template or pdf_path),
+            [(signature_img, position)],
+            self.get_render_options()
         )
+    
+    def render_single(self, pdf_path, person, position, template=None):
+        """
+        Собрать документ для одного человека в памяти
         
-        return output_path
+        Используется процессами-обработчиками, когда приемник пакета
+        не папка: документ возвращается в основной процесс байтами.
+        
+        Returns:
+            (имя файла, байты PDF)
+        """
+        signature_img = self.load_signature_for(person, position)
+        output = BytesIO()
+        self.pdf_handler.add_signatures_to_pdf(
+            template or pdf_path,
+            output,
+            [(signature_img, position)],
+            **self.get_render_options()
+        )
+        return self.get_output_filename(pdf_path, [person]), output.getvalue()
     
-    def process_batch(self, pdf_path, persons, position, progress_callback=None):
+    def process_plan(self, pdf_path, plan, output_filename=None, template=None, sink=None):
+        """
+        Подставить все подписи плана в один документ за один проход
+        
+        Args:
+            pdf_path: путь к PDF шаблону
+            plan: объект PlacementPlan
+            output_filename: имя выходного файла (опционально)
+            template: уже загруженный PDFTemplate (опционально)
+            sink: приемник документов (по умолчанию папка output_dir)
+        
+        Returns:
+            Путь к созданному файлу (расположение документа в приемнике)
+        """
+        if not len(plan):
+            raise ValueError("План размещения подписей пуст")
+        
+        stamps = [
+            (self.load_signature_for(placement.person, placement.position), placement.position)
+            for placement in plan
+        ]
+        
+        if output_filename is None:
+            output_filename = self.get_output_filename(pdf_path, plan.persons)
+        
+        sink = sink or self.get_sink()
+        return sink.add_document(
+            output_filename,
+            ', '.join(person.name for person in plan.persons),
+            self.pdf_handler.load_template(template or pdf_path),
+            stamps,
+            self.get_render_options()
+        )
+    
+    @staticmethod
+    def get_output_filename(pdf_path, persons):
+        """Имя выходного файла: имя шаблона и имена людей"""
+        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        names = '_'.join(person.name.replace(' ', '_') for person in persons)
+        return f"{base_name}_{names}.pdf"
+    
+    def get_sink(self):
+        """Приемник документов по умолчанию: отдельные файлы в output_dir"""
+        return DirectorySink(self.output_dir)
+    
+    def get_render_options(self):
+        """Параметры PDFHandler.add_signatures_to_pdf"""
+        return {'output_mode': self.output_mode, 'compression_level': self.compression_level}
+    
+    def get_options(self):
+        """Настройки вывода для передачи в процессы-обработчики"""
+        return {
+            'output_mode': self.output_mode,
+            'output_dir': self.output_dir,
+            'compression_level': self.compression_level
+        }
+    
+    def load_signature_for(self, person, position):
+        """
+        Получить подпись человека в виде для встраивания в PDF
+        
+        Returns:
+            SignatureAsset, если есть актуальная предкомпилированная подпись,
+            иначе изображение PIL размером с позицию
+        """
+        if person.asset_path and os.path.exists(person.asset_path):
+            try:
+                asset = self.image_handler.load_signature_asset(person.asset_path)
+                if asset.content_hash == person.asset_hash:
+                    return asset
+            except Exception as e:
+                print(f"Ошибка загрузки предкомпилированной подписи {person.asset_path}: {str(e)}")
+        
+        return self.image_handler.load_resized_signature(
+            person.signature_path,
+            position.width,
+            position.height
+        )
+    
+    def process_batch(self, pdf_path, persons, position, progress_callback=None, workers=None, sink=None,
+                      force=False):
         """
         Обработать документ для нескольких людей
         
@@ -59,27 +182,171 @@ class SignatureProcessor:
             persons: список объектов Person
             position: объект SignaturePosition с позицией подписи
             progress_callback: функция обратного вызова для отслеживания прогресса
+            workers: количество процессов (по умолчанию self.workers)
+            sink: приемник документов (по умолчанию папка output_dir);
+                закрывает приемник вызывающий код
+            force: создать заново и неизмененные документы
         
         Returns:
-            Список путей к созданным файлам
+            Список путей к созданным файлам (расположений документов в приемнике)
         """
         output_files = []
+        self.errors = []
         total = len(persons)
         
-        for i, person in enumerate(persons):
-            try:
-                output_path = self.process_single(pdf_path, person, position)
+        # Результаты приходят в порядке списка, поэтому прогресс упорядочен
+        results = self.iter_batch(pdf_path, persons, position, workers, sink, force)
+        for i, (person, output_path, error) in enumerate(results):
+            if error is None:
                 output_files.append(output_path)
+                for note in self.notes.get(output_path, ()):
+                    print(f"Предупреждение для {person.name}: {note}")
                 
                 if progress_callback:
                     progress_callback(i + 1, total, person.name)
-            except Exception as e:
-                print(f"Ошибка обработки для {person.name}: {str(e)}")
+            else:
+                print(f"Ошибка обработки для {person.name}: {error}")
+                self.errors.append((person, error))
                 if progress_callback:
                     progress_callback(i + 1, total, f"Ошибка: {person.name}")
         
         return output_files
     
+    def iter_batch(self, pdf_path, persons, position, workers=None, sink=None, force=False):
+        """
+        Обработать людей, выдавая результаты по мере готовности
+        
+        При записи в папку документы, у которых не изменились шаблон, подпись,
+        позиция и параметры вывода, не создаются заново (см. BuildManifest),
+        а их пути попадают в self.skipped; force=True создает все документы.
+        Замечания к созданным документам попадают в self.notes.
+        Время этапов и число документов пишутся в метрики потока (Metrics.collect).
+        
+        Yields:
+            (person, путь к файлу или None, сообщение об ошибке или None)
+            в порядке списка persons
+        """
+        workers = workers or self.workers
+        sink = sink or self.get_sink()
+        self.skipped = set()
+        self.notes = {}
+        self.build_manifest = None
+        
+        build = self._plan_build(pdf_path, persons, position, sink) if isinstance(sink, DirectorySink) else None
+        if build is None:
+            stale = [True] * len(persons)
+        else:
+            manifest, filenames, keys = build
+            self.build_manifest = manifest
+            stale = [force or not manifest.is_current(name, key) for name, key in zip(filenames, keys)]
+        todo = [person for person, rebuild in zip(persons, stale) if rebuild]
+        
+        results = self._run_todo(pdf_path, todo, position, workers, sink)
+        last_save = time.monotonic()
+        try:
+            for i, person in enumerate(persons):
+                if not stale[i]:
+                    output_path = os.path.join(sink.output_dir, filenames[i])
+                    self.skipped.add(output_path)
+                    Metrics.count_document('skipped')
+                    yield person, output_path, None
+                    continue
+                
+                output_path, error, notes = next(results)
+                if notes and error is None:
+                    self.notes[output_path] = notes
+                Metrics.count_document('ok' if error is None else 'failed')
+                if build is not None:
+                    if error is None:
+                        manifest.record(filenames[i], keys[i])
+                    else:
+                        manifest.forget(filenames[i])
+                    if time.monotonic() - last_save >= BUILD_MANIFEST_SAVE_SECONDS:
+                        manifest.save()
+                        last_save = time.monotonic()
+                yield person, output_path, error
+        finally:
+            results.close()
+            if build is not None:
+                manifest.save()
+    
+    def _plan_build(self, pdf_path, persons, position, sink):
+        """
+        Манифест папки, имена файлов и хэши входных данных документов
+        
+        Returns:
+            (BuildManifest, имена файлов, хэши) или None, если шаблон не читается
+            (тогда все документы обрабатываются и получают ошибку как обычно)
+        """
+        probe = self.pdf_handler.probe(pdf_path)
+        if probe.error is not None:
+            return None
+        
+        manifest = BuildManifest.load(sink.output_dir)
+        options = self.get_render_options()
+        filenames = [self.get_output_filename(pdf_path, [person]) for person in persons]
+        keys = [manifest.input_key(probe.fingerprint, person, position, options) for person in persons]
+        return manifest, filenames, keys
+    
+    def _run_todo(self, pdf_path, persons, position, workers, sink):
+        """
+        Создать документы для persons подходящим способом
+        
+        Yields:
+            (путь к файлу или None, сообщение об ошибке или None, замечания к документу)
+            в порядке persons
+        """
+        parallel = workers > 1 and len(persons) >= BATCH_PARALLEL_THRESHOLD
+        if parallel and isinstance(sink, DirectorySink):
+            # Процессы-обработчики сами пишут файлы в папку приемника
+            options = self.get_options()
+            options['output_dir'] = sink.output_dir
+            engine = BatchEngine(workers, self.chunk_size)
+            yield from engine.run(pdf_path, persons, position, options)
+        elif parallel and sink.accepts_rendered:
+            # Документы собираются в процессах, а в приемник пишутся здесь по одному
+            engine = BatchEngine(workers, self.chunk_size)
+            rendered = engine.run(pdf_path, persons, position, self.get_options(), render=True)
+            yield from self._write_rendered(persons, rendered, sink)
+        else:
+            yield from self._run_serial(pdf_path, persons, position, sink)
+    
+    @staticmethod
+    def _write_rendered(persons, rendered, sink):
+        """Записать в приемник документы, собранные процессами-обработчиками"""
+        for person, (document, error, notes) in zip(persons, rendered):
+            if error is not None:
+                yield None, error, notes
+                continue
+            
+            filename, data = document
+            try:
+                yield sink.add_rendered(filename, person.name, data), None, notes
+            except Exception as e:
+                yield None, str(e), notes
+    
+    def _run_serial(self, pdf_path, persons, position, sink):
+        """Последовательная обработка в текущем процессе"""
+        # Шаблон разбирается один раз на весь пакет; если он не читается,
+        # каждый человек получает ошибку, как в процессах-обработчиках
+        try:
+            template = self.pdf_handler.load_template(pdf_path)
+        except Exception as e:
+            error = f"Ошибка загрузки шаблона: {str(e)}"
+            for _ in persons:
+                yield None, error, []
+            return
+        
+        for person in persons:
+            # Замечания собираются до yield: генератор приостанавливается вне блока
+            with RenderNotes.capture() as notes:
+                try:
+                    output_path = self.process_single(pdf_path, person, position, template=template, sink=sink)
+                    error = None
+                except Exception as e:
+                    output_path, error = None, str(e)
+            yield output_path, error, notes
+    
     def validate_inputs(self, pdf_path, person, position):
         """
         Проверить валидность входных данных
@@ -87,11 +354,14 @@ class SignatureProcessor:
         Returns:
             (bool, str): (валидность, сообщение об ошибке)
         """
-        # Проверка PDF
+        # Проверка PDF: метаданные берутся из кэша, файл разбирается один раз
         if not os.path.exists(pdf_path):
             return False, "PDF файл не найден"
         
-        if not self.pdf_handler.validate_pdf(pdf_path):
+        probe = self.pdf_handler.probe(pdf_path)
+        if not probe.is_valid:
+            if probe.is_encrypted:
+                return False, "PDF файл защищен паролем"
             return False, "Невалидный PDF файл"
         
         # Проверка подписи
@@ -102,8 +372,7 @@ class SignatureProcessor:
             return False, "Невалидное изображение подписи"
         
         # Проверка позиции
-        page_count = self.pdf_handler.get_page_count(pdf_path)
-        if position.page >= page_count:
+        if position.page >= probe.page_count:
             return False, f"Страница {position.page} не существует в документе"
         
         return True, "OK"
\ No newline at end of file
@@ -0,0 +1,81 @@
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, THUMBNAIL_COLORS,
+                             THUMBNAIL_BACKFILL_BATCH, IMPORT_WORKERS)
+import io
+import os
+
+class SignatureThumbnail:
+    """
+    Миниатюры подписей для просмотра списка людей
+    
+    Миниатюра - PNG с палитрой (около 1 КБ), которая создается один раз
+    при добавлении человека и хранится в базе данных, поэтому список
+    не декодирует исходные сканы подписей.
+    """
+    
+    @staticmethod
+    def create(path, width=THUMBNAIL_WIDTH, height=THUMBNAIL_HEIGHT):
+        """
+        Создать миниатюру файла подписи
+        
+        Returns:
+            Данные PNG
+        """
+        with Image.open(path) as img:
+            # JPEG сразу декодируется в уменьшенном размере
+            img.draft('RGB', (width * 2, height * 2))
+            img = img.convert('RGBA')
+        img.thumbnail((width, height), Image.Resampling.LANCZOS)
+        
+        output = io.BytesIO()
+        img.quantize(THUMBNAIL_COLORS, method=Image.Quantize.FASTOCTREE).save(output, 'PNG', optimize=True)
+        return output.getvalue()
+    
+    @staticmethod
+    def create_or_none(path):
+        """Создать миниатюру или вернуть None, если файл не читается"""
+        try:
+            return SignatureThumbnail.create(path)
+        except Exception as e:
+            print(f"Ошибка создания миниатюры {os.path.basename(path)}: {e}")
+            return None
+    
+    @staticmethod
+    def backfill(db_manager, workers=IMPORT_WORKERS, progress_callback=None, is_cancelled=None):
+        """
+        Создать миниатюры людей, у которых их нет или сменился файл подписи
+        
+        Миниатюры записываются пачками, поэтому список может показывать их
+        до окончания заполнения. Для нечитаемых файлов записывается пустая
+        миниатюра, чтобы не пытаться снова при каждом запуске.
+        
+        Args:
+            db_manager: DatabaseManager
+            workers: количество потоков (None - по числу ядер)
+            progress_callback: функция (создано), вызывается после каждой пачки
+            is_cancelled: функция, возвращающая True, чтобы остановиться
+                после текущей пачки (опционально)
+        
+        Returns:
+            Количество обработанных людей
+        """
+        done = 0
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            while is_cancelled is None or not is_cancelled():
+                rows = db_manager.get_persons_without_thumbnails(THUMBNAIL_BACKFILL_BATCH)
+                if not rows:
+                    return done
+                
+                # Люди с одинаковой подписью ссылаются на один файл хранилища
+                paths = list(dict.fromkeys(signature_path for _, signature_path in rows))
+                thumbnails = dict(zip(paths, executor.map(SignatureThumbnail.create_or_none, paths)))
+                db_manager.save_thumbnails([
+                    (person_id, signature_path, thumbnails[signature_path])
+                    for person_id, signature_path in rows
+                ])
+                
+                done += len(rows)
+                if progress_callback:
+                    progress_callback(done)
+        return done
\ No newline at end of file
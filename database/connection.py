@@ -0,0 +1,117 @@
+from config.settings import (SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KB,
+                             SQLITE_CACHED_STATEMENTS, SQLITE_BUSY_TIMEOUT_MS)
+from contextlib import contextmanager
+import os
+import sqlite3
+import threading
+
+class ConnectionManager:
+    """
+    Долгоживущие соединения SQLite: одно на поток и файл базы данных
+    
+    Соединение открывается при первом обращении из потока и настраивается
+    один раз (WAL, synchronous, размер кэша); подготовленные запросы
+    остаются в кэше соединения между вызовами. Соединения работают в режиме
+    автофиксации, несколько операций объединяются в транзакцию через
+    transaction().
+    """
+    
+    _local = threading.local()
+    
+    @staticmethod
+    def _connections():
+        """Соединения текущего потока {путь: соединение}"""
+        local = ConnectionManager._local
+        # После fork соединения родителя использовать нельзя
+        if getattr(local, 'pid', None) != os.getpid():
+            local.pid = os.getpid()
+            local.connections = {}
+            local.depth = {}
+        return local.connections
+    
+    @staticmethod
+    def connect(db_path):
+        """Открыть и настроить новое соединение"""
+        conn = sqlite3.connect(
+            db_path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            cached_statements=SQLITE_CACHED_STATEMENTS
+        )
+        conn.execute(f'PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}')
+        conn.execute(f'PRAGMA synchronous = {SQLITE_SYNCHRONOUS}')
+        # Отрицательное значение задает размер кэша в килобайтах
+        conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute('PRAGMA foreign_keys = ON')
+        # Поиск без учета регистра для кириллицы (встроенные lower и LIKE учитывают только ASCII)
+        conn.create_function('search_key', 1, ConnectionManager.search_key, deterministic=True)
+        return conn
+    
+    @staticmethod
+    def search_key(value):
+        """Строка для сравнения при поиске: без учета регистра, ё равно е"""
+        if value is None:
+            return None
+        return value.replace('ё', 'е').replace('Ё', 'Е').casefold()
+    
+    @staticmethod
+    def get_connection(db_path):
+        """Получить соединение текущего потока с базой данных"""
+        key = os.path.abspath(db_path)
+        connections = ConnectionManager._connections()
+        conn = connections.get(key)
+        if conn is None:
+            conn = ConnectionManager.connect(db_path)
+            connections[key] = conn
+        return conn
+    
+    @staticmethod
+    @contextmanager
+    def transaction(db_path):
+        """
+        Выполнить операции в одной транзакции
+        
+        Фиксация выполняется один раз при выходе из внешнего блока,
+        при исключении все изменения откатываются. Вложенные блоки
+        входят во внешнюю транзакцию.
+        
+        Пример:
+            with ConnectionManager.transaction(path) as conn:
+                conn.executemany(...)
+        """
+        conn = ConnectionManager.get_connection(db_path)
+        key = os.path.abspath(db_path)
+        depth = ConnectionManager._local.depth
+        
+        if depth.get(key, 0) > 0:
+            depth[key] += 1
+            try:
+                yield conn
+            finally:
+                depth[key] -= 1
+            return
+        
+        # IMMEDIATE сразу берет блокировку записи, чтобы не упасть
+        # с "database is locked" посреди транзакции
+        conn.execute('BEGIN IMMEDIATE')
+        depth[key] = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            depth[key] = 0
+    
+    @staticmethod
+    def close(db_path=None):
+        """Закрыть соединения текущего потока (все или с одним файлом)"""
+        connections = ConnectionManager._connections()
+        keys = list(connections) if db_path is None else [os.path.abspath(db_path)]
+        for key in keys:
+            conn = connections.pop(key, None)
+            if conn is not None:
+                conn.close()
\ No newline at end of file
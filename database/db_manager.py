@@ -1,151 +1,605 @@
-import sqlite3
-from config.settings import DATABASE_PATH
-from database.models import Person
+from config.settings import DATABASE_PATH, PERSONS_PAGE_SIZE
+from database.connection import ConnectionManager
+from database.models import Person, SignaturePosition, BatchJob, BatchJobItem
 from datetime import datetime
+import json
+import re
+import sqlite3
+
+# Колонки таблицы persons в порядке, ожидаемом _row_to_person
+PERSON_COLUMNS = 'id, name, position, signature_path, date_added, asset_path, asset_hash, department'
+
+# Сколько ID передавать в один запрос IN (...)
+PERSON_IDS_CHUNK = 500
+
+# Колонки, добавленные после первой версии: (имя, тип)
+PERSON_MIGRATIONS = (('asset_path', 'TEXT'), ('asset_hash', 'TEXT'), ('department', "TEXT NOT NULL DEFAULT ''"))
+JOB_ITEM_MIGRATIONS = (('output_mtime_ns', 'INTEGER'),)
+
+# Индексы для сортировки по имени и фильтров; id в конце нужен для постраничной выборки
+PERSON_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_persons_name ON persons (name, id)',
+    'CREATE INDEX IF NOT EXISTS idx_persons_position ON persons (position, name, id)',
+    'CREATE INDEX IF NOT EXISTS idx_persons_department ON persons (department, name, id)',
+)
+
+# unicode61 приводит к одному регистру и кириллицу, но не считает "ё" и "е"
+# одной буквой, поэтому в индекс и в запросы попадает имя с заменой ё на е
+SEARCH_KEY_SQL = "replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+PERSON_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE persons_fts USING fts5(name, tokenize = 'unicode61')",
+    f'''CREATE TRIGGER IF NOT EXISTS persons_fts_insert AFTER INSERT ON persons BEGIN
+        INSERT INTO persons_fts (rowid, name) VALUES (new.id, {SEARCH_KEY_SQL.format(column='new.name')});
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS persons_fts_delete AFTER DELETE ON persons BEGIN
+        DELETE FROM persons_fts WHERE rowid = old.id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS persons_fts_update AFTER UPDATE OF name ON persons BEGIN
+        UPDATE persons_fts SET name = {SEARCH_KEY_SQL.format(column='new.name')} WHERE rowid = new.id;
+    END''',
+    f'''INSERT INTO persons_fts (rowid, name)
+        SELECT id, {SEARCH_KEY_SQL.format(column='name')} FROM persons''',
+)
+
+# Счетчики ссылок на файлы подписей: файл можно удалить, когда счетчик равен нулю
+SIGNATURE_REFCOUNT_SCHEMA = (
+    '''CREATE TABLE signature_files (
+        path TEXT PRIMARY KEY,
+        refcount INTEGER NOT NULL
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS signature_files_insert AFTER INSERT ON persons BEGIN
+        INSERT INTO signature_files (path, refcount) VALUES (new.signature_path, 1)
+            ON CONFLICT (path) DO UPDATE SET refcount = refcount + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS signature_files_delete AFTER DELETE ON persons BEGIN
+        UPDATE signature_files SET refcount = refcount - 1 WHERE path = old.signature_path;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS signature_files_update AFTER UPDATE OF signature_path ON persons
+    WHEN old.signature_path != new.signature_path BEGIN
+        UPDATE signature_files SET refcount = refcount - 1 WHERE path = old.signature_path;
+        INSERT INTO signature_files (path, refcount) VALUES (new.signature_path, 1)
+            ON CONFLICT (path) DO UPDATE SET refcount = refcount + 1;
+    END''',
+    '''INSERT INTO signature_files (path, refcount)
+        SELECT signature_path, COUNT(*) FROM persons GROUP BY signature_path''',
+)
+
+# Задание с количеством строк: всего, готовых и с ошибкой
+JOB_QUERY = '''
+    SELECT j.id, j.template_path, j.template_fingerprint, j.position, j.output_dir, j.output_mode,
+           j.status, j.created_at, j.updated_at, COUNT(i.seq),
+           COALESCE(SUM(i.status = 'done'), 0), COALESCE(SUM(i.status = 'failed'), 0)
+    FROM jobs j LEFT JOIN job_items i ON i.job_id = j.id
+'''
 
 class DatabaseManager:
-    """Менеджер для работы с базой данных"""
+    """
+    Менеджер для работы с базой данных
+    
+    Соединение не открывается на каждый запрос: все менеджеры одного
+    потока используют общее соединение ConnectionManager.
+    """
     
     def __init__(self):
         self.db_path = DATABASE_PATH
+        # Есть ли полнотекстовый индекс (None - еще не проверено)
+        self._has_fts = None
     
     def get_connection(self):
-        """Получить соединение с БД"""
-        return sqlite3.connect(self.db_path)
+        """Получить соединение с БД (общее для потока, закрывать не нужно)"""
+        return ConnectionManager.get_connection(self.db_path)
+    
+    def transaction(self):
+        """
+        Транзакция для нескольких операций с одной фиксацией
+        
+        Пример:
+            with db.transaction():
+                for person in persons:
+                    db.add_person(person)
+        """
+        return ConnectionManager.transaction(self.db_path)
     
     def initialize(self):
         """Инициализация базы данных"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Создание таблицы людей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS persons (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                position TEXT,
-                signature_path TEXT NOT NULL,
-                date_added TEXT NOT NULL
-            )
-        ''')
-        
-        # Создание таблицы шаблонов позиций
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS position_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                x REAL NOT NULL,
-                y REAL NOT NULL,
-                width REAL NOT NULL,
-                height REAL NOT NULL,
-                page INTEGER NOT NULL
-            )
-        ''')
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Создание таблицы людей
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS persons (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    position TEXT,
+                    signature_path TEXT NOT NULL,
+                    date_added TEXT NOT NULL,
+                    asset_path TEXT,
+                    asset_hash TEXT
+                )
+            ''')
+            
+            # Добавляем колонки, которых нет в базах старых версий
+            self._migrate_columns(cursor, 'persons', PERSON_MIGRATIONS)
+            
+            for statement in PERSON_INDEXES:
+                cursor.execute(statement)
+            self._create_person_search(cursor)
+            
+            # Сколько людей ссылается на каждый файл подписи (файлы общие
+            # для одинаковых подписей); счетчики обновляют триггеры
+            self._create_signature_refcounts(cursor)
+            
+            # Миниатюры подписей; signature_path - файл, из которого создана миниатюра,
+            # data равно NULL, если файл не удалось прочитать
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS person_thumbnails (
+                    person_id INTEGER PRIMARY KEY REFERENCES persons (id) ON DELETE CASCADE,
+                    signature_path TEXT NOT NULL,
+                    data BLOB
+                )
+            ''')
+            
+            # Задания пакетной обработки и их строки (для продолжения после сбоя)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    template_path TEXT NOT NULL,
+                    template_fingerprint TEXT,
+                    position TEXT NOT NULL,
+                    output_dir TEXT NOT NULL,
+                    output_mode TEXT,
+                    status TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS job_items (
+                    job_id INTEGER NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+                    seq INTEGER NOT NULL,
+                    person_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    output_path TEXT,
+                    output_size INTEGER,
+                    output_mtime_ns INTEGER,
+                    error TEXT,
+                    PRIMARY KEY (job_id, seq)
+                )
+            ''')
+            self._migrate_columns(cursor, 'job_items', JOB_ITEM_MIGRATIONS)
+            
+            # Создание таблицы шаблонов позиций
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS position_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    x REAL NOT NULL,
+                    y REAL NOT NULL,
+                    width REAL NOT NULL,
+                    height REAL NOT NULL,
+                    page INTEGER NOT NULL
+                )
+            ''')
+    
+    def _migrate_columns(self, cursor, table, migrations):
+        """Добавить в таблицу недостающие колонки из migrations: (имя, тип)"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in cursor.fetchall()}
+        
+        for column, column_type in migrations:
+            if column not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+    
+    def _create_person_search(self, cursor):
+        """
+        Создать полнотекстовый индекс имен (FTS5)
+        
+        Индекс создается и заполняется один раз, дальше его обновляют триггеры.
+        Если SQLite собран без FTS5, поиск работает через LIKE.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'persons_fts'")
+        if cursor.fetchone():
+            self._has_fts = True
+            return
         
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute('SAVEPOINT persons_fts')
+            for statement in PERSON_FTS_SCHEMA:
+                cursor.execute(statement)
+            cursor.execute('RELEASE persons_fts')
+            self._has_fts = True
+        except sqlite3.OperationalError as e:
+            cursor.execute('ROLLBACK TO persons_fts')
+            cursor.execute('RELEASE persons_fts')
+            print(f"Полнотекстовый поиск недоступен, используется LIKE: {e}")
+            self._has_fts = False
+    
+    def _create_signature_refcounts(self, cursor):
+        """Создать таблицу счетчиков ссылок на файлы подписей и заполнить ее по persons"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'signature_files'")
+        if cursor.fetchone():
+            return
+        
+        for statement in SIGNATURE_REFCOUNT_SCHEMA:
+            cursor.execute(statement)
+    
+    def has_fts(self):
+        """Есть ли в базе полнотекстовый индекс имен"""
+        if self._has_fts is None:
+            row = self.get_connection().execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'persons_fts'"
+            ).fetchone()
+            self._has_fts = row is not None
+        return self._has_fts
+    
+    @staticmethod
+    def _row_to_person(row):
+        """Создать Person из строки запроса по PERSON_COLUMNS"""
+        return Person(
+            id=row[0],
+            name=row[1],
+            position=row[2],
+            signature_path=row[3],
+            date_added=row[4],
+            asset_path=row[5],
+            asset_hash=row[6],
+            department=row[7] or ''
+        )
     
     def add_person(self, person):
         """Добавить человека в БД"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().execute('''
+            INSERT INTO persons (name, position, signature_path, date_added, asset_path, asset_hash, department)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (person.name, person.position, person.signature_path, person.date_added,
+              person.asset_path, person.asset_hash, person.department or ''))
         
-        cursor.execute('''
-            INSERT INTO persons (name, position, signature_path, date_added)
-            VALUES (?, ?, ?, ?)
-        ''', (person.name, person.position, person.signature_path, person.date_added))
+        return cursor.lastrowid
+    
+    def add_persons(self, persons):
+        """
+        Добавить людей одной транзакцией
         
-        person_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        Returns:
+            Список ID добавленных людей в порядке persons
+        """
+        with self.transaction() as conn:
+            # Транзакция держит блокировку записи, поэтому все строки
+            # с ID больше текущего максимума - только что добавленные
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM persons').fetchone()[0]
+            conn.executemany('''
+                INSERT INTO persons (name, position, signature_path, date_added, asset_path, asset_hash, department)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(person.name, person.position, person.signature_path, person.date_added,
+                   person.asset_path, person.asset_hash, person.department or '') for person in persons])
+            rows = conn.execute('SELECT id FROM persons WHERE id > ? ORDER BY id', (last_id,)).fetchall()
         
-        return person_id
+        return [row[0] for row in rows]
     
     def get_all_persons(self):
         """Получить всех людей из БД"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        rows = self.get_connection().execute(f'SELECT {PERSON_COLUMNS} FROM persons').fetchall()
+        return [self._row_to_person(row) for row in rows]
+    
+    @staticmethod
+    def _search_words(search):
+        """Слова поискового запроса с заменой ё на е"""
+        search = search.replace('ё', 'е').replace('Ё', 'Е')
+        return re.findall(r'\w+', search)
+    
+    def _person_filters(self, search=None, position=None, department=None):
+        """Условия WHERE и параметры для поиска и фильтров"""
+        conditions = []
+        params = []
+        
+        if position is not None:
+            conditions.append('position = ?')
+            params.append(position)
+        if department is not None:
+            conditions.append('department = ?')
+            params.append(department)
         
-        cursor.execute('SELECT id, name, position, signature_path, date_added FROM persons')
-        rows = cursor.fetchall()
-        conn.close()
+        words = self._search_words(search) if search else []
+        if words and self.has_fts():
+            # Каждое слово - префикс одного из слов имени: "ив пет" найдет "Иванов Петр"
+            conditions.append('id IN (SELECT rowid FROM persons_fts WHERE persons_fts MATCH ?)')
+            params.append(' '.join(f'"{word}"*' for word in words))
+        elif words:
+            # Запасной вариант без индекса: LIKE в SQLite не сравнивает
+            # кириллицу без учета регистра, поэтому имя приводится функцией search_key
+            for word in words:
+                conditions.append("search_key(name) LIKE ? ESCAPE '\\'")
+                escaped = word.casefold().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(f'%{escaped}%')
+        
+        return conditions, params
+    
+    def count_persons(self, search=None, position=None, department=None):
+        """Количество людей по поиску и фильтрам"""
+        conditions, params = self._person_filters(search, position, department)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self.get_connection().execute(f'SELECT COUNT(*) FROM persons {where}', params).fetchone()[0]
+    
+    def get_persons_page(self, after=None, limit=PERSONS_PAGE_SIZE, search=None, position=None, department=None):
+        """
+        Получить страницу людей, упорядоченных по имени
+        
+        Постраничная выборка по ключу (имя, id) идет по индексу и не
+        замедляется к концу списка, в отличие от OFFSET.
+        
+        Args:
+            after: последний Person предыдущей страницы или None для первой
+            limit: размер страницы
+            search: слова, с которых начинаются слова имени (без учета регистра)
+            position: точное значение должности (опционально)
+            department: точное значение подразделения (опционально)
+        
+        Returns:
+            Список Person; страница короче limit - последняя
+        """
+        query, params = self._persons_page_query(after, limit, search, position, department)
+        rows = self.get_connection().execute(query, params).fetchall()
+        return [self._row_to_person(row) for row in rows]
+    
+    def _persons_page_query(self, after, limit, search=None, position=None, department=None):
+        """Запрос страницы людей и его параметры (см. get_persons_page)"""
+        conditions, params = self._person_filters(search, position, department)
+        if after is not None:
+            # Сравнение значений строки: SQLite ищет начало страницы по индексу
+            # (name, id), а не просматривает индекс с начала, как с OR
+            conditions.append('(name, id) > (?, ?)')
+            params.extend((after.name, after.id))
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return f'SELECT {PERSON_COLUMNS} FROM persons {where} ORDER BY name, id LIMIT ?', params + [limit]
+    
+    def iter_persons(self, page_size=PERSONS_PAGE_SIZE, search=None, position=None, department=None):
+        """Перебрать людей по страницам, не загружая всех сразу"""
+        after = None
+        while True:
+            page = self.get_persons_page(after, page_size, search, position, department)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]
+    
+    def get_person_ids(self, search=None, position=None, department=None):
+        """ID всех людей по поиску и фильтрам (без загрузки остальных колонок)"""
+        conditions, params = self._person_filters(search, position, department)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self.get_connection().execute(f'SELECT id FROM persons {where}', params).fetchall()
+        return [row[0] for row in rows]
+    
+    def get_persons_by_ids(self, person_ids):
+        """
+        Получить людей по списку ID
         
+        Returns:
+            Список Person, упорядоченный по имени; отсутствующие ID пропускаются
+        """
+        person_ids = list(person_ids)
         persons = []
-        for row in rows:
-            person = Person(
-                id=row[0],
-                name=row[1],
-                position=row[2],
-                signature_path=row[3],
-                date_added=row[4]
-            )
-            persons.append(person)
+        conn = self.get_connection()
+        # Число параметров в одном запросе ограничено (999 в старых версиях SQLite)
+        for start in range(0, len(person_ids), PERSON_IDS_CHUNK):
+            chunk = person_ids[start:start + PERSON_IDS_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT {PERSON_COLUMNS} FROM persons WHERE id IN ({placeholders})', chunk
+            ).fetchall()
+            persons.extend(self._row_to_person(row) for row in rows)
         
+        persons.sort(key=lambda person: (person.name, person.id))
         return persons
     
+    def get_distinct_values(self, column):
+        """Различные непустые значения колонки position или department (для фильтров)"""
+        if column not in ('position', 'department'):
+            raise ValueError(f"Неизвестная колонка: {column}")
+        # Индекс по колонке позволяет не читать всю таблицу
+        rows = self.get_connection().execute(
+            f"SELECT DISTINCT {column} FROM persons WHERE {column} IS NOT NULL AND {column} != '' ORDER BY {column}"
+        ).fetchall()
+        return [row[0] for row in rows]
+    
     def get_person_by_id(self, person_id):
         """Получить человека по ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, name, position, signature_path, date_added FROM persons WHERE id = ?', (person_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self.get_connection().execute(
+            f'SELECT {PERSON_COLUMNS} FROM persons WHERE id = ?', (person_id,)
+        ).fetchone()
         
         if row:
-            return Person(
-                id=row[0],
-                name=row[1],
-                position=row[2],
-                signature_path=row[3],
-                date_added=row[4]
-            )
+            return self._row_to_person(row)
         return None
     
     def update_person(self, person):
         """Обновить данные человека"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        self.get_connection().execute('''
             UPDATE persons
-            SET name = ?, position = ?, signature_path = ?
+            SET name = ?, position = ?, signature_path = ?, asset_path = ?, asset_hash = ?, department = ?
             WHERE id = ?
-        ''', (person.name, person.position, person.signature_path, person.id))
-        
-        conn.commit()
-        conn.close()
+        ''', (person.name, person.position, person.signature_path,
+              person.asset_path, person.asset_hash, person.department or '', person.id))
     
     def delete_person(self, person_id):
         """Удалить человека из БД"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        self.get_connection().execute('DELETE FROM persons WHERE id = ?', (person_id,))
+    
+    def release_signature_file(self, path):
+        """
+        Забыть файл подписи, если на него больше никто не ссылается
+        
+        Returns:
+            True, если файл можно удалять
+        """
+        with self.transaction() as conn:
+            row = conn.execute('SELECT refcount FROM signature_files WHERE path = ?', (path,)).fetchone()
+            if row is not None and row[0] > 0:
+                return False
+            conn.execute('DELETE FROM signature_files WHERE path = ?', (path,))
+        return True
+    
+    def save_thumbnails(self, thumbnails):
+        """
+        Сохранить миниатюры подписей одной транзакцией
+        
+        Миниатюры людей, удаленных, пока миниатюры создавались, пропускаются.
+        
+        Args:
+            thumbnails: список (person_id, signature_path, данные PNG или None)
+        """
+        with self.transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO person_thumbnails (person_id, signature_path, data)
+                SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM persons WHERE id = ?)
+            ''', ((person_id, signature_path, data, person_id)
+                  for person_id, signature_path, data in thumbnails))
+    
+    def get_thumbnail(self, person_id):
+        """Данные PNG миниатюры подписи или None"""
+        row = self.get_connection().execute(
+            'SELECT data FROM person_thumbnails WHERE person_id = ?', (person_id,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def get_persons_without_thumbnails(self, limit):
+        """(id, signature_path) людей без миниатюры или с миниатюрой другого файла"""
+        return self.get_connection().execute('''
+            SELECT p.id, p.signature_path FROM persons p
+            LEFT JOIN person_thumbnails t ON t.person_id = p.id
+            WHERE t.person_id IS NULL OR t.signature_path != p.signature_path
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    
+    def create_job(self, job, person_ids):
+        """
+        Сохранить новое задание вместе со строками (по одной на человека)
         
-        cursor.execute('DELETE FROM persons WHERE id = ?', (person_id,))
+        Returns:
+            ID задания
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO jobs (template_path, template_fingerprint, position, output_dir,
+                                  output_mode, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (job.template_path, job.template_fingerprint, json.dumps(job.position.to_dict()),
+                  job.output_dir, job.output_mode, job.status, job.created_at, job.updated_at))
+            job_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO job_items (job_id, seq, person_id, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, seq, person_id) for seq, person_id in enumerate(person_ids)]
+            )
+        return job_id
+    
+    def _row_to_job(self, row):
+        """Создать BatchJob из строки запроса JOB_QUERY"""
+        return BatchJob(
+            id=row[0],
+            template_path=row[1],
+            template_fingerprint=row[2],
+            position=SignaturePosition.from_dict(json.loads(row[3])),
+            output_dir=row[4],
+            output_mode=row[5],
+            status=row[6],
+            created_at=row[7],
+            updated_at=row[8],
+            total=row[9],
+            done=row[10],
+            failed=row[11]
+        )
+    
+    def get_job(self, job_id):
+        """Получить задание по ID (с количеством строк по состояниям)"""
+        row = self.get_connection().execute(f'{JOB_QUERY} WHERE j.id = ? GROUP BY j.id', (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+    
+    def get_jobs(self, unfinished_only=False, template_path=None):
+        """
+        Получить задания, новые первыми
         
-        conn.commit()
-        conn.close()
+        Args:
+            unfinished_only: только задания, которые можно продолжить
+            template_path: только задания с этим шаблоном (опционально)
+        """
+        conditions = []
+        params = []
+        if unfinished_only:
+            # 'failed' - все строки обработаны, часть с ошибкой: задание завершено
+            conditions.append("j.status IN ('running', 'interrupted')")
+        if template_path is not None:
+            conditions.append('j.template_path = ?')
+            params.append(template_path)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self.get_connection().execute(
+            f'{JOB_QUERY} {where} GROUP BY j.id ORDER BY j.id DESC', params
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+    
+    def get_job_items(self, job_id):
+        """Строки задания в порядке добавления"""
+        rows = self.get_connection().execute('''
+            SELECT job_id, seq, person_id, status, output_path, output_size, output_mtime_ns, error
+            FROM job_items WHERE job_id = ? ORDER BY seq
+        ''', (job_id,)).fetchall()
+        return [BatchJobItem(*row) for row in rows]
+    
+    def save_job_items(self, items):
+        """Записать состояние строк заданий одной транзакцией (контрольная точка)"""
+        if not items:
+            return
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self.transaction() as conn:
+            conn.executemany('''
+                UPDATE job_items
+                SET status = ?, output_path = ?, output_size = ?, output_mtime_ns = ?, error = ?
+                WHERE job_id = ? AND seq = ?
+            ''', [(item.status, item.output_path, item.output_size, item.output_mtime_ns, item.error,
+                   item.job_id, item.seq) for item in items])
+            conn.executemany(
+                'UPDATE jobs SET updated_at = ? WHERE id = ?',
+                [(now, job_id) for job_id in {item.job_id for item in items}]
+            )
+    
+    def set_job_status(self, job_id, status):
+        """Изменить состояние задания"""
+        self.get_connection().execute(
+            'UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?',
+            (status, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), job_id)
+        )
+    
+    def delete_job(self, job_id):
+        """Удалить задание вместе со строками"""
+        self.get_connection().execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+    
+    def delete_finished_jobs(self, keep=0):
+        """
+        Удалить завершенные задания ('completed' и 'failed') вместе со строками
+        
+        Args:
+            keep: сколько последних завершенных заданий оставить
+        
+        Returns:
+            Количество удаленных заданий
+        """
+        cursor = self.get_connection().execute('''
+            DELETE FROM jobs WHERE status IN ('completed', 'failed') AND id NOT IN (
+                SELECT id FROM jobs WHERE status IN ('completed', 'failed') ORDER BY id DESC LIMIT ?
+            )
+        ''', (keep,))
+        return cursor.rowcount
     
     def save_position_template(self, name, position):
         """Сохранить шаблон позиции"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        self.get_connection().execute('''
             INSERT INTO position_templates (name, x, y, width, height, page)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (name, position.x, position.y, position.width, position.height, position.page))
-        
-        conn.commit()
-        conn.close()
     
     def get_position_templates(self):
         """Получить все шаблоны позиций"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, name, x, y, width, height, page FROM position_templates')
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self.get_connection().execute(
+            'SELECT id, name, x, y, width, height, page FROM position_templates'
+        ).fetchall()
         
         return [(row[0], row[1], {'x': row[2], 'y': row[3], 'width': row[4], 'height': row[5], 'page': row[6]}) for row in rows]
\ No newline at end of file
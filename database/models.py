@@ -3,20 +3,28 @@ from datetime import datetime
 class Person:
     """Модель для хранения информации о человеке"""
     
-    def __init__(self, id=None, name='', position='', signature_path='', date_added=None):
+    def __init__(self, id=None, name='', position='', signature_path='', date_added=None,
+                 asset_path=None, asset_hash=None, department=''):
         self.id = id
         self.name = name
         self.position = position
+        self.department = department
         self.signature_path = signature_path
         self.date_added = date_added or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # Предкомпилированная подпись для PDF и хэш исходного файла
+        self.asset_path = asset_path
+        self.asset_hash = asset_hash
     
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'position': self.position,
+            'department': self.department,
             'signature_path': self.signature_path,
-            'date_added': self.date_added
+            'date_added': self.date_added,
+            'asset_path': self.asset_path,
+            'asset_hash': self.asset_hash
         }
     
     @staticmethod
@@ -26,7 +34,10 @@ class Person:
             name=data.get('name', ''),
             position=data.get('position', ''),
             signature_path=data.get('signature_path', ''),
-            date_added=data.get('date_added')
+            date_added=data.get('date_added'),
+            asset_path=data.get('asset_path'),
+            asset_hash=data.get('asset_hash'),
+            department=data.get('department', '')
         )
 
 
@@ -57,4 +68,130 @@ class SignaturePosition:
             width=data.get('width', 150),
             height=data.get('height', 50),
             page=data.get('page', 0)
-        )
\ No newline at end of file
+        )
+
+class SignaturePlacement:
+    """Одна подпись в плане размещения: человек, страница и прямоугольник"""
+    
+    def __init__(self, person, position):
+        self.person = person
+        self.position = position
+    
+    def to_dict(self):
+        return {
+            'person_id': self.person.id,
+            'position': self.position.to_dict()
+        }
+
+
+class PlacementPlan:
+    """План размещения нескольких подписей в одном документе"""
+    
+    def __init__(self, placements=None):
+        self.placements = list(placements or [])
+    
+    def add(self, person, position):
+        """Добавить подпись человека в план"""
+        self.placements.append(SignaturePlacement(person, position))
+    
+    def __iter__(self):
+        return iter(self.placements)
+    
+    def __len__(self):
+        return len(self.placements)
+    
+    @property
+    def persons(self):
+        """Люди плана без повторов, в порядке добавления"""
+        persons = []
+        seen = set()
+        for placement in self.placements:
+            key = placement.person.id if placement.person.id is not None else id(placement.person)
+            if key not in seen:
+                seen.add(key)
+                persons.append(placement.person)
+        return persons
+    
+    def to_dict(self):
+        return {'placements': [placement.to_dict() for placement in self.placements]}
+    
+    @staticmethod
+    def from_dict(data, persons_by_id):
+        """
+        Восстановить план из словаря
+        
+        Args:
+            data: словарь, полученный из to_dict
+            persons_by_id: словарь {id: Person}
+        """
+        return PlacementPlan([
+            SignaturePlacement(
+                persons_by_id[item['person_id']],
+                SignaturePosition.from_dict(item['position'])
+            )
+            for item in data.get('placements', [])
+        ])
+
+
+class BatchJob:
+    """Сохраненное задание пакетной обработки (один шаблон и одна позиция)"""
+    
+    def __init__(self, id=None, template_path='', template_fingerprint=None, position=None,
+                 output_dir='', output_mode=None, status='running', created_at=None, updated_at=None,
+                 total=0, done=0, failed=0):
+        self.id = id
+        self.template_path = template_path
+        # Отпечаток шаблона (устройство, inode, размер и время изменения файла):
+        # продолжать можно только с тем же, не изменявшимся и не тронутым touch шаблоном
+        self.template_fingerprint = template_fingerprint
+        self.position = position or SignaturePosition()
+        self.output_dir = output_dir
+        self.output_mode = output_mode
+        # 'running', 'interrupted', 'completed' или 'failed'; продолжить можно
+        # только 'running' (процесс оборвался) и 'interrupted'
+        self.status = status
+        self.created_at = created_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.updated_at = updated_at or self.created_at
+        # Количество строк задания: всего, готовых и с ошибкой
+        self.total = total
+        self.done = done
+        self.failed = failed
+    
+    @property
+    def finished(self):
+        """Все строки задания готовы"""
+        return self.done == self.total
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'template_path': self.template_path,
+            'template_fingerprint': self.template_fingerprint,
+            'position': self.position.to_dict(),
+            'output_dir': self.output_dir,
+            'output_mode': self.output_mode,
+            'status': self.status,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'total': self.total,
+            'done': self.done,
+            'failed': self.failed
+        }
+
+
+class BatchJobItem:
+    """Строка задания: документ для одного человека"""
+    
+    def __init__(self, job_id, seq, person_id, status='pending', output_path=None,
+                 output_size=None, output_mtime_ns=None, error=None):
+        self.job_id = job_id
+        # Порядковый номер строки в задании
+        self.seq = seq
+        self.person_id = person_id
+        # 'pending', 'done' или 'failed'
+        self.status = status
+        # Готовый файл, его размер и время изменения для проверки при продолжении
+        self.output_path = output_path
+        self.output_size = output_size
+        self.output_mtime_ns = output_mtime_ns
+        self.error = error
\ No newline at end of file
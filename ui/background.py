@@ -0,0 +1,39 @@
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+class JobSignals(QObject):
+    """Сигналы фоновой задачи (QRunnable не может объявлять сигналы сам)"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    # Отправляется всегда последним, в том числе для отмененной задачи
+    done = pyqtSignal()
+
+
+class BackgroundJob(QRunnable):
+    """
+    Функция, выполняемая в QThreadPool
+
+    Результат передается в поток интерфейса сигналом finished, ошибка -
+    сигналом failed. Если is_cancelled возвращает True к моменту запуска,
+    функция не вызывается (задача устарела, пока стояла в очереди).
+    """
+
+    def __init__(self, func, *args, is_cancelled=None):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.is_cancelled = is_cancelled
+        self.signals = JobSignals()
+        # Задачей владеет тот, кто ее создал, чтобы сигналы жили до доставки
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            if self.is_cancelled is not None and self.is_cancelled():
+                return
+            result = self.func(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+        finally:
+            self.signals.done.emit()
\ No newline at end of file
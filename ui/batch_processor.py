@@ -1,11 +1,23 @@
-from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QListWidget, QLabel, QProgressBar, QMessageBox,
-                             QListWidgetItem, QAbstractItemView)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QProgressBar,
+                             QMessageBox, QComboBox, QFileDialog, QCheckBox, QPlainTextEdit)
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QFontDatabase
 from database.db_manager import DatabaseManager
 from core.signature_processor import SignatureProcessor
+from core.output_sinks import ConcatenatedPDFSink, ZipSink
+from core.batch_jobs import BatchJobRunner
+from core.metrics import Metrics, StageMetrics
+from ui.person_list import PersonListWidget
+from config.settings import OUTPUT_DIR
 import os
 
+# Варианты результата: (название, расширение файла или None для папки)
+OUTPUT_TARGETS = [
+    ("Отдельные файлы в папке", None),
+    ("Один ZIP архив", '.zip'),
+    ("Один PDF, раздел на человека", '.pdf'),
+]
+
 class BatchProcessorDialog(QDialog):
     """Диалог массовой обработки документов"""
     
@@ -14,9 +26,11 @@ class BatchProcessorDialog(QDialog):
         self.pdf_path = pdf_path
         self.position = position
         self.db_manager = DatabaseManager()
+        # Прерванное задание с этим шаблоном, которое можно продолжить
+        self.unfinished_job = None
         
         self.init_ui()
-        self.load_persons()
+        self.check_unfinished_jobs()
     
     def init_ui(self):
         """Инициализация интерфейса"""
@@ -34,10 +48,21 @@ class BatchProcessorDialog(QDialog):
         layout.addWidget(instruction)
         
         # Список людей
-        self.persons_list = QListWidget()
-        self.persons_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.persons_list = PersonListWidget(self.db_manager, checkable=True)
         layout.addWidget(self.persons_list)
         
+        # Куда записывать результат
+        target_layout = QHBoxLayout()
+        target_layout.addWidget(QLabel("Результат:"))
+        self.target_combo = QComboBox()
+        for title, _ in OUTPUT_TARGETS:
+            self.target_combo.addItem(title)
+        target_layout.addWidget(self.target_combo)
+        # По умолчанию документы с неизмененными шаблоном, подписью и позицией не создаются заново
+        self.force_check = QCheckBox("Создать заново все документы")
+        target_layout.addWidget(self.force_check)
+        layout.addLayout(target_layout)
+        
         # Прогресс бар
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -47,6 +72,14 @@ class BatchProcessorDialog(QDialog):
         self.status_label = QLabel("")
         layout.addWidget(self.status_label)
         
+        # Сводка по этапам обработки последнего пакета
+        self.metrics_view = QPlainTextEdit()
+        self.metrics_view.setReadOnly(True)
+        self.metrics_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.metrics_view.setMaximumHeight(150)
+        self.metrics_view.setVisible(False)
+        layout.addWidget(self.metrics_view)
+        
         # Кнопки
         buttons_layout = QHBoxLayout()
         
@@ -62,49 +95,97 @@ class BatchProcessorDialog(QDialog):
         self.process_btn.clicked.connect(self.start_processing)
         buttons_layout.addWidget(self.process_btn)
         
+        self.resume_btn = QPushButton("Продолжить прерванное")
+        self.resume_btn.clicked.connect(self.resume_processing)
+        self.resume_btn.setVisible(False)
+        buttons_layout.addWidget(self.resume_btn)
+        
+        self.save_metrics_btn = QPushButton("Сохранить метрики...")
+        self.save_metrics_btn.setToolTip("Отчет JSON или файл .prom для node exporter")
+        self.save_metrics_btn.clicked.connect(self.save_metrics)
+        self.save_metrics_btn.setVisible(False)
+        buttons_layout.addWidget(self.save_metrics_btn)
+        
         close_btn = QPushButton("Закрыть")
         close_btn.clicked.connect(self.reject)
         buttons_layout.addWidget(close_btn)
         
         layout.addLayout(buttons_layout)
     
-    def load_persons(self):
-        """Загрузить список людей"""
-        persons = self.db_manager.get_all_persons()
-        
-        for person in persons:
-            item = QListWidgetItem(f"{person.name} ({person.position})")
-            item.setData(Qt.UserRole, person)
-            self.persons_list.addItem(item)
+    def check_unfinished_jobs(self):
+        """Показать кнопку продолжения, если есть прерванное задание с этим шаблоном"""
+        jobs = self.db_manager.get_jobs(unfinished_only=True, template_path=self.pdf_path)
+        self.unfinished_job = jobs[0] if jobs else None
+        if self.unfinished_job is not None:
+            job = self.unfinished_job
+            self.resume_btn.setText(f"Продолжить прерванное ({job.done} из {job.total})")
+            self.resume_btn.setToolTip(f"Задание от {job.created_at}, папка: {job.output_dir}")
+        self.resume_btn.setVisible(self.unfinished_job is not None)
     
     def select_all(self):
-        """Выбрать всех"""
-        for i in range(self.persons_list.count()):
-            self.persons_list.item(i).setSelected(True)
+        """Выбрать всех найденных"""
+        self.persons_list.model.select_all()
     
     def deselect_all(self):
         """Снять выделение"""
-        self.persons_list.clearSelection()
+        self.persons_list.model.clear_selection()
     
     def start_processing(self):
         """Начать обработку"""
-        selected_items = self.persons_list.selectedItems()
-        
-        if not selected_items:
+        if not self.persons_list.model.selected_ids:
             QMessageBox.warning(self, "Ошибка", "Выберите хотя бы одного человека")
             return
         
-        # Получаем выбранных людей
-        selected_persons = [item.data(Qt.UserRole) for item in selected_items]
+        # Получаем выбранных людей (в том числе не загруженных в список)
+        selected_persons = self.persons_list.model.selected_persons()
+        if not selected_persons:
+            QMessageBox.warning(self, "Ошибка", "Выбранные люди удалены из базы")
+            return
+        
+        # Для архива и общего PDF спрашиваем имя файла
+        _, extension = OUTPUT_TARGETS[self.target_combo.currentIndex()]
+        self.output_target = OUTPUT_DIR
+        if extension is not None:
+            base_name = os.path.splitext(os.path.basename(self.pdf_path))[0]
+            file_path, _ = QFileDialog.getSaveFileName(
+                self,
+                "Сохранить результат",
+                os.path.join(OUTPUT_DIR, base_name + extension),
+                f"*{extension}"
+            )
+            if not file_path:
+                return
+            self.output_target = file_path
         
-        # Блокируем кнопки
+        # Создаем и запускаем поток обработки
+        self.start_worker(
+            ProcessorWorker(self.pdf_path, selected_persons, self.position, extension, self.output_target,
+                            force=self.force_check.isChecked()),
+            len(selected_persons)
+        )
+    
+    def resume_processing(self):
+        """Продолжить прерванное задание"""
+        job = self.unfinished_job
+        if job is None:
+            return
+        
+        self.output_target = job.output_dir
+        self.start_worker(
+            ProcessorWorker(job.template_path, None, job.position, None, job.output_dir, job_id=job.id,
+                            force=self.force_check.isChecked()),
+            job.total
+        )
+    
+    def start_worker(self, worker, total):
+        """Заблокировать кнопки и запустить поток обработки"""
         self.process_btn.setEnabled(False)
+        self.resume_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
-        self.progress_bar.setMaximum(len(selected_persons))
+        self.progress_bar.setMaximum(total)
         self.progress_bar.setValue(0)
         
-        # Создаем и запускаем поток обработки
-        self.worker = ProcessorWorker(self.pdf_path, selected_persons, self.position)
+        self.worker = worker
         self.worker.progress.connect(self.on_progress)
         self.worker.finished.connect(self.on_finished)
         self.worker.error.connect(self.on_error)
@@ -115,22 +196,55 @@ class BatchProcessorDialog(QDialog):
         self.progress_bar.setValue(current)
         self.status_label.setText(f"Обработка: {name} ({current}/{total})")
     
+    def show_metrics(self):
+        """Показать время и объем данных по этапам последнего пакета"""
+        self.metrics_view.setPlainText(self.worker.metrics.format_summary())
+        self.metrics_view.setVisible(True)
+        self.save_metrics_btn.setVisible(True)
+    
+    def save_metrics(self):
+        """Сохранить метрики последнего пакета в JSON или формате Prometheus"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Сохранить метрики",
+            os.path.join(OUTPUT_DIR, "metrics.json"),
+            "Отчет JSON (*.json);;Prometheus (*.prom)"
+        )
+        if not file_path:
+            return
+        
+        try:
+            if file_path.endswith('.prom'):
+                self.worker.metrics.write_prometheus(file_path)
+            else:
+                self.worker.metrics.write_json(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить метрики: {str(e)}")
+    
     def on_finished(self, output_files):
         """Обработчик завершения"""
         self.process_btn.setEnabled(True)
+        self.resume_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
-        self.status_label.setText(f"Готово! Создано файлов: {len(output_files)}")
+        self.check_unfinished_jobs()
+        self.show_metrics()
+        created = len(output_files) - self.worker.skipped
+        self.status_label.setText(f"Готово! Создано файлов: {created}, без изменений: {self.worker.skipped}")
         
         QMessageBox.information(
             self,
             "Успех",
-            f"Обработка завершена!\nСоздано файлов: {len(output_files)}\nПапка: data/output/"
+            f"Обработка завершена!\nСоздано документов: {created}\n"
+            f"Без изменений (не создавались заново): {self.worker.skipped}\nРезультат: {self.output_target}"
         )
     
     def on_error(self, error_message):
         """Обработчик ошибки"""
         self.process_btn.setEnabled(True)
+        self.resume_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
+        self.check_unfinished_jobs()
+        self.show_metrics()
         self.status_label.setText("Ошибка обработки")
         
         QMessageBox.critical(self, "Ошибка", error_message)
@@ -143,26 +257,81 @@ class ProcessorWorker(QThread):
     finished = pyqtSignal(list)
     error = pyqtSignal(str)
     
-    def __init__(self, pdf_path, persons, position):
+    def __init__(self, pdf_path, persons, position, extension=None, output_path=None, job_id=None, force=False):
         super().__init__()
         self.pdf_path = pdf_path
         self.persons = persons
         self.position = position
+        # Расширение выбранного результата ('.zip', '.pdf' или None для папки)
+        self.extension = extension
+        self.output_path = output_path
+        # Сохраненное задание, которое нужно продолжить (только для результата в папке)
+        self.job_id = job_id
+        # Создать заново и документы с неизмененными входными данными
+        self.force = force
+        # Сколько готовых документов не создавалось заново
+        self.skipped = 0
+        # Время и объем данных по этапам обработки
+        self.metrics = StageMetrics()
         self.processor = SignatureProcessor()
     
+    def create_sink(self):
+        """Приемник документов для выбранного результата"""
+        if self.extension == '.zip':
+            return ZipSink(self.output_path)
+        if self.extension == '.pdf':
+            return ConcatenatedPDFSink(self.output_path)
+        return self.processor.get_sink()
+    
     def run(self):
         """Запуск обработки"""
         try:
+            # Сигнал отправляется после окончания замеров, чтобы сводка была полной
+            with Metrics.collect(self.metrics):
+                output_files = self.process()
+            self.finished.emit(output_files)
+        
+        except Exception as e:
+            self.error.emit(str(e))
+    
+    def process(self):
+        """
+        Обработать документы
+        
+        Returns:
+            Список путей к созданным файлам
+        """
+        if self.extension is None:
+            return self.run_job()
+        
+        with self.create_sink() as sink:
             output_files = self.processor.process_batch(
                 self.pdf_path,
                 self.persons,
                 self.position,
-                progress_callback=self.on_progress
+                progress_callback=self.on_progress,
+                sink=sink,
+                force=self.force
             )
-            self.finished.emit(output_files)
+            self.skipped = len(self.processor.skipped)
+        return output_files
+    
+    def run_job(self):
+        """
+        Обработать как сохраненное задание: после сбоя его можно продолжить
         
-        except Exception as e:
-            self.error.emit(str(e))
+        Returns:
+            Список путей к готовым файлам задания
+        """
+        runner = BatchJobRunner(workers=self.processor.workers, force=self.force)
+        if self.job_id is None:
+            job = runner.create(self.pdf_path, self.persons, self.position,
+                                self.output_path or self.processor.output_dir, self.processor.output_mode)
+            self.job_id = job.id
+        
+        runner.run(self.job_id, progress_callback=self.on_progress)
+        self.skipped = runner.skipped
+        return [item.output_path for item in runner.db_manager.get_job_items(self.job_id) if item.status == 'done']
     
     def on_progress(self, current, total, name):
         """Обратный вызов прогресса"""
@@ -1,15 +1,18 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QFileDialog, QMessageBox, QGroupBox,
-                             QSpinBox, QDoubleSpinBox, QComboBox, QStatusBar)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-from config.settings import WINDOW_MIN_WIDTH, WINDOW_MIN_HEIGHT
+                             QSpinBox, QDoubleSpinBox, QComboBox, QStatusBar, QLineEdit, QCompleter)
+from PyQt5.QtCore import Qt, QThreadPool, QModelIndex, QTimer
+from PyQt5.QtGui import QPixmap, QStandardItemModel, QStandardItem
+from config.settings import WINDOW_MIN_WIDTH, WINDOW_MIN_HEIGHT, PERSON_SEARCH_DELAY_MS, PERSONS_PAGE_SIZE
 from ui.signature_manager import SignatureManagerDialog
 from ui.preview_widget import PreviewWidget
 from ui.batch_processor import BatchProcessorDialog
+from ui.background import BackgroundJob
 from database.db_manager import DatabaseManager
 from database.models import SignaturePosition
 from core.signature_processor import SignatureProcessor
+from utils.validators import Validators
+from functools import partial
 import os
 
 class MainWindow(QMainWindow):
@@ -20,7 +23,11 @@ class MainWindow(QMainWindow):
         self.db_manager = DatabaseManager()
         self.signature_processor = SignatureProcessor()
         self.current_pdf_path = None
+        self.loading_pdf_path = None
+        self.load_job = None
         self.current_position = SignaturePosition()
+        # Человек, чья подпись показывается в предварительном просмотре
+        self.preview_person = None
         
         self.init_ui()
     
@@ -129,6 +136,27 @@ class MainWindow(QMainWindow):
         manage_btn.clicked.connect(self.open_signature_manager)
         signatures_layout.addWidget(manage_btn)
         
+        # Чья подпись показывается в предварительном просмотре: поиск по ФИО,
+        # в подсказках - первая страница найденных (get_persons_page)
+        preview_person_layout = QHBoxLayout()
+        preview_person_layout.addWidget(QLabel("В просмотре:"))
+        self.preview_person_model = QStandardItemModel(self)
+        self.preview_person_input = QLineEdit()
+        self.preview_person_input.setPlaceholderText("Только рамка (поиск по ФИО)")
+        self.preview_person_input.setClearButtonEnabled(True)
+        completer = QCompleter(self.preview_person_model, self)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        completer.activated[QModelIndex].connect(self.on_preview_person_selected)
+        self.preview_person_input.setCompleter(completer)
+        preview_person_layout.addWidget(self.preview_person_input)
+        signatures_layout.addLayout(preview_person_layout)
+        
+        self.preview_search_timer = QTimer(self)
+        self.preview_search_timer.setSingleShot(True)
+        self.preview_search_timer.setInterval(PERSON_SEARCH_DELAY_MS)
+        self.preview_search_timer.timeout.connect(self.search_preview_persons)
+        self.preview_person_input.textEdited.connect(lambda text: self.preview_search_timer.start())
+        
         signatures_group.setLayout(signatures_layout)
         layout.addWidget(signatures_group)
         
@@ -157,17 +185,55 @@ class MainWindow(QMainWindow):
         )
         
         if file_path:
-            self.current_pdf_path = file_path
-            self.pdf_label.setText(f"Загружен: {os.path.basename(file_path)}")
-            self.statusBar().showMessage(f"Загружен: {file_path}")
-            
-            # Обновляем предварительный просмотр
-            self.preview_widget.load_pdf(file_path)
+            # Разбор большого файла занимает время, поэтому выполняется в фоне;
+            # метаданные остаются в кэше PDFHandler
+            self.loading_pdf_path = file_path
+            self.statusBar().showMessage(f"Загрузка: {file_path}")
             
-            # Обновляем максимальную страницу
-            from core.pdf_handler import PDFHandler
-            page_count = PDFHandler.get_page_count(file_path)
-            self.page_spin.setMaximum(page_count - 1)
+            job = BackgroundJob(self.inspect_pdf, file_path)
+            job.signals.finished.connect(partial(self.on_pdf_inspected, file_path))
+            job.signals.failed.connect(partial(self.on_pdf_failed, file_path))
+            self.load_job = job
+            QThreadPool.globalInstance().start(job)
+    
+    @staticmethod
+    def inspect_pdf(file_path):
+        """Проверить PDF и получить число страниц (выполняется в фоновом потоке)"""
+        from core.pdf_handler import PDFHandler
+        
+        valid, message = Validators.validate_pdf_file(file_path)
+        page_count = PDFHandler.get_page_count(file_path) if valid else 0
+        return valid, message, page_count
+    
+    def on_pdf_inspected(self, file_path, result):
+        """Показать загруженный PDF"""
+        # Пока файл разбирался, пользователь мог выбрать другой
+        if file_path != self.loading_pdf_path:
+            return
+        
+        valid, message, page_count = result
+        if not valid:
+            self.statusBar().showMessage("Готов к работе")
+            QMessageBox.warning(self, "Ошибка", message)
+            return
+        
+        self.current_pdf_path = file_path
+        self.pdf_label.setText(f"Загружен: {os.path.basename(file_path)}")
+        self.statusBar().showMessage(f"Загружен: {file_path}")
+        
+        # Обновляем предварительный просмотр до смены максимума, чтобы
+        # сигнал спинбокса не отрисовывал страницу предыдущего файла
+        self.preview_widget.load_pdf(file_path, min(self.page_spin.value(), page_count - 1))
+        
+        # Обновляем максимальную страницу
+        self.page_spin.setMaximum(page_count - 1)
+    
+    def on_pdf_failed(self, file_path, message):
+        """Сообщить об ошибке загрузки PDF"""
+        if file_path != self.loading_pdf_path:
+            return
+        self.statusBar().showMessage("Готов к работе")
+        QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить PDF: {message}")
     
     def on_position_changed(self):
         """Обработчик изменения позиции"""
@@ -180,10 +246,62 @@ class MainWindow(QMainWindow):
         # Обновляем предварительный просмотр
         self.preview_widget.update_signature_position(self.current_position)
     
+    def search_preview_persons(self):
+        """Загрузить подсказки по введенному тексту (одна страница из базы)"""
+        self.preview_search_timer.stop()
+        text = self.preview_person_input.text().strip()
+        if not text:
+            # Поле очищено: в просмотре только рамка
+            self.preview_person_model.clear()
+            if self.preview_person is not None:
+                self.preview_person = None
+                self.on_preview_person_changed()
+            return
+        
+        self.preview_person_model.clear()
+        for person in self.db_manager.get_persons_page(None, PERSONS_PAGE_SIZE, search=text):
+            details = ', '.join(value for value in (person.position, person.department) if value)
+            item = QStandardItem(f"{person.name} ({details})" if details else person.name)
+            item.setData(person, Qt.UserRole)
+            self.preview_person_model.appendRow(item)
+        if self.preview_person_input.hasFocus():
+            self.preview_person_input.completer().complete()
+    
+    def on_preview_person_selected(self, index):
+        """Выбран человек из подсказок"""
+        self.preview_person = index.data(Qt.UserRole)
+        self.on_preview_person_changed()
+    
+    def refresh_preview_person(self):
+        """Перечитать человека в просмотре: подпись могла измениться или он мог быть удален"""
+        if self.preview_person is not None:
+            self.preview_person = self.db_manager.get_person_by_id(self.preview_person.id)
+            if self.preview_person is None:
+                self.preview_person_input.clear()
+        
+        # Подсказки тоже могли устареть
+        self.preview_person_model.clear()
+        self.on_preview_person_changed()
+    
+    def on_preview_person_changed(self):
+        """Показать в предварительном просмотре подпись выбранного человека"""
+        from core.image_handler import ImageHandler
+        
+        person = self.preview_person
+        img = None
+        if person is not None:
+            try:
+                img = ImageHandler.load_signature(person.signature_path)
+            except Exception as e:
+                print(f"Ошибка загрузки подписи для просмотра: {e}")
+        
+        self.preview_widget.set_signature(img)
+    
     def open_signature_manager(self):
         """Открыть менеджер подписей"""
         dialog = SignatureManagerDialog(self)
         dialog.exec_()
+        self.refresh_preview_person()
     
     def open_batch_processor(self):
         """Открыть окно массовой обработки"""
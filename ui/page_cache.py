@@ -0,0 +1,75 @@
+from PyQt5.QtGui import QImage
+from core.image_cache import SignatureImageCache
+from core.pdf_handler import PDFHandler
+
+class PageRenderCache(SignatureImageCache):
+    """
+    LRU кэш отрисованных страниц PDF для предварительного просмотра
+    
+    Страницы хранятся готовыми QImage, поэтому повторный показ страницы
+    не требует ни отрисовки, ни преобразования изображения.
+    """
+    
+    @staticmethod
+    def make_key(fingerprint, page_num, dpi):
+        """Ключ кэша: отпечаток содержимого шаблона, номер страницы и разрешение"""
+        return (fingerprint, page_num, dpi)
+    
+    @staticmethod
+    def entry_size(entry):
+        """Объем памяти, занимаемый QImage, в байтах"""
+        return entry.sizeInBytes()
+    
+    @staticmethod
+    def pil_to_qimage(img):
+        """
+        Преобразовать изображение PIL в QImage без промежуточного файла
+        
+        Результат владеет своими данными и не зависит от буфера PIL.
+        Изображения с прозрачностью сохраняют альфа-канал.
+        """
+        # RGB32 и ARGB32_Premultiplied рисуются быстрее всего;
+        # преобразование заодно копирует данные
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+            data = img.tobytes('raw', 'RGBA')
+            qimage = QImage(data, img.width, img.height, img.width * 4, QImage.Format_RGBA8888)
+            return qimage.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        data = img.tobytes('raw', 'RGB')
+        qimage = QImage(data, img.width, img.height, img.width * 3, QImage.Format_RGB888)
+        return qimage.convertToFormat(QImage.Format_RGB32)
+    
+    def peek(self, pdf_path, page_num, dpi):
+        """Получить страницу, только если она уже отрисована (без отрисовки)"""
+        probe = PDFHandler.probe(pdf_path)
+        if probe.error is not None:
+            return None
+        return self.get(self.make_key(probe.fingerprint, page_num, dpi))
+    
+    def get_page(self, pdf_path, page_num, dpi):
+        """
+        Получить отрисованную страницу, отрисовывая ее только при промахе
+        
+        Returns:
+            QImage страницы или None, если страницу отрисовать не удалось
+        """
+        probe = PDFHandler.probe(pdf_path)
+        if probe.error is not None:
+            raise ValueError(probe.error)
+        
+        key = self.make_key(probe.fingerprint, page_num, dpi)
+        qimage = self.get(key)
+        if qimage is not None:
+            return qimage
+        
+        img = PDFHandler.pdf_to_image(pdf_path, page_num=page_num, dpi=dpi)
+        if img is None:
+            return None
+        
+        qimage = self.pil_to_qimage(img)
+        self.put(key, qimage)
+        return qimage
\ No newline at end of file
@@ -0,0 +1,264 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListView, QLabel, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, QSize, pyqtSignal
+from PyQt5.QtGui import QPixmap
+from core.image_cache import SignatureImageCache
+from database.db_manager import DatabaseManager
+from config.settings import (PERSONS_PAGE_SIZE, PERSON_SEARCH_DELAY_MS, THUMBNAIL_WIDTH,
+                             THUMBNAIL_HEIGHT, THUMBNAIL_CACHE_MAX_BYTES)
+import os
+
+class ThumbnailCache(SignatureImageCache):
+    """
+    LRU кэш декодированных миниатюр подписей (QPixmap)
+    
+    Пустой QPixmap означает, что миниатюры в базе нет: такая строка при
+    отрисовке не обращается к базе, пока запись не сброшена (forget_missing).
+    """
+    
+    # Размер пустой записи, чтобы такие записи тоже вытеснялись
+    MISSING_ENTRY_SIZE = 64
+    
+    @staticmethod
+    def make_key(person_id, signature_path):
+        """Ключ кэша: человек и файл подписи, из которого создана миниатюра"""
+        return (person_id, signature_path)
+    
+    @staticmethod
+    def entry_size(entry):
+        """Объем памяти, занимаемый QPixmap, в байтах"""
+        if entry.isNull():
+            return ThumbnailCache.MISSING_ENTRY_SIZE
+        return entry.width() * entry.height() * entry.depth() // 8
+    
+    def forget_missing(self):
+        """Сбросить записи об отсутствующих миниатюрах (после создания миниатюр)"""
+        with self._lock:
+            for key in [key for key, entry in self._items.items() if entry.isNull()]:
+                self._bytes -= self.entry_size(self._items.pop(key))
+
+
+class PersonListModel(QAbstractListModel):
+    """
+    Список людей, загружаемый из базы по страницам
+    
+    Строки подгружаются через canFetchMore/fetchMore по мере прокрутки,
+    поэтому открытие списка не зависит от размера базы. Отмеченные люди
+    хранятся как множество ID и не теряются при поиске и перезагрузке.
+    
+    Миниатюры подписей читаются из базы и декодируются только для строк,
+    которые представление рисует, то есть для видимых.
+    """
+    
+    # Изменился набор отмеченных людей
+    selection_changed = pyqtSignal()
+    
+    # Общий кэш миниатюр для всех списков
+    thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_MAX_BYTES)
+    
+    def __init__(self, db_manager=None, checkable=False, thumbnails=False, page_size=PERSONS_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager or DatabaseManager()
+        self.checkable = checkable
+        self.thumbnails = thumbnails
+        self.page_size = page_size
+        
+        self.persons = []
+        self.total = 0
+        self.exhausted = True
+        self.filters = {'search': None, 'position': None, 'department': None}
+        self.selected_ids = set()
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.persons)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.persons):
+            return None
+        person = self.persons[index.row()]
+        
+        details = ', '.join(value for value in (person.position, person.department) if value)
+        if role == Qt.DisplayRole:
+            # Под миниатюрой места хватает только на имя
+            if self.thumbnails or not details:
+                return person.name
+            return f"{person.name} ({details})"
+        if role == Qt.ToolTipRole:
+            if self.thumbnails and details:
+                return f"{person.name}\n{details}\n{os.path.basename(person.signature_path)}"
+            return os.path.basename(person.signature_path)
+        if role == Qt.DecorationRole and self.thumbnails:
+            return self.thumbnail(person)
+        if role == Qt.UserRole:
+            return person
+        if role == Qt.CheckStateRole and self.checkable:
+            return Qt.Checked if person.id in self.selected_ids else Qt.Unchecked
+        return None
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+    
+    def fetchMore(self, parent=QModelIndex()):
+        """Загрузить следующую страницу"""
+        if not self.canFetchMore(parent):
+            return
+        after = self.persons[-1] if self.persons else None
+        page = self.db_manager.get_persons_page(after, self.page_size, **self.filters)
+        self.exhausted = len(page) < self.page_size
+        if not page:
+            return
+        
+        self.beginInsertRows(QModelIndex(), len(self.persons), len(self.persons) + len(page) - 1)
+        self.persons.extend(page)
+        self.endInsertRows()
+    
+    def set_filters(self, search=None, position=None, department=None):
+        """Показать людей по поиску и фильтрам"""
+        self.filters = {'search': search, 'position': position, 'department': department}
+        self.reload()
+    
+    def reload(self):
+        """Перезагрузить список с первой страницы (после изменений в базе)"""
+        self.beginResetModel()
+        self.persons = []
+        self.total = self.db_manager.count_persons(**self.filters)
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+    
+    def thumbnail(self, person):
+        """Миниатюра подписи человека или None, если ее еще нет"""
+        key = ThumbnailCache.make_key(person.id, person.signature_path)
+        pixmap = self.thumbnail_cache.get(key)
+        if pixmap is None:
+            # Если миниатюры нет или она не читается, в кэш попадает пустой QPixmap
+            pixmap = QPixmap()
+            data = self.db_manager.get_thumbnail(person.id)
+            if data:
+                pixmap.loadFromData(data, 'PNG')
+            self.thumbnail_cache.put(key, pixmap)
+        return None if pixmap.isNull() else pixmap
+    
+    def refresh_thumbnails(self):
+        """Перерисовать миниатюры загруженных строк (после их создания)"""
+        self.thumbnail_cache.forget_missing()
+        if self.persons:
+            self.dataChanged.emit(self.index(0), self.index(len(self.persons) - 1), [Qt.DecorationRole])
+    
+    def person(self, row):
+        """Person в строке row"""
+        return self.persons[row]
+    
+    def toggle(self, index):
+        """Отметить человека в строке или снять отметку"""
+        if not index.isValid():
+            return
+        person_id = self.persons[index.row()].id
+        if person_id in self.selected_ids:
+            self.selected_ids.discard(person_id)
+        else:
+            self.selected_ids.add(person_id)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.selection_changed.emit()
+    
+    def select_all(self):
+        """Отметить всех, кто подходит под поиск (в том числе еще не загруженных)"""
+        self.selected_ids.update(self.db_manager.get_person_ids(**self.filters))
+        self._selection_updated()
+    
+    def clear_selection(self):
+        """Снять все отметки"""
+        self.selected_ids.clear()
+        self._selection_updated()
+    
+    def forget(self, person_id):
+        """Убрать из отмеченных удаленного человека"""
+        if person_id in self.selected_ids:
+            self.selected_ids.discard(person_id)
+            self.selection_changed.emit()
+    
+    def selected_persons(self):
+        """Отмеченные люди из базы, упорядоченные по имени"""
+        return self.db_manager.get_persons_by_ids(self.selected_ids)
+    
+    def _selection_updated(self):
+        """Перерисовать отметки загруженных строк"""
+        if self.persons:
+            self.dataChanged.emit(self.index(0), self.index(len(self.persons) - 1), [Qt.CheckStateRole])
+        self.selection_changed.emit()
+
+
+class PersonListWidget(QWidget):
+    """Поиск и список людей на PersonListModel"""
+    
+    def __init__(self, db_manager=None, checkable=False, thumbnails=False, parent=None):
+        super().__init__(parent)
+        self.model = PersonListModel(db_manager, checkable, thumbnails, parent=self)
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Поиск по ФИО...")
+        self.search_input.setClearButtonEnabled(True)
+        layout.addWidget(self.search_input)
+        
+        self.view = QListView()
+        self.view.setModel(self.model)
+        # Одинаковая высота строк: представлению не нужно измерять каждую строку
+        self.view.setUniformItemSizes(True)
+        if thumbnails:
+            # Сетка миниатюр с переносом по ширине окна
+            self.view.setViewMode(QListView.IconMode)
+            self.view.setIconSize(QSize(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT))
+            self.view.setGridSize(QSize(THUMBNAIL_WIDTH + 20, THUMBNAIL_HEIGHT + 40))
+            self.view.setResizeMode(QListView.Adjust)
+            self.view.setMovement(QListView.Static)
+            self.view.setWordWrap(True)
+        if checkable:
+            # Отметка хранится в модели, щелчок по строке ее переключает
+            self.view.setSelectionMode(QAbstractItemView.NoSelection)
+            self.view.clicked.connect(self.model.toggle)
+        else:
+            self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        layout.addWidget(self.view)
+        
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+        # Поиск запускается после паузы в наборе, а не на каждую букву
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(PERSON_SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_input.textChanged.connect(lambda text: self.search_timer.start())
+        
+        self.model.modelReset.connect(self.update_status)
+        self.model.selection_changed.connect(self.update_status)
+        self.model.reload()
+    
+    def apply_search(self):
+        """Применить текст поиска"""
+        self.search_timer.stop()
+        text = self.search_input.text().strip()
+        filters = dict(self.model.filters, search=text or None)
+        self.model.set_filters(**filters)
+    
+    def refresh(self):
+        """Перечитать список из базы"""
+        self.model.reload()
+    
+    def current_person(self):
+        """Выбранный в списке человек или None"""
+        indexes = self.view.selectionModel().selectedIndexes()
+        if not indexes:
+            return None
+        return self.model.person(indexes[0].row())
+    
+    def update_status(self):
+        """Показать количество найденных и отмеченных"""
+        text = f"Найдено: {self.model.total}"
+        if self.model.checkable:
+            text += f", выбрано: {len(self.model.selected_ids)}"
+        self.status_label.setText(text)
\ No newline at end of file
@@ -1,16 +1,45 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QScrollArea
-from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtCore import Qt, QRectF, QSize, QThreadPool, QTimer
 from PyQt5.QtGui import QPixmap, QPainter, QPen, QColor
-from config.settings import PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT
+from config.settings import (PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT, PREVIEW_DPI, PREVIEW_CACHE_MAX_BYTES,
+                             PREVIEW_FRAME_INTERVAL_MS, PREVIEW_PLACEHOLDER_DPI, PREVIEW_PREFETCH_PAGES,
+                             PREVIEW_RENDER_THREADS)
+from ui.background import BackgroundJob
+from ui.page_cache import PageRenderCache
+from functools import partial
 
 class PreviewWidget(QWidget):
-    """Виджет предварительного просмотра PDF с позицией подписи"""
+    """
+    Виджет предварительного просмотра PDF с позицией подписи
+    
+    Страницы отрисовываются в фоновых потоках: сначала быстрая отрисовка
+    с низким разрешением, затем полная. Соседние страницы отрисовываются
+    заранее, а задачи для страниц, с которых пользователь уже ушел,
+    пропускаются.
+    """
+    
+    # Отрисованные страницы общие для всех виджетов просмотра
+    page_cache = PageRenderCache(PREVIEW_CACHE_MAX_BYTES)
     
     def __init__(self):
         super().__init__()
         self.pdf_path = None
+        self.page_num = 0
+        self.page_size = None
+        self.page_count = 0
         self.position = None
         self.pdf_pixmap = None
+        # Разрешение показанной страницы (None - показана заглушка)
+        self.shown_dpi = None
+        
+        self.render_pool = QThreadPool(self)
+        self.render_pool.setMaxThreadCount(PREVIEW_RENDER_THREADS)
+        # Увеличивается при загрузке нового PDF; задачи старых поколений отменяются
+        self.generation = 0
+        # Страницы (номер, dpi), которые нужны сейчас
+        self.wanted = set()
+        # (поколение, номер, dpi) -> задача в очереди или в работе
+        self.jobs = {}
         
         self.init_ui()
     
@@ -33,87 +62,292 @@ class PreviewWidget(QWidget):
         
         layout.addWidget(scroll)
     
-    def load_pdf(self, pdf_path):
+    def load_pdf(self, pdf_path, page_num=0):
         """Загрузить PDF для предварительного просмотра"""
         self.pdf_path = pdf_path
+        self.generation += 1
+        self.page_num = None
         
         try:
-            # Пытаемся конвертировать первую страницу в изображение
             from core.pdf_handler import PDFHandler
-            img = PDFHandler.pdf_to_image(pdf_path, page_num=0, dpi=100)
-            
-            if img:
-                # Конвертируем PIL Image в QPixmap
-                img_rgb = img.convert('RGB')
-                img_rgb.save('/tmp/preview.png')
-                self.pdf_pixmap = QPixmap('/tmp/preview.png')
-            else:
-                # Заглушка если pdf2image не установлен
-                self.pdf_pixmap = self.create_placeholder()
+            self.page_count = PDFHandler.get_page_count(pdf_path)
+        except Exception as e:
+            print(f"Ошибка загрузки PDF для просмотра: {e}")
+            self.page_count = 0
+        
+        self.show_page(page_num)
+    
+    def show_page(self, page_num):
+        """
+        Показать страницу загруженного PDF
         
+        Уже отрисованная страница показывается сразу, иначе показывается
+        быстрая отрисовка или заглушка и ставятся задачи отрисовки.
+        """
+        if not self.pdf_path or page_num == self.page_num:
+            return
+        self.page_num = page_num
+        
+        try:
+            from core.pdf_handler import PDFHandler
+            self.page_size = PDFHandler.get_page_size(self.pdf_path, page_num)
         except Exception as e:
             print(f"Ошибка загрузки PDF для просмотра: {e}")
-            self.pdf_pixmap = self.create_placeholder()
+            self.page_size = None
+            self.wanted = set()
+            self.display(self.create_placeholder(), None)
+            return
         
-        self.update_preview()
+        # Вызывается после get_page_size, поэтому метаданные уже в кэше и разбора нет
+        qimage = self.page_cache.peek(self.pdf_path, page_num, PREVIEW_DPI)
+        if qimage is not None:
+            self.display(QPixmap.fromImage(qimage), PREVIEW_DPI)
+        else:
+            qimage = self.page_cache.peek(self.pdf_path, page_num, PREVIEW_PLACEHOLDER_DPI)
+            if qimage is not None:
+                self.display(QPixmap.fromImage(qimage), PREVIEW_PLACEHOLDER_DPI)
+            else:
+                self.display(self.create_placeholder("Загрузка страницы..."), None)
+        
+        self.request_pages()
     
-    def create_placeholder(self):
+    def request_pages(self):
+        """Поставить в очередь отрисовку текущей страницы и ее соседей"""
+        requests = []
+        if self.shown_dpi is None:
+            requests.append((self.page_num, PREVIEW_PLACEHOLDER_DPI, 2))
+        if self.shown_dpi != PREVIEW_DPI:
+            requests.append((self.page_num, PREVIEW_DPI, 1))
+        
+        for offset in range(1, PREVIEW_PREFETCH_PAGES + 1):
+            for neighbour in (self.page_num + offset, self.page_num - offset):
+                if 0 <= neighbour < self.page_count:
+                    requests.append((neighbour, PREVIEW_DPI, 0))
+        
+        # Задачи для страниц, которых нет в wanted, пропускаются при запуске
+        self.wanted = {(page_num, dpi) for page_num, dpi, _ in requests}
+        
+        for page_num, dpi, priority in requests:
+            key = (self.generation, page_num, dpi)
+            if key in self.jobs:
+                continue
+            
+            job = BackgroundJob(
+                self.page_cache.get_page, self.pdf_path, page_num, dpi,
+                is_cancelled=partial(self.is_stale, key)
+            )
+            job.signals.finished.connect(partial(self.on_page_rendered, key))
+            job.signals.failed.connect(partial(self.on_render_failed, key))
+            job.signals.done.connect(partial(self.jobs.pop, key, None))
+            self.jobs[key] = job
+            self.render_pool.start(job, priority)
+    
+    def is_stale(self, key):
+        """Нужна ли еще отрисовка (вызывается из потока отрисовки)"""
+        generation, page_num, dpi = key
+        return generation != self.generation or (page_num, dpi) not in self.wanted
+    
+    def on_page_rendered(self, key, qimage):
+        """Показать отрисованную страницу, если она все еще текущая"""
+        generation, page_num, dpi = key
+        if generation != self.generation or page_num != self.page_num:
+            return
+        
+        if qimage is None:
+            # Заглушка если pdf2image не установлен
+            if self.shown_dpi is None and dpi == PREVIEW_DPI:
+                self.display(self.create_placeholder(), None)
+            return
+        
+        # Быстрая отрисовка не должна заменять уже показанную полную
+        if dpi == PREVIEW_DPI or self.shown_dpi is None:
+            self.display(QPixmap.fromImage(qimage), dpi)
+    
+    def on_render_failed(self, key, message):
+        """Сообщить об ошибке отрисовки текущей страницы"""
+        generation, page_num, dpi = key
+        if generation != self.generation or page_num != self.page_num or dpi != PREVIEW_DPI:
+            return
+        
+        print(f"Ошибка загрузки PDF для просмотра: {message}")
+        if self.shown_dpi is None:
+            self.display(self.create_placeholder(), None)
+    
+    def display_size(self):
+        """Размер страницы на экране: полное разрешение, уменьшенное до размера просмотра"""
+        if self.page_size is None:
+            return QSize(600, 800)
+        
+        size = QSize(round(self.page_size[0] * PREVIEW_DPI / 72), round(self.page_size[1] * PREVIEW_DPI / 72))
+        if size.width() > PREVIEW_MAX_WIDTH or size.height() > PREVIEW_MAX_HEIGHT:
+            size.scale(PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT, Qt.KeepAspectRatio)
+        return size
+    
+    def display(self, pixmap, dpi):
+        """Показать страницу, приведенную к размеру просмотра (один раз на отрисовку)"""
+        size = self.display_size()
+        if pixmap.size() != size:
+            pixmap = pixmap.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        
+        self.pdf_pixmap = pixmap
+        self.shown_dpi = dpi
+        
+        # Без размеров страницы считаем, что заглушка нарисована в пунктах
+        page_size = self.page_size or (pixmap.width(), pixmap.height())
+        self.preview_label.set_page(pixmap, page_size)
+    
+    def create_placeholder(self, message=None):
         """Создать заглушку для предварительного просмотра"""
-        pixmap = QPixmap(600, 800)
+        size = self.display_size()
+        pixmap = QPixmap(size)
         pixmap.fill(QColor(240, 240, 240))
         
+        if message is None:
+            message = "Предварительный просмотр\n(установите pdf2image для полного просмотра)"
+        
         painter = QPainter(pixmap)
         painter.setPen(QPen(QColor(100, 100, 100), 2))
-        painter.drawRect(10, 10, 580, 780)
-        painter.drawText(pixmap.rect(), Qt.AlignCenter, 
-                        "Предварительный просмотр\n(установите pdf2image для полного просмотра)")
+        painter.drawRect(10, 10, size.width() - 20, size.height() - 20)
+        painter.drawText(pixmap.rect(), Qt.AlignCenter, message)
         painter.end()
         
         return pixmap
     
+    def set_signature(self, img):
+        """
+        Показывать в рамке подпись (изображение PIL или None - только рамка)
+        
+        Подпись преобразуется в QImage один раз; при изменении позиции
+        она только перерисовывается, без обращения к PDFHandler.
+        """
+        qimage = PageRenderCache.pil_to_qimage(img) if img is not None else None
+        self.preview_label.set_signature(qimage)
+    
     def update_signature_position(self, position):
         """Обновить позицию подписи"""
         self.position = position
+        if position.page != self.page_num:
+            self.show_page(position.page)
         self.update_preview()
     
     def update_preview(self):
         """Обновить предварительный просмотр"""
-        if not self.pdf_pixmap:
-            return
-        
-        # Копируем оригинальный pixmap
-        display_pixmap = self.pdf_pixmap.copy()
-        
-        # Если есть позиция, рисуем прямоугольник
-        if self.position:
-            painter = QPainter(display_pixmap)
-            painter.setPen(QPen(QColor(255, 0, 0), 2))
-            painter.drawRect(
-                int(self.position.x),
-                int(self.position.y),
-                int(self.position.width),
-                int(self.position.height)
-            )
-            painter.end()
-        
-        # Масштабируем если нужно
-        if display_pixmap.width() > PREVIEW_MAX_WIDTH or display_pixmap.height() > PREVIEW_MAX_HEIGHT:
-            display_pixmap = display_pixmap.scaled(
-                PREVIEW_MAX_WIDTH,
-                PREVIEW_MAX_HEIGHT,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-        
-        self.preview_label.setPixmap(display_pixmap)
+        self.preview_label.set_position(self.position)
 
 
 class PreviewLabel(QLabel):
-    """Расширенный Label для предварительного просмотра"""
+    """
+    Расширенный Label для предварительного просмотра
+    
+    Рисует слои: страницу, уменьшенную один раз при ее загрузке,
+    и подпись с рамкой поверх нее. Частые изменения позиции (прокрутка
+    спинбокса) объединяются в одну перерисовку за кадр.
+    """
     
     def __init__(self):
         super().__init__()
+        self.page_pixmap = None
+        # Размер страницы (ширина, высота) в пунктах PDF
+        self.page_size = None
+        self.position = None
+        # Подпись в исходном размере и ее копия под текущий размер рамки
+        self.signature_image = None
+        self.scaled_signature = None
+        
         self.setAlignment(Qt.AlignCenter)
         self.setText("Загрузите PDF файл")
         self.setMinimumSize(400, 500)
-        self.setStyleSheet("background-color: white; border: 1px solid #ccc;")
\ No newline at end of file
+        self.setStyleSheet("background-color: white; border: 1px solid #ccc;")
+        
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.setInterval(PREVIEW_FRAME_INTERVAL_MS)
+        self.repaint_timer.timeout.connect(self.update)
+    
+    def set_page(self, pixmap, page_size):
+        """Показать страницу размером page_size пунктов"""
+        self.page_pixmap = pixmap
+        self.page_size = page_size
+        self.setText("")
+        self.setMinimumSize(pixmap.size())
+        self.update()
+    
+    def set_signature(self, qimage):
+        """Изменить подпись, рисуемую в рамке"""
+        self.signature_image = qimage
+        self.scaled_signature = None
+        self.update()
+    
+    def signature_pixmap(self, width, height):
+        """
+        Подпись, уменьшенная под размер рамки в пикселях
+        
+        Масштабирование выполняется только при изменении размера рамки;
+        при перемещении подписи используется готовая копия.
+        """
+        if self.scaled_signature is None or (
+                self.scaled_signature.width(), self.scaled_signature.height()) != (width, height):
+            scaled = self.signature_image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self.scaled_signature = QPixmap.fromImage(scaled)
+        return self.scaled_signature
+    
+    def set_position(self, position):
+        """Изменить позицию подписи; перерисовка откладывается до следующего кадра"""
+        self.position = position
+        if not self.repaint_timer.isActive():
+            self.repaint_timer.start()
+    
+    def page_rect(self):
+        """Прямоугольник страницы в координатах виджета (по центру)"""
+        width = self.page_pixmap.width()
+        height = self.page_pixmap.height()
+        return QRectF((self.width() - width) / 2, (self.height() - height) / 2, width, height)
+    
+    def signature_rect(self):
+        """
+        Рамка подписи в координатах виджета
+        
+        Прямоугольник берется из PDFHandler.signature_bbox, то есть тот же,
+        что получит подпись в PDF, и переводится из пунктов в пиксели.
+        """
+        from core.pdf_handler import PDFHandler
+        
+        page = self.page_rect()
+        page_width, page_height = self.page_size
+        x, y, width, height = PDFHandler.signature_bbox(
+            self.position.x, self.position.y, self.position.width, self.position.height, page_height
+        )
+        scale_x = page.width() / page_width
+        scale_y = page.height() / page_height
+        # В PDF ось Y направлена вверх, на экране - вниз
+        return QRectF(
+            page.x() + x * scale_x,
+            page.y() + (page_height - y - height) * scale_y,
+            width * scale_x,
+            height * scale_y
+        )
+    
+    def paintEvent(self, event):
+        """Нарисовать страницу и рамку подписи"""
+        # Фон, рамка и текст-подсказка рисуются QLabel
+        super().paintEvent(event)
+        if self.page_pixmap is None:
+            return
+        
+        painter = QPainter(self)
+        page = self.page_rect()
+        painter.drawPixmap(page.topLeft(), self.page_pixmap)
+        
+        if self.position is not None:
+            rect = self.signature_rect()
+            pen = QPen(QColor(255, 0, 0), 2)
+            
+            width, height = round(rect.width()), round(rect.height())
+            if self.signature_image is not None and width > 0 and height > 0:
+                painter.drawPixmap(rect.topLeft(), self.signature_pixmap(width, height))
+                # Рамка не должна закрывать подпись
+                pen = QPen(QColor(255, 0, 0), 1, Qt.DashLine)
+            
+            painter.setPen(pen)
+            painter.drawRect(rect)
+        painter.end()
\ No newline at end of file
@@ -1,12 +1,16 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox,
-                             QLineEdit, QLabel, QGroupBox, QHeaderView)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
+                             QFileDialog, QMessageBox, QLineEdit, QLabel, QGroupBox)
+from PyQt5.QtCore import Qt, QThreadPool, QSize, QTimer
+from PyQt5.QtGui import QPixmap, QImageReader
 from database.db_manager import DatabaseManager
 from database.models import Person
+from core.roster_import import RosterImporter
+from core.thumbnails import SignatureThumbnail
+from ui.background import BackgroundJob
+from ui.person_list import PersonListWidget
 from utils.file_utils import FileUtils
 from utils.validators import Validators
+from config.settings import THUMBNAIL_REFRESH_INTERVAL_MS
 import os
 
 class SignatureManagerDialog(QDialog):
@@ -19,7 +23,7 @@ class SignatureManagerDialog(QDialog):
         self.validators = Validators()
         
         self.init_ui()
-        self.load_persons()
+        self.start_thumbnail_backfill()
     
     def init_ui(self):
         """Инициализация интерфейса"""
@@ -46,6 +50,13 @@ class SignatureManagerDialog(QDialog):
         position_layout.addWidget(self.position_input)
         add_layout.addLayout(position_layout)
         
+        # Подразделение
+        department_layout = QHBoxLayout()
+        department_layout.addWidget(QLabel("Подразделение:"))
+        self.department_input = QLineEdit()
+        department_layout.addWidget(self.department_input)
+        add_layout.addLayout(department_layout)
+        
         # Подпись
         signature_layout = QHBoxLayout()
         signature_layout.addWidget(QLabel("Подпись:"))
@@ -64,13 +75,10 @@ class SignatureManagerDialog(QDialog):
         add_group.setLayout(add_layout)
         layout.addWidget(add_group)
         
-        # Таблица с людьми
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["ID", "ФИО", "Должность", "Подпись"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        layout.addWidget(self.table)
+        # Сетка миниатюр подписей
+        self.persons_list = PersonListWidget(self.db_manager, thumbnails=True)
+        self.persons_list.view.doubleClicked.connect(self.view_signature)
+        layout.addWidget(self.persons_list)
         
         # Кнопки управления
         buttons_layout = QHBoxLayout()
@@ -83,6 +91,10 @@ class SignatureManagerDialog(QDialog):
         delete_btn.clicked.connect(self.delete_person)
         buttons_layout.addWidget(delete_btn)
         
+        self.import_btn = QPushButton("Импорт из CSV...")
+        self.import_btn.clicked.connect(self.import_roster)
+        buttons_layout.addWidget(self.import_btn)
+        
         close_btn = QPushButton("Закрыть")
         close_btn.clicked.connect(self.accept)
         buttons_layout.addWidget(close_btn)
@@ -90,6 +102,12 @@ class SignatureManagerDialog(QDialog):
         layout.addLayout(buttons_layout)
         
         self.selected_signature_path = None
+        self.import_job = None
+        self.thumbnail_job = None
+        self.closing = False
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.setInterval(THUMBNAIL_REFRESH_INTERVAL_MS)
+        self.thumbnail_timer.timeout.connect(self.persons_list.model.refresh_thumbnails)
     
     def select_signature_file(self):
         """Выбрать файл подписи"""
@@ -113,6 +131,7 @@ class SignatureManagerDialog(QDialog):
         """Добавить человека"""
         name = self.name_input.text().strip()
         position = self.position_input.text().strip()
+        department = self.department_input.text().strip()
         
         # Валидация
         valid, message = self.validators.validate_person_name(name)
@@ -124,86 +143,168 @@ class SignatureManagerDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Выберите файл подписи")
             return
         
+        signature_path = None
         try:
-            # Копируем файл подписи
-            signature_path = self.file_utils.copy_signature_file(
-                self.selected_signature_path,
-                name
-            )
+            # Кладем файл подписи в хранилище (одинаковые файлы хранятся один раз)
+            signature_path, _ = self.file_utils.store_signature_file(self.selected_signature_path)
+            
+            # Готовим подпись для встраивания в PDF
+            asset_path, asset = self.file_utils.compile_signature_asset(signature_path)
             
             # Создаем объект Person
             person = Person(
                 name=name,
                 position=position,
-                signature_path=signature_path
+                department=department,
+                signature_path=signature_path,
+                asset_path=asset_path,
+                asset_hash=asset.content_hash
             )
             
-            # Сохраняем в БД
-            self.db_manager.add_person(person)
+            # Сохраняем в БД вместе с миниатюрой
+            person_id = self.db_manager.add_person(person)
+            thumbnail = SignatureThumbnail.create_or_none(signature_path)
+            self.db_manager.save_thumbnails([(person_id, signature_path, thumbnail)])
             
             # Очищаем форму
             self.name_input.clear()
             self.position_input.clear()
+            self.department_input.clear()
             self.signature_path_label.setText("Не выбрана")
             self.selected_signature_path = None
             
-            # Обновляем таблицу
+            # Обновляем список
             self.load_persons()
             
             QMessageBox.information(self, "Успех", f"Человек {name} добавлен")
         
         except Exception as e:
+            # Человек не добавлен: файл из хранилища удаляется, только если
+            # на него не ссылаются другие люди (счетчик ссылок в базе)
+            if signature_path is not None:
+                try:
+                    self.file_utils.delete_signature_file(signature_path, self.db_manager)
+                except OSError:
+                    pass
             QMessageBox.critical(self, "Ошибка", f"Ошибка добавления: {str(e)}")
     
-    def load_persons(self):
-        """Загрузить список людей"""
-        persons = self.db_manager.get_all_persons()
+    def import_roster(self):
+        """Добавить людей списком из CSV (name, position, department, signature)"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Выберите список людей",
+            "",
+            "CSV Files (*.csv)"
+        )
+        if not file_path:
+            return
         
-        self.table.setRowCount(len(persons))
+        # Подготовка тысяч подписей занимает время, поэтому выполняется в фоне
+        self.import_btn.setEnabled(False)
+        self.import_btn.setText("Импорт...")
+        job = BackgroundJob(RosterImporter(self.db_manager).import_path, file_path)
+        job.signals.finished.connect(self.on_roster_imported)
+        job.signals.failed.connect(self.on_roster_failed)
+        job.signals.done.connect(self.on_roster_done)
+        self.import_job = job
+        QThreadPool.globalInstance().start(job)
+    
+    def on_roster_imported(self, results):
+        """Показать итог импорта"""
+        self.load_persons()
         
-        for i, person in enumerate(persons):
-            self.table.setItem(i, 0, QTableWidgetItem(str(person.id)))
-            self.table.setItem(i, 1, QTableWidgetItem(person.name))
-            self.table.setItem(i, 2, QTableWidgetItem(person.position))
-            self.table.setItem(i, 3, QTableWidgetItem(os.path.basename(person.signature_path)))
+        failed = [result for result in results if not result.ok]
+        message = f"Добавлено: {len(results) - len(failed)} из {len(results)}"
+        if failed:
+            lines = [f"Строка {result.entry.line} ({result.entry.name}): {result.error}" for result in failed[:10]]
+            if len(failed) > 10:
+                lines.append(f"... и еще {len(failed) - 10}")
+            message += "\n\nОшибки:\n" + "\n".join(lines)
+            QMessageBox.warning(self, "Импорт", message)
+        else:
+            QMessageBox.information(self, "Импорт", message)
+    
+    def on_roster_failed(self, message):
+        """Сообщить об ошибке импорта"""
+        QMessageBox.critical(self, "Ошибка", f"Ошибка импорта: {message}")
+    
+    def on_roster_done(self):
+        """Вернуть кнопку импорта"""
+        self.import_btn.setEnabled(True)
+        self.import_btn.setText("Импорт из CSV...")
+        self.import_job = None
+    
+    def start_thumbnail_backfill(self):
+        """Создать в фоне миниатюры людей, добавленных до их появления"""
+        job = BackgroundJob(
+            SignatureThumbnail.backfill, self.db_manager, None, None, lambda: self.closing
+        )
+        job.signals.finished.connect(self.on_thumbnails_created)
+        job.signals.done.connect(self.on_thumbnail_job_done)
+        self.thumbnail_job = job
+        # Готовые пачки миниатюр показываются, не дожидаясь конца заполнения
+        self.thumbnail_timer.start()
+        QThreadPool.globalInstance().start(job)
+    
+    def on_thumbnails_created(self, count):
+        """Показать созданные миниатюры"""
+        if count:
+            self.persons_list.model.refresh_thumbnails()
+    
+    def on_thumbnail_job_done(self):
+        """Остановить обновление миниатюр"""
+        self.thumbnail_timer.stop()
+        self.thumbnail_job = None
+    
+    def done(self, result):
+        """Остановить фоновое создание миниатюр при закрытии"""
+        self.closing = True
+        super().done(result)
+    
+    def load_persons(self):
+        """Перечитать список людей"""
+        self.persons_list.refresh()
     
     def view_signature(self):
         """Просмотреть подпись"""
-        selected = self.table.selectedItems()
-        if not selected:
+        person = self.persons_list.current_person()
+        if not person:
             QMessageBox.warning(self, "Ошибка", "Выберите человека из списка")
             return
         
-        person_id = int(self.table.item(selected[0].row(), 0).text())
-        person = self.db_manager.get_person_by_id(person_id)
-        
-        if person and os.path.exists(person.signature_path):
-            # Создаем диалог для просмотра
-            dialog = QDialog(self)
-            dialog.setWindowTitle(f"Подпись: {person.name}")
-            layout = QVBoxLayout(dialog)
-            
-            label = QLabel()
-            pixmap = QPixmap(person.signature_path)
-            label.setPixmap(pixmap.scaled(400, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            layout.addWidget(label)
-            
-            close_btn = QPushButton("Закрыть")
-            close_btn.clicked.connect(dialog.accept)
-            layout.addWidget(close_btn)
-            
-            dialog.exec_()
-        else:
+        reader = QImageReader(person.signature_path)
+        if not os.path.exists(person.signature_path) or not reader.canRead():
             QMessageBox.warning(self, "Ошибка", "Файл подписи не найден")
+            return
+        
+        # Скан декодируется сразу в размере окна просмотра, а не в исходном
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(size.scaled(QSize(400, 200), Qt.KeepAspectRatio))
+        
+        # Создаем диалог для просмотра
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Подпись: {person.name}")
+        layout = QVBoxLayout(dialog)
+        
+        label = QLabel()
+        label.setPixmap(QPixmap.fromImage(reader.read()))
+        layout.addWidget(label)
+        
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(dialog.accept)
+        layout.addWidget(close_btn)
+        
+        dialog.exec_()
     
     def delete_person(self):
         """Удалить человека"""
-        selected = self.table.selectedItems()
+        selected = self.persons_list.current_person()
         if not selected:
             QMessageBox.warning(self, "Ошибка", "Выберите человека из списка")
             return
         
-        person_id = int(self.table.item(selected[0].row(), 0).text())
+        person_id = selected.id
         person = self.db_manager.get_person_by_id(person_id)
         
         reply = QMessageBox.question(
@@ -215,14 +316,14 @@ class SignatureManagerDialog(QDialog):
         
         if reply == QMessageBox.Yes:
             try:
-                # Удаляем файл подписи
-                if os.path.exists(person.signature_path):
-                    self.file_utils.delete_signature_file(person.signature_path)
-                
                 # Удаляем из БД
                 self.db_manager.delete_person(person_id)
+                self.persons_list.model.forget(person_id)
+                
+                # Удаляем файл подписи, если он больше никому не нужен
+                self.file_utils.delete_signature_file(person.signature_path, self.db_manager)
                 
-                # Обновляем таблицу
+                # Обновляем список
                 self.load_persons()
                 
                 QMessageBox.information(self, "Успех", "Человек удален")
@@ -1,47 +1,120 @@
+import hashlib
 import os
 import shutil
-from config.settings import SIGNATURES_DIR
+import threading
+from config.settings import SIGNATURES_DIR, SIGNATURE_SHARD_LEVELS
+from core.signature_asset import SignatureAsset
+
+# Размер блока чтения при вычислении хэша файла
+HASH_CHUNK_SIZE = 1024 * 1024
 
 class FileUtils:
     """Утилиты для работы с файлами"""
     
     @staticmethod
-    def copy_signature_file(source_path, person_name):
+    def hash_file(path):
+        """SHA-256 содержимого файла (hex)"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def get_signature_store_path(content_hash, ext):
         """
-        Копировать файл подписи в папку программы
+        Путь к файлу подписи в хранилище по хэшу содержимого
+        
+        Файлы раскладываются по вложенным папкам из первых символов хэша
+        (ab/cd/abcd...png), чтобы в одной папке не было десятков тысяч файлов.
+        """
+        shards = [content_hash[i * 2:i * 2 + 2] for i in range(SIGNATURE_SHARD_LEVELS)]
+        return os.path.join(SIGNATURES_DIR, *shards, content_hash + ext.lower())
+    
+    @staticmethod
+    def store_signature_file(source_path):
+        """
+        Положить файл подписи в хранилище программы
+        
+        Имя файла - хэш содержимого, поэтому одинаковые подписи хранятся
+        одним файлом, а повторное добавление того же файла ничего не копирует.
         
         Args:
             source_path: путь к исходному файлу
-            person_name: имя человека для формирования имени файла
         
         Returns:
-            Путь к скопированному файлу
+            (путь к файлу в хранилище, True если файл был скопирован сейчас)
         """
-        # Получаем расширение файла
         _, ext = os.path.splitext(source_path)
+        new_path = FileUtils.get_signature_store_path(FileUtils.hash_file(source_path), ext)
+        if os.path.exists(new_path):
+            return new_path, False
         
-        # Формируем безопасное имя файла
-        safe_name = person_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
-        new_filename = f"{safe_name}{ext}"
-        new_path = os.path.join(SIGNATURES_DIR, new_filename)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        # Копируем во временный файл и переименовываем, чтобы под именем
+        # хэша никогда не лежал недописанный файл; параллельное копирование
+        # того же содержимого дает тот же результат
+        tmp_path = f"{new_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            shutil.copystat(source_path, tmp_path)
+            os.replace(tmp_path, new_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         
-        # Если файл с таким именем уже существует, добавляем номер
-        counter = 1
-        while os.path.exists(new_path):
-            new_filename = f"{safe_name}_{counter}{ext}"
-            new_path = os.path.join(SIGNATURES_DIR, new_filename)
-            counter += 1
+        return new_path, True
+    
+    @staticmethod
+    def compile_signature_asset(signature_path):
+        """
+        Создать предкомпилированную подпись рядом с файлом подписи
         
-        # Копируем файл
-        shutil.copy2(source_path, new_path)
+        Если готовая подпись для этого содержимого уже есть (файл из
+        хранилища используется несколькими людьми), она не пересоздается.
         
-        return new_path
+        Args:
+            signature_path: путь к файлу подписи в папке программы
+        
+        Returns:
+            (путь к файлу ассета, объект SignatureAsset)
+        """
+        asset_path = SignatureAsset.get_asset_path(signature_path)
+        if os.path.exists(asset_path):
+            try:
+                asset = SignatureAsset.load(asset_path)
+                if asset.content_hash == FileUtils.hash_file(signature_path):
+                    return asset_path, asset
+            except (OSError, ValueError, KeyError):
+                pass
+        
+        asset = SignatureAsset.compile_file(signature_path)
+        asset.save(asset_path)
+        
+        return asset_path, asset
     
     @staticmethod
-    def delete_signature_file(file_path):
-        """Удалить файл подписи"""
+    def delete_signature_file(file_path, db_manager=None):
+        """
+        Удалить файл подписи вместе с предкомпилированной версией
+        
+        Если передан db_manager, файл удаляется, только когда на него
+        не ссылается ни один человек (после удаления человека из базы).
+        
+        Returns:
+            True, если файл удален или его уже не было
+        """
+        if db_manager is not None and not db_manager.release_signature_file(file_path):
+            return False
+        
         if os.path.exists(file_path):
             os.remove(file_path)
+        
+        asset_path = SignatureAsset.get_asset_path(file_path)
+        if os.path.exists(asset_path):
+            os.remove(asset_path)
+        return True
     
     @staticmethod
     def get_file_size(file_path):
@@ -37,6 +37,14 @@ class Validators:
         if ext.lower() not in SUPPORTED_PDF_FORMATS:
             return False, "Файл должен быть в формате PDF"
         
+        # Разобранный файл остается в кэше для обработки и предпросмотра
+        from core.pdf_handler import PDFHandler
+        probe = PDFHandler.probe(file_path)
+        if probe.is_encrypted and not probe.is_valid:
+            return False, "PDF файл защищен паролем"
+        if not probe.is_valid:
+            return False, "Невалидный PDF файл"
+        
         return True, "OK"
     
     @staticmethod